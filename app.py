@@ -1,37 +1,90 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, Blueprint, render_template, request, jsonify, redirect, url_for, Response
 from config import Config
 from database.db import db
+from database.backup import backups
 from models.room import Room
 from models.sensor import Sensor
 from models.measurement import Measurement
 from models.equipment import Equipment
+from models.decision_rule import DecisionRule
+from models.equipment_event import EquipmentEvent
+from models.zone import Zone
+from models.alert_state import AlertState
 from services.data_collection import DataCollectionService
 from services.analysis import AnalysisService
 from services.decision_making import DecisionMakingService
-from datetime import datetime
+from services.aggregates import running_aggregates
+from services.compliance_report import ComplianceReportService
+from services.simulation import SimulationService
+from services.forecasting import forecasting_service
+from services.rule_engine import rule_engine
+from services.overview import OverviewService
+from services.energy import EnergyService
+from services.zones import ZoneRollupService
+from services.alerting import alert_dispatcher
+from datetime import datetime, timedelta
 
-app = Flask(__name__)
-app.config.from_object(Config)
+bp = Blueprint('main', __name__)
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Главная страница с общей информацией"""
-    rooms = Room.get_all()
-    total_sensors = len(Sensor.get_all())
-    total_equipment = len(Equipment.get_all())
+    overview = OverviewService.get_overview()
     
     return render_template('index.html', 
-                         rooms=rooms,
-                         total_sensors=total_sensors,
-                         total_equipment=total_equipment)
+                         overview=overview,
+                         rooms=overview['rooms'],
+                         total_sensors=overview['total_sensors'],
+                         total_equipment=overview['total_equipment'])
+
+@bp.route('/api/overview')
+def api_overview():
+    """API: Сводка по всем помещениям (счётчики и статус каждого помещения)"""
+    return jsonify({'success': True, 'overview': OverviewService.get_overview()})
+
+def parse_page_args(args, filter_names):
+    """Разбор параметров постраничного списка (фильтры, сортировка, курсор, размер)"""
+    filters = {}
+    for name in filter_names:
+        value = args.get(name)
+        if value in (None, ''):
+            continue
+        if name in ('room_id', 'zone_id'):
+            value = int(value)
+        elif name == 'auto_mode':
+            value = value.lower() in ('1', 'true', 'on', 'yes')
+        filters[name] = value
+    
+    page_args = {
+        'filters': filters,
+        'descending': args.get('order') == 'desc',
+        'cursor': args.get('cursor'),
+        'limit': args.get('limit', type=int)
+    }
+    if args.get('sort'):
+        page_args['sort'] = args['sort']
+    return page_args
 
-@app.route('/rooms')
+@bp.route('/rooms')
 def rooms():
     """Страница управления помещениями"""
-    rooms_list = Room.get_all()
-    return render_template('rooms.html', rooms=rooms_list)
+    try:
+        page = Room.get_page(**parse_page_args(request.args, ['q', 'zone_id']))
+    except ValueError as e:
+        return f"Некорректные параметры списка: {e}", 400
+    
+    return render_template('rooms.html', rooms=page['items'], next_cursor=page['next_cursor'])
 
-@app.route('/api/rooms', methods=['POST'])
+@bp.route('/api/rooms')
+def list_rooms():
+    """API: Постраничный список помещений"""
+    try:
+        page = Room.get_page(**parse_page_args(request.args, ['q', 'zone_id']))
+        return jsonify({'success': True, **page})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/rooms', methods=['POST'])
 def create_room():
     """API: Создание нового помещения"""
     data = request.get_json()
@@ -39,13 +92,14 @@ def create_room():
         room_id = Room.create(
             name=data['name'],
             area=float(data['area']),
-            description=data.get('description')
+            description=data.get('description'),
+            zone_id=data.get('zone_id')
         )
         return jsonify({'success': True, 'room_id': room_id})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
-@app.route('/api/rooms/<int:room_id>', methods=['DELETE'])
+@bp.route('/api/rooms/<int:room_id>', methods=['DELETE'])
 def delete_room(room_id):
     """API: Удаление помещения"""
     try:
@@ -54,7 +108,66 @@ def delete_room(room_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
-@app.route('/room/<int:room_id>')
+@bp.route('/api/rooms/<int:room_id>/zone', methods=['PUT'])
+def set_room_zone(room_id):
+    """API: Привязка помещения к зоне"""
+    data = request.get_json()
+    try:
+        Room.set_zone(room_id, data.get('zone_id'))
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/zones')
+def list_zones():
+    """API: Иерархия зон с агрегатами последних показателей на каждом уровне"""
+    return jsonify({'success': True, **ZoneRollupService.get_tree()})
+
+@bp.route('/api/zones', methods=['POST'])
+def create_zone():
+    """API: Создание зоны"""
+    data = request.get_json()
+    try:
+        zone_id = Zone.create(
+            name=data['name'],
+            zone_type=data['zone_type'],
+            parent_id=data.get('parent_id')
+        )
+        return jsonify({'success': True, 'zone_id': zone_id})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/zones/<int:zone_id>', methods=['PUT'])
+def update_zone(zone_id):
+    """API: Переименование зоны или перенос под другую зону"""
+    data = request.get_json()
+    try:
+        if 'name' in data:
+            Zone.rename(zone_id, data['name'])
+        if 'parent_id' in data:
+            Zone.move(zone_id, data['parent_id'])
+        return jsonify({'success': True, 'zone': Zone.get_by_id(zone_id)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/zones/<int:zone_id>', methods=['DELETE'])
+def delete_zone(zone_id):
+    """API: Удаление зоны (содержимое переходит к родительской зоне)"""
+    try:
+        Zone.delete(zone_id)
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/zones/<int:zone_id>/rollup')
+def zone_rollup(zone_id):
+    """API: Агрегаты зоны и её вложенных зон"""
+    try:
+        return jsonify({'success': True, 'rollup': ZoneRollupService.get_zone(zone_id)})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+
+@bp.route('/room/<int:room_id>')
 def room_detail(room_id):
     """Детальная информация о помещении"""
     room = Room.get_by_id(room_id)
@@ -67,6 +180,8 @@ def room_detail(room_id):
     # Получение текущих показателей
     current_state = DataCollectionService.get_room_current_state(room_id)
     analysis = AnalysisService.analyze_room_air_quality(room_id)
+    statistics = running_aggregates.get_room_summary(room_id)
+    forecast = forecasting_service.forecast_room(room_id)
     
     return render_template('room_detail.html',
                          room=room,
@@ -74,9 +189,20 @@ def room_detail(room_id):
                          equipment=equipment_list,
                          current_state=current_state,
                          analysis=analysis,
+                         statistics=statistics,
+                         forecast=forecast,
                          standards=Config.AIR_QUALITY_STANDARDS)
 
-@app.route('/api/sensors', methods=['POST'])
+@bp.route('/api/sensors')
+def list_sensors():
+    """API: Постраничный список датчиков"""
+    try:
+        page = Sensor.get_page(**parse_page_args(request.args, ['room_id', 'sensor_type', 'status']))
+        return jsonify({'success': True, **page})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/sensors', methods=['POST'])
 def create_sensor():
     """API: Создание нового датчика"""
     data = request.get_json()
@@ -90,20 +216,42 @@ def create_sensor():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
-@app.route('/api/measurements', methods=['POST'])
+@bp.route('/api/sensors/<int:sensor_id>/status', methods=['PUT'])
+def update_sensor_status(sensor_id):
+    """API: Обновление статуса датчика"""
+    data = request.get_json()
+    try:
+        Sensor.update_status(sensor_id, data['status'])
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/measurements', methods=['POST'])
 def add_measurement():
     """API: Добавление нового измерения"""
     data = request.get_json()
     try:
         measurement_id = DataCollectionService.collect_measurement(
             sensor_id=int(data['sensor_id']),
-            value=float(data['value'])
+            value=float(data['value']),
+            measured_at=data.get('measured_at')
         )
-        return jsonify({'success': True, 'measurement_id': measurement_id})
+        # Повторная отправка того же измерения не считается ошибкой
+        return jsonify({'success': True, 'measurement_id': measurement_id, 'duplicate': measurement_id is None})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/measurements/batch', methods=['POST'])
+def add_measurements_batch():
+    """API: Пакетное добавление измерений"""
+    data = request.get_json()
+    try:
+        result = DataCollectionService.collect_measurements(data['measurements'])
+        return jsonify({'success': True, **result})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
-@app.route('/api/measurements/history/<int:sensor_id>')
+@bp.route('/api/measurements/history/<int:sensor_id>')
 def measurement_history(sensor_id):
     """API: Получение истории измерений"""
     hours = request.args.get('hours', 24, type=int)
@@ -111,19 +259,83 @@ def measurement_history(sensor_id):
     
     return jsonify([{
         'value': float(m['value']),
-        'measured_at': m['measured_at'].isoformat()
+        'measured_at': m['measured_at']
     } for m in measurements])
 
-@app.route('/equipment')
+@bp.route('/api/measurements/partitions')
+def measurement_partitions():
+    """API: Список помесячных партиций измерений"""
+    return jsonify({'success': True, 'partitions': Measurement.get_partitions()})
+
+@bp.route('/api/measurements/partitions/<name>', methods=['DELETE'])
+def drop_measurement_partition(name):
+    """API: Удаление измерений за месяц (ГГГГ_ММ)"""
+    try:
+        Measurement.drop_partition(name)
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/alerts/active')
+def active_alerts():
+    """API: Параметры помещений в критическом состоянии"""
+    return jsonify({'success': True, 'alerts': AlertState.get_active()})
+
+@bp.route('/api/alerts/dispatcher')
+def alert_dispatcher_stats():
+    """API: Очередь и доставка уведомлений (счётчики текущего процесса)"""
+    return jsonify({'success': True, 'stats': alert_dispatcher.get_stats()})
+
+@bp.route('/api/backups')
+def list_backups():
+    """API: Снимки резервных копий БД"""
+    return jsonify({'success': True, 'backups': backups.list_snapshots()})
+
+@bp.route('/api/backups', methods=['POST'])
+def create_backup():
+    """API: Создание снимка БД (онлайн-копирование, неизменённые партиции - жёсткими ссылками)"""
+    try:
+        return jsonify({'success': True, 'backup': backups.create()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+EQUIPMENT_FILTERS = ['room_id', 'equipment_type', 'status', 'auto_mode']
+
+@bp.route('/equipment')
 def equipment():
     """Страница управления оборудованием"""
-    equipment_list = Equipment.get_all()
-    rooms = Room.get_all()
+    try:
+        page = Equipment.get_page(**parse_page_args(request.args, EQUIPMENT_FILTERS))
+    except ValueError as e:
+        return f"Некорректные параметры списка: {e}", 400
+    
+    equipment_list = page['items']
+    rooms = Room.get_choices(request.args.get('room_id', type=int))
+    
+    # Энергопотребление с начала месяца только для оборудования текущей страницы
+    energy_by_equipment = {}
+    if equipment_list:
+        month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        energy = EnergyService.get_usage(month_start, datetime.utcnow(),
+                                         equipment_ids=[eq['id'] for eq in equipment_list])
+        energy_by_equipment = {e['equipment_id']: e for e in energy['equipment']}
+    
     return render_template('equipment.html', 
                          equipment=equipment_list,
-                         rooms=rooms)
+                         rooms=rooms,
+                         energy=energy_by_equipment,
+                         next_cursor=page['next_cursor'])
 
-@app.route('/api/equipment', methods=['POST'])
+@bp.route('/api/equipment')
+def list_equipment():
+    """API: Постраничный список оборудования"""
+    try:
+        page = Equipment.get_page(**parse_page_args(request.args, EQUIPMENT_FILTERS))
+        return jsonify({'success': True, **page})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/equipment', methods=['POST'])
 def create_equipment():
     """API: Создание нового оборудования"""
     data = request.get_json()
@@ -138,7 +350,24 @@ def create_equipment():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
-@app.route('/api/equipment/<int:equipment_id>/status', methods=['PUT'])
+@bp.route('/api/equipment/<int:equipment_id>/events')
+def equipment_events(equipment_id):
+    """API: Журнал переключений оборудования"""
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'success': True, 'events': EquipmentEvent.get_by_equipment(equipment_id, limit)})
+
+@bp.route('/api/energy')
+def energy_usage():
+    """API: Время работы и энергопотребление оборудования за период"""
+    try:
+        start, end, room_ids = parse_report_period(request.args)
+        equipment_id = request.args.get('equipment_id', type=int)
+        usage = EnergyService.get_usage(start, end, room_ids, [equipment_id] if equipment_id else None)
+        return jsonify({'success': True, 'usage': usage})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/equipment/<int:equipment_id>/status', methods=['PUT'])
 def update_equipment_status(equipment_id):
     """API: Обновление статуса оборудования"""
     data = request.get_json()
@@ -152,11 +381,15 @@ def update_equipment_status(equipment_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
-@app.route('/api/decisions/<int:room_id>', methods=['POST'])
+@bp.route('/api/decisions/<int:room_id>', methods=['POST'])
 def make_decision(room_id):
     """API: Принятие решения по управлению оборудованием"""
     try:
-        decision = DecisionMakingService.make_decision(room_id)
+        decision = DecisionMakingService.make_decision(
+            room_id,
+            predictive=request.args.get('predictive') == 'true',
+            horizon_minutes=request.args.get('horizon', type=int)
+        )
         
         # Опционально: автоматическое выполнение решения
         if request.args.get('execute') == 'true':
@@ -167,7 +400,73 @@ def make_decision(room_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
-@app.route('/api/equipment/evaluate', methods=['POST'])
+@bp.route('/api/decisions', methods=['POST'])
+def make_decisions_batch():
+    """API: Пакетное принятие решений по всем помещениям"""
+    try:
+        decisions = DecisionMakingService.make_decisions(
+            predictive=request.args.get('predictive') == 'true',
+            horizon_minutes=request.args.get('horizon', type=int)
+        )
+        
+        if request.args.get('execute') == 'true':
+            for decision in decisions:
+                decision['executed_actions'] = DecisionMakingService.execute_decision(decision)
+        
+        return jsonify({'success': True, 'decisions': decisions})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/rules')
+def list_rules():
+    """API: Действующие правила управления оборудованием"""
+    return jsonify({'success': True, 'rules': rule_engine.get_rules()})
+
+@bp.route('/api/rules', methods=['POST'])
+def create_rule():
+    """API: Создание правила управления оборудованием"""
+    data = request.get_json()
+    try:
+        rule_id = DecisionRule.create(data)
+        return jsonify({'success': True, 'rule_id': rule_id})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/rules/<int:rule_id>', methods=['PUT'])
+def update_rule(rule_id):
+    """API: Включение или отключение правила"""
+    data = request.get_json()
+    try:
+        DecisionRule.set_enabled(rule_id, bool(data['enabled']))
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/rules/<int:rule_id>', methods=['DELETE'])
+def delete_rule(rule_id):
+    """API: Удаление правила"""
+    try:
+        DecisionRule.delete(rule_id)
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/rules/reload', methods=['POST'])
+def reload_rules():
+    """API: Перезагрузка правил (после изменения таблицы decision_rules напрямую)"""
+    rule_engine.reload()
+    return jsonify({'success': True, 'rules': len(rule_engine.get_rules())})
+
+@bp.route('/api/forecast/<int:room_id>')
+def room_forecast(room_id):
+    """API: Краткосрочный прогноз показателей помещения"""
+    try:
+        forecast = forecasting_service.forecast_room(room_id, request.args.get('horizon', type=int))
+        return jsonify({'success': True, 'forecast': forecast})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/api/equipment/evaluate', methods=['POST'])
 def evaluate_equipment_config():
     """API: Оценка конфигурации оборудования"""
     data = request.get_json()
@@ -180,25 +479,99 @@ def evaluate_equipment_config():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
-@app.route('/reports')
+@bp.route('/api/simulation/<int:room_id>', methods=['POST'])
+def api_simulate_configurations(room_id):
+    """API: Сравнение конфигураций оборудования на записанной истории помещения"""
+    data = request.get_json() or {}
+    try:
+        end = datetime.fromisoformat(data['end']) if data.get('end') else datetime.utcnow()
+        start = datetime.fromisoformat(data['start']) if data.get('start') else end - timedelta(days=7)
+        result = SimulationService.simulate(
+            room_id, start, end,
+            configurations=data.get('configurations'),
+            sweep=data.get('sweep'),
+            top=int(data.get('top', 20))
+        )
+        return jsonify({'success': True, 'simulation': result})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@bp.route('/reports')
 def reports():
     """Страница отчетов"""
-    rooms = Room.get_all()
-    
     reports_data = []
-    for room in rooms:
-        analysis = AnalysisService.analyze_room_air_quality(room['id'])
-        efficiency = AnalysisService.evaluate_equipment_efficiency(room['id'])
-        
-        reports_data.append({
-            'room': room,
-            'analysis': analysis,
-            'efficiency': efficiency
-        })
+    with backups.reporting_snapshot() as snapshot:
+        for room in Room.get_all():
+            analysis = AnalysisService.analyze_room_air_quality(room['id'])
+            efficiency = AnalysisService.evaluate_equipment_efficiency(room['id'])
+            statistics = running_aggregates.get_room_summary(room['id'])
+            
+            reports_data.append({
+                'room': room,
+                'analysis': analysis,
+                'efficiency': efficiency,
+                'statistics': statistics
+            })
     
-    return render_template('reports.html', reports=reports_data)
+    return render_template('reports.html', reports=reports_data,
+                         snapshot=snapshot['created_at'] if snapshot else None)
 
-@app.template_filter('status_class')
+def parse_report_period(args):
+    """Разбор периода отчёта из параметров запроса (по умолчанию - последние 7 дней)"""
+    end_date = args.get('end')
+    start_date = args.get('start')
+    
+    end = datetime.fromisoformat(end_date) + timedelta(days=1) if end_date else \
+        datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    start = datetime.fromisoformat(start_date) if start_date else end - timedelta(days=7)
+    
+    room_id = args.get('room_id', type=int)
+    return start, end, [room_id] if room_id else None
+
+def build_compliance_report(start, end, room_ids):
+    """Отчёт о соответствии нормативам (из снимка БД, если он используется для отчётов)"""
+    with backups.reporting_snapshot() as snapshot:
+        report = ComplianceReportService.build_report(start, end, room_ids)
+    report['snapshot'] = snapshot['created_at'] if snapshot else None
+    return report
+
+@bp.route('/reports/compliance')
+def compliance_report():
+    """Страница отчёта о соответствии нормативам за период"""
+    try:
+        start, end, room_ids = parse_report_period(request.args)
+        report = build_compliance_report(start, end, room_ids)
+    except ValueError as e:
+        return f"Некорректный период отчёта: {e}", 400
+    
+    return render_template('compliance_report.html',
+                         report=report,
+                         snapshot=report['snapshot'],
+                         start=start.date().isoformat(),
+                         end=(end - timedelta(days=1)).date().isoformat(),
+                         rooms=Room.get_choices(request.args.get('room_id', type=int)),
+                         room_id=request.args.get('room_id', type=int))
+
+@bp.route('/api/reports/compliance')
+def compliance_report_export():
+    """API: Экспорт отчёта о соответствии нормативам (JSON или CSV)"""
+    try:
+        start, end, room_ids = parse_report_period(request.args)
+        report = build_compliance_report(start, end, room_ids)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if request.args.get('format') == 'csv':
+        filename = f"compliance_{start.date().isoformat()}_{end.date().isoformat()}.csv"
+        return Response(
+            ComplianceReportService.to_csv(report),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    
+    return jsonify({'success': True, 'report': report})
+
+@bp.app_template_filter('status_class')
 def status_class_filter(status):
     """Фильтр для определения CSS класса по статусу"""
     status_map = {
@@ -213,14 +586,42 @@ def status_class_filter(status):
     }
     return status_map.get(status, 'secondary')
 
-@app.template_filter('format_datetime')
+@bp.app_template_filter('reject_keys')
+def reject_keys_filter(params, *keys):
+    """Фильтр для удаления параметров запроса (при построении ссылок на страницы)"""
+    return {k: v for k, v in params.items() if k not in keys}
+
+@bp.app_template_filter('format_age')
+def format_age_filter(seconds):
+    """Фильтр для отображения давности обновления"""
+    if seconds is None:
+        return 'нет данных'
+    if seconds < 60:
+        return f'{max(seconds, 0)} с назад'
+    if seconds < 3600:
+        return f'{seconds // 60} мин назад'
+    if seconds < 86400:
+        return f'{seconds // 3600} ч назад'
+    return f'{seconds // 86400} дн назад'
+
+@bp.app_template_filter('format_datetime')
 def format_datetime_filter(dt):
     """Фильтр для форматирования даты и времени"""
     if isinstance(dt, str):
         dt = datetime.fromisoformat(dt)
     return dt.strftime('%d.%m.%Y %H:%M:%S')
 
+def create_app(config_class=Config):
+    """Фабрика приложения (для сервера разработки и WSGI-воркеров)"""
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    db.db_path = app.config['DB_PATH']
+    app.register_blueprint(bp)
+    return app
+
 if __name__ == '__main__':
+    app = create_app()
+    
     # Инициализация базы данных
     try:
         db.init_db()
@@ -10,6 +10,47 @@ class Config:
     # SQLite настройки
     DB_PATH = os.path.join(os.path.dirname(__file__), 'air_quality.db')
     
+    # Ожидание блокировки при параллельной записи из нескольких воркеров (с)
+    DB_BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', 5.0))
+    
+    # Период проверки изменений БД другими процессами для инвалидации кэшей (с)
+    DB_POLL_SECONDS = float(os.getenv('DB_POLL_SECONDS', 1.0))
+    
+    # Каталог помесячных файлов с измерениями (по умолчанию - partitions рядом с БД)
+    PARTITION_DIR = os.getenv('PARTITION_DIR')
+    
+    # Резервное копирование: онлайн-копирование БД малыми шагами и ротация снимков
+    BACKUP = {
+        'directory': os.getenv('BACKUP_DIR'),   # по умолчанию - backups рядом с БД
+        'pages_per_step': 256,          # страниц за шаг копирования
+        'step_pause': 0.005,            # пауза между шагами для пишущих подключений, с
+        'keep': 7,                      # число хранимых снимков
+        # Тяжёлые отчёты читаются из последнего снимка, если он не старше max_age_minutes
+        'serve_reports': os.getenv('REPORTS_FROM_SNAPSHOT', '0') == '1',
+        'max_age_minutes': 60
+    }
+    
+    # Размер страницы списков помещений, датчиков и оборудования
+    PAGE_SIZE = {
+        'default': 50,
+        'max': 200
+    }
+    
+    # Сводка по помещениям и агрегаты зон: последние значения пересчитываются не чаще раза
+    # в max_age_seconds, изменения помещений, зон, датчиков и оборудования учитываются сразу
+    OVERVIEW = {
+        'max_age_seconds': float(os.getenv('OVERVIEW_MAX_AGE_SECONDS', 5.0))
+    }
+    
+    # Хранилище измерений: sqlite, memory (только память процесса) или tiered (память + SQLite)
+    MEASUREMENT_STORE = os.getenv('MEASUREMENT_STORE', 'sqlite')
+    
+    # Окно недавних измерений в памяти (для memory и tiered)
+    MEMORY_STORE = {
+        'window_hours': 48,
+        'max_points_per_sensor': 200000
+    }
+    
     # Нормативы качества воздуха для РБ
     AIR_QUALITY_STANDARDS = {
         'temperature': {
@@ -35,3 +76,123 @@ class Config:
             'max': 0.25
         }
     }
+    
+    # Физически допустимые диапазоны показаний датчиков
+    SENSOR_VALUE_RANGES = {
+        'temperature': (-40.0, 85.0),
+        'humidity': (0.0, 100.0),
+        'co2': (0.0, 10000.0),
+        'dust': (0.0, 10.0)
+    }
+    
+    # Потоковое обнаружение аномалий в показаниях датчиков
+    ANOMALY_DETECTION = {
+        'ewma_alpha': 0.1,              # вес нового значения в EWMA
+        'warmup_readings': 10,          # число измерений до начала проверки выбросов
+        'spike_z_threshold': 4.0,       # порог z-оценки для выброса
+        'flatline_repeats': 30,         # число одинаковых значений подряд для "залипания"
+        'dropout_seconds': 900,         # максимальный интервал между измерениями
+        'min_std': {                    # нижняя граница СКО (защита от деления на ~0)
+            'temperature': 0.2,
+            'humidity': 0.5,
+            'co2': 15.0,
+            'dust': 0.005
+        }
+    }
+    
+    # Накопительная статистика по датчикам (день / неделя / месяц)
+    AGGREGATES = {
+        'flush_seconds': 60,            # период сохранения накопленных значений в БД
+        'max_gap_seconds': 900          # максимальный интервал, засчитываемый в статус
+    }
+    
+    # Приём измерений со временем по часам устройства (выгрузка накопленных шлюзом данных)
+    INGESTION = {
+        'max_future_seconds': 300,      # допустимое опережение часов устройства
+        'max_age_days': 90              # измерения старше не принимаются
+    }
+    
+    # Отчёт о соответствии нормативам за произвольный период
+    COMPLIANCE_REPORT = {
+        'chunk_size': 100000,           # число строк, считываемых из БД за один шаг
+        'max_gap_seconds': 900,         # максимальный интервал, засчитываемый одному измерению
+        'worst_hours': 5,               # число худших часов в сводке
+        'processes': None,              # размер пула процессов (None - по числу ядер)
+        'parallel_min_sensor_days': 30  # отчёты меньшего объёма (датчики × дни) считаются в процессе запроса
+    }
+    
+    # Краткосрочный прогноз показателей (экспоненциальное сглаживание Холта)
+    FORECASTING = {
+        'alpha': 0.3,                   # сглаживание уровня
+        'beta': 0.1,                    # сглаживание тренда
+        'min_step_seconds': 30,         # минимальный шаг при оценке тренда (защита от всплесков)
+        'horizon_minutes': 20,          # горизонт прогноза по умолчанию
+        'min_horizon_minutes': 15,      # допустимый горизонт прогноза
+        'max_horizon_minutes': 30,
+        'warmup_hours': 2,              # глубина истории для начального состояния
+        'empty_recheck_seconds': 60,    # повторный поиск истории датчика без недавних измерений
+        'max_staleness_minutes': 30     # прогноз не строится по устаревшим данным
+    }
+    
+    # Моделирование конфигураций оборудования на записанной истории помещения
+    SIMULATION = {
+        'step_seconds': 300,            # шаг моделирования и принятия решений
+        'ceiling_height': 3.0,          # высота помещения для расчёта объёма воздуха, м
+        'thermal_mass_factor': 8.0,     # теплоёмкость помещения относительно воздуха
+        'envelope_exchange_per_hour': 0.5,  # скорость возврата к записанным условиям, 1/ч
+        'ventilation_m3h_per_watt': 3.0,    # производительность вентиляции на 1 Вт
+        'humidifier_g_per_h_per_watt': 6.0, # производительность увлажнителя на 1 Вт
+        'cooling_cop': 3.0,             # холодильный коэффициент кондиционера
+        'saturation_g_per_m3': 19.4,    # влагосодержание насыщенного воздуха (~22°C)
+        'outdoor': {'co2': 420.0, 'humidity': 45.0, 'dust': 0.02},
+        'batch_size': 64,               # минимальное число конфигураций в задании пула
+        'max_configurations': 2000,
+        'processes': None               # размер пула процессов (None - по числу ядер)
+    }
+    
+    # Уведомления о критических состояниях (очередь, дайджесты, повторные попытки)
+    ALERTS = {
+        'enabled': os.getenv('ALERTS_ENABLED', '1') == '1',
+        'queue_size': 10000,            # при переполнении события отбрасываются, сбор данных не ждёт
+        'digest_seconds': 60.0,         # не чаще одного уведомления за интервал, события копятся в дайджест
+        'max_digest_events': 200,
+        'cooldown_seconds': 900.0,      # повторная тревога по параметру помещения не раньше
+        'workers': 2,                   # потоки доставки
+        'max_attempts': 5,
+        'backoff_seconds': 2.0,         # пауза перед повтором, удваивается до backoff_max_seconds
+        'backoff_max_seconds': 60.0,
+        # Получатели без обязательного параметра (url, host, path) не используются
+        'sinks': [
+            {'type': 'webhook', 'url': os.getenv('ALERT_WEBHOOK_URL'), 'timeout': 5.0},
+            {'type': 'smtp', 'host': os.getenv('ALERT_SMTP_HOST'),
+             'port': int(os.getenv('ALERT_SMTP_PORT', 25)),
+             'sender': os.getenv('ALERT_SMTP_FROM', 'air-quality@localhost'),
+             'recipients': [r for r in os.getenv('ALERT_SMTP_TO', '').split(',') if r],
+             'username': os.getenv('ALERT_SMTP_USER'), 'password': os.getenv('ALERT_SMTP_PASSWORD'),
+             'starttls': os.getenv('ALERT_SMTP_STARTTLS', '0') == '1', 'timeout': 10.0},
+            {'type': 'file', 'path': os.getenv('ALERT_FILE')}
+        ]
+    }
+    
+    # Правила управления оборудованием по умолчанию
+    # (используются, пока в таблице decision_rules нет ни одного правила)
+    DECISION_RULES = [
+        {'parameter': 'temperature', 'statuses': ['critical_low', 'low'],
+         'equipment_type': 'heating', 'action': 'turn_on',
+         'reason': 'Низкая температура: {value}°C'},
+        {'parameter': 'temperature', 'statuses': ['critical_high', 'high'],
+         'equipment_type': 'air_conditioner', 'action': 'turn_on',
+         'reason': 'Высокая температура: {value}°C'},
+        {'parameter': 'temperature', 'statuses': ['critical_high', 'high'],
+         'equipment_type': 'heating', 'action': 'turn_off', 'equipment_status': 'on',
+         'reason': 'Высокая температура: {value}°C'},
+        {'parameter': 'humidity', 'statuses': ['critical_low', 'low'],
+         'equipment_type': 'humidifier', 'action': 'turn_on',
+         'reason': 'Низкая влажность: {value}%'},
+        {'parameter': 'co2', 'statuses': ['high', 'critical'],
+         'equipment_type': 'ventilation', 'action': 'turn_on',
+         'reason': 'CO2: {value} ppm'},
+        {'parameter': 'dust', 'statuses': ['high', 'critical'],
+         'equipment_type': 'ventilation', 'action': 'turn_on',
+         'reason': 'Пыль: {value} мг/м³'}
+    ]
@@ -0,0 +1,185 @@
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from config import Config
+from database.db import db
+from database.partitions import partitions
+
+class BackupManager:
+    """Онлайн-резервные копии БД и партиций (снимки с ротацией)"""
+    
+    NAME_PATTERN = re.compile(r'^\d{8}_\d{6}$')
+    MANIFEST = 'manifest.json'
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+    
+    @property
+    def directory(self):
+        """Каталог снимков (по умолчанию рядом с основной БД)"""
+        return Config.BACKUP['directory'] or os.path.join(os.path.dirname(os.path.abspath(db.db_path)), 'backups')
+    
+    def _copy(self, source_path, target_path, stats):
+        """Копирование файла БД через online backup API малыми шагами"""
+        settings = Config.BACKUP
+        source = sqlite3.connect(source_path, timeout=Config.DB_BUSY_TIMEOUT)
+        target = sqlite3.connect(target_path)
+        try:
+            # В WAL-режиме чтение в одной транзакции не мешает писателям и даёт согласованную копию
+            # без перезапусков; в режиме журнала блокировка держится только на время шага
+            wal = source.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+            if wal:
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            
+            step_started = time.perf_counter()
+            
+            def progress(status, remaining, total):
+                nonlocal step_started
+                step_ms = (time.perf_counter() - step_started) * 1000
+                # Длительность шага (без WAL - верхняя оценка ожидания писателей), не измеренное ожидание
+                stats['max_step_ms'] = max(stats['max_step_ms'], step_ms)
+                stats['steps'] += 1
+                # Уступаем процессор и блокировки между шагами
+                time.sleep(settings['step_pause'])
+                step_started = time.perf_counter()
+            
+            source.backup(target, pages=settings['pages_per_step'], progress=progress)
+            if wal:
+                source.rollback()
+            
+            # Снимок открывается только для чтения: без WAL не нужны файлы -wal/-shm
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+            source.close()
+        
+        stats['bytes_copied'] += os.path.getsize(target_path)
+    
+    @staticmethod
+    def _fingerprint(path):
+        """Признак изменения партиции (число строк и последний id)"""
+        conn = sqlite3.connect(path, timeout=Config.DB_BUSY_TIMEOUT)
+        try:
+            return list(conn.execute("SELECT COUNT(*), MAX(id) FROM measurements").fetchone())
+        finally:
+            conn.close()
+    
+    def create(self, now=None):
+        """Снимок БД: основная БД копируется всегда, неизменённые партиции - жёсткой ссылкой на прошлый снимок"""
+        now = now or datetime.utcnow()
+        with self._lock:
+            previous = self.latest()
+            name = now.strftime('%Y%m%d_%H%M%S')
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                raise ValueError(f"Снимок уже существует: {name}")
+            
+            staging = f'{path}.tmp{os.getpid()}'
+            os.makedirs(os.path.join(staging, 'partitions'))
+            stats = {'steps': 0, 'max_step_ms': 0.0, 'bytes_copied': 0, 'bytes_linked': 0}
+            started = time.perf_counter()
+            files = {}
+            try:
+                # Основная БД копируется первой: последние значения не ссылаются на отсутствующие в снимке измерения
+                main_name = os.path.basename(db.db_path)
+                self._copy(db.db_path, os.path.join(staging, main_name), stats)
+                files[main_name] = {'mode': 'copied'}
+                
+                for partition in partitions.list_partitions():
+                    filename = os.path.basename(partitions.path_for(partition))
+                    target_path = os.path.join(staging, 'partitions', filename)
+                    fingerprint = self._fingerprint(partitions.path_for(partition))
+                    
+                    linked = False
+                    if previous and previous['files'].get(filename, {}).get('fingerprint') == fingerprint:
+                        try:
+                            os.link(os.path.join(previous['path'], 'partitions', filename), target_path)
+                            stats['bytes_linked'] += os.path.getsize(target_path)
+                            linked = True
+                        except OSError:
+                            # Другая файловая система или снимок удалён - полная копия
+                            pass
+                    if not linked:
+                        self._copy(partitions.path_for(partition), target_path, stats)
+                    
+                    files[filename] = {'mode': 'linked' if linked else 'copied', 'fingerprint': fingerprint}
+                
+                manifest = {
+                    'name': name,
+                    'created_at': now.strftime('%Y-%m-%d %H:%M:%S'),
+                    'duration_ms': (time.perf_counter() - started) * 1000,
+                    **stats,
+                    'files': files
+                }
+                with open(os.path.join(staging, self.MANIFEST), 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, ensure_ascii=False, indent=2)
+                
+                # Снимок появляется целиком или не появляется вовсе
+                os.rename(staging, path)
+            except Exception:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            
+            self.rotate()
+        return {**manifest, 'path': path}
+    
+    def list_snapshots(self):
+        """Завершённые снимки в хронологическом порядке"""
+        if not os.path.isdir(self.directory):
+            return []
+        
+        snapshots = []
+        for name in sorted(os.listdir(self.directory)):
+            manifest_path = os.path.join(self.directory, name, self.MANIFEST)
+            if self.NAME_PATTERN.match(name) and os.path.exists(manifest_path):
+                with open(manifest_path, encoding='utf-8') as f:
+                    snapshots.append({**json.load(f), 'path': os.path.join(self.directory, name)})
+        return snapshots
+    
+    def latest(self):
+        """Последний завершённый снимок"""
+        snapshots = self.list_snapshots()
+        return snapshots[-1] if snapshots else None
+    
+    def rotate(self):
+        """Удаление старых снимков сверх Config.BACKUP['keep'] (связанные файлы остаются у новых)"""
+        removed = []
+        snapshots = self.list_snapshots()
+        for snapshot in snapshots[:max(len(snapshots) - Config.BACKUP['keep'], 0)]:
+            shutil.rmtree(snapshot['path'])
+            removed.append(snapshot['name'])
+        return removed
+    
+    @contextmanager
+    def reporting_snapshot(self, now=None):
+        """Чтение тяжёлых отчётов из последнего снимка (если включено и снимок свежий)"""
+        from database.storage import get_measurement_store
+        
+        settings = Config.BACKUP
+        snapshot = self.latest() if settings['serve_reports'] else None
+        if snapshot is not None:
+            age = (now or datetime.utcnow()) - datetime.fromisoformat(snapshot['created_at'])
+            # Измерения в памяти процесса в снимок не попадают
+            if age.total_seconds() > settings['max_age_minutes'] * 60 or not get_measurement_store().shared:
+                snapshot = None
+        
+        if snapshot is None:
+            yield None
+            return
+        
+        with db.read_snapshot(snapshot['path']):
+            yield snapshot
+
+backups = BackupManager()
+
+if __name__ == '__main__':
+    # Запуск по расписанию (cron): python -m database.backup
+    result = backups.create()
+    print(json.dumps({k: v for k, v in result.items() if k != 'files'}, ensure_ascii=False))
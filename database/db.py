@@ -1,21 +1,140 @@
+import os
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
+from urllib.parse import quote
 from config import Config
 
+def connect_readonly(path):
+    """Подключение к файлу БД только для чтения (снимки резервных копий)"""
+    conn = sqlite3.connect(f'file:{quote(os.path.abspath(path))}?mode=ro', uri=True,
+                           timeout=Config.DB_BUSY_TIMEOUT)
+    conn.row_factory = sqlite3.Row
+    return conn
+
 class Database:
     """Класс для работы с SQLite базой данных"""
     
     def __init__(self):
         self.db_path = Config.DB_PATH
+        self._data_version = 0
+        self._version_lock = threading.Lock()
+        
+        # Наблюдение за изменениями БД из других процессов (воркеров)
+        self._watcher = None
+        self._watcher_key = None
+        self._watched_version = None
+        self._last_poll = 0.0
+        self._generations = {}
+        
+        # Снимок БД, из которого читает текущий поток (отчёты без конкуренции с записью)
+        self._local = threading.local()
+    
+    @property
+    def snapshot(self):
+        """Каталог снимка для чтения в текущем потоке (None - рабочая БД)"""
+        return getattr(self._local, 'snapshot', None)
     
     @contextmanager
-    def get_connection(self):
+    def read_snapshot(self, directory):
+        """Чтение из снимка БД в текущем потоке (подключения только для чтения)"""
+        previous = self.snapshot
+        self._local.snapshot = directory
+        try:
+            yield
+        finally:
+            self._local.snapshot = previous
+    
+    @contextmanager
+    def live(self):
+        """Обращение к рабочей БД внутри чтения из снимка (запись, общие кэши процесса)"""
+        previous = self.snapshot
+        self._local.snapshot = None
+        try:
+            yield
+        finally:
+            self._local.snapshot = previous
+    
+    @property
+    def data_version(self):
+        """Версия данных: увеличивается после каждой транзакции с изменениями (в т.ч. в других процессах)"""
+        self.poll_changes()
+        return self._data_version
+    
+    def bump_data_version(self):
+        """Отметка изменения данных (для инвалидации кэшей)"""
+        with self._version_lock:
+            self._data_version += 1
+    
+    def poll_changes(self, force=False):
+        """Проверка изменений БД другими процессами (не чаще раза в DB_POLL_SECONDS)"""
+        now = time.monotonic()
+        if not force and now - self._last_poll < Config.DB_POLL_SECONDS:
+            return
+        
+        with self._version_lock:
+            if not force and now - self._last_poll < Config.DB_POLL_SECONDS:
+                return
+            self._last_poll = now
+            
+            # Подключение не наследуется дочерним процессом после fork
+            if self._watcher_key != (os.getpid(), self.db_path):
+                self._watcher = sqlite3.connect(self.db_path, timeout=Config.DB_BUSY_TIMEOUT,
+                                                check_same_thread=False)
+                self._watcher_key = (os.getpid(), self.db_path)
+                self._watched_version = None
+            
+            # PRAGMA data_version меняется после фиксации транзакции любым другим подключением
+            version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._watched_version:
+                return
+            
+            self._watched_version = version
+            self._data_version += 1
+            try:
+                self._generations = dict(self._watcher.execute(
+                    "SELECT namespace, generation FROM cache_generations"
+                ).fetchall())
+            except sqlite3.OperationalError:
+                # Схема ещё не создана (до init_db)
+                self._generations = {}
+    
+    def get_generation(self, namespace):
+        """Поколение кэшируемых данных (метаданные датчиков, правила и т.п.)"""
+        self.poll_changes()
+        return self._generations.get(namespace, 0)
+    
+    def bump_generation(self, namespace):
+        """Отметка изменения кэшируемых данных для всех процессов"""
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO cache_generations (namespace, generation) VALUES (?, 1)
+                ON CONFLICT(namespace) DO UPDATE SET generation = generation + 1
+            """, (namespace,))
+            cursor.execute("SELECT generation FROM cache_generations WHERE namespace = ?", (namespace,))
+            generation = cursor.fetchone()[0]
+        
+        with self._version_lock:
+            self._generations[namespace] = max(self._generations.get(namespace, 0), generation)
+        return generation
+    
+    @contextmanager
+    def get_connection(self, attach=None):
         """Контекстный менеджер для безопасной работы с подключением"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        if self.snapshot:
+            conn = connect_readonly(os.path.join(self.snapshot, os.path.basename(self.db_path)))
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=Config.DB_BUSY_TIMEOUT)
+            conn.row_factory = sqlite3.Row
         try:
+            # Дополнительные файлы БД (партиции) в той же транзакции
+            for alias, path in (attach or {}).items():
+                conn.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
             yield conn
             conn.commit()
+            if conn.total_changes:
+                self.bump_data_version()
         except Exception as e:
             conn.rollback()
             raise e
@@ -23,9 +142,9 @@ class Database:
             conn.close()
     
     @contextmanager
-    def get_cursor(self):
+    def get_cursor(self, attach=None):
         """Контекстный менеджер для получения курсора"""
-        with self.get_connection() as conn:
+        with self.get_connection(attach) as conn:
             cursor = conn.cursor()
             try:
                 yield cursor
@@ -34,17 +153,44 @@ class Database:
     
     def init_db(self):
         """Инициализация схемы базы данных"""
+        # WAL позволяет читать параллельно с записью из нескольких процессов
+        with self.get_connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+        
         with self.get_cursor() as cursor:
+            # Иерархия зон (кампус, здание, этаж, крыло): path - материализованный путь из id предков
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS zones (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    parent_id INTEGER,
+                    name TEXT NOT NULL,
+                    zone_type TEXT NOT NULL,
+                    path TEXT NOT NULL UNIQUE,
+                    depth INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (parent_id) REFERENCES zones(id),
+                    UNIQUE (parent_id, name),
+                    CHECK (zone_type IN ('campus', 'building', 'floor', 'wing'))
+                )
+            """)
+            
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS rooms (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     name TEXT NOT NULL UNIQUE,
                     area REAL NOT NULL,
                     description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    zone_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (zone_id) REFERENCES zones(id) ON DELETE SET NULL
                 )
             """)
             
+            # Помещения БД, созданной до появления зон
+            columns = {row['name'] for row in cursor.execute("PRAGMA table_info(rooms)").fetchall()}
+            if 'zone_id' not in columns:
+                cursor.execute("ALTER TABLE rooms ADD COLUMN zone_id INTEGER REFERENCES zones(id)")
+            
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS sensors (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -58,21 +204,18 @@ class Database:
                 )
             """)
             
+            # История измерений хранится в помесячных партициях (database/partitions.py),
+            # в основной БД - только последнее значение каждого датчика
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS measurements (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sensor_id INTEGER,
+                CREATE TABLE IF NOT EXISTS latest_measurements (
+                    sensor_id INTEGER PRIMARY KEY,
+                    measurement_id INTEGER NOT NULL,
                     value REAL NOT NULL,
-                    measured_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    measured_at TIMESTAMP NOT NULL,
                     FOREIGN KEY (sensor_id) REFERENCES sensors(id) ON DELETE CASCADE
                 )
             """)
             
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_measurements_sensor_time 
-                ON measurements(sensor_id, measured_at DESC)
-            """)
-            
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS equipment (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -89,6 +232,175 @@ class Database:
                 )
             """)
             
+            # Индексы для постраничных списков: столбцы фильтра, затем ключ сортировки (поле, id).
+            # Покрыты каждый фильтр с сортировкой по умолчанию и каждая сортировка без фильтров,
+            # так страница читается по индексу без сортировки во временном B-дереве
+            for name, definition in [
+                ('idx_rooms_zone', 'rooms(zone_id)'),
+                ('idx_rooms_area', 'rooms(area, id)'),
+                ('idx_rooms_created', 'rooms(created_at, id)'),
+                ('idx_sensors_room_type', 'sensors(room_id, sensor_type, id)'),
+                ('idx_sensors_type', 'sensors(sensor_type, id)'),
+                ('idx_sensors_status_type', 'sensors(status, sensor_type, id)'),
+                ('idx_sensors_created', 'sensors(created_at, id)'),
+                ('idx_equipment_room_name', 'equipment(room_id, name, id)'),
+                ('idx_equipment_room_type', 'equipment(room_id, equipment_type, id)'),
+                ('idx_equipment_type_name', 'equipment(equipment_type, name, id)'),
+                ('idx_equipment_status_name', 'equipment(status, name, id)'),
+                ('idx_equipment_auto_name', 'equipment(auto_mode, name, id)'),
+                ('idx_equipment_name', 'equipment(name, id)'),
+                ('idx_equipment_type', 'equipment(equipment_type, id)'),
+                ('idx_equipment_created', 'equipment(created_at, id)')
+            ]:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+            
+            # Индексы прежней версии, после которых id не упорядочен
+            for name in ['idx_sensors_type_status', 'idx_sensors_status',
+                         'idx_equipment_type_status', 'idx_equipment_status_auto']:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+            
+            # Журнал переключений оборудования (только добавление)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS equipment_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    equipment_id INTEGER NOT NULL,
+                    old_status TEXT,
+                    new_status TEXT NOT NULL,
+                    source TEXT NOT NULL DEFAULT 'manual',
+                    changed_at TIMESTAMP NOT NULL,
+                    FOREIGN KEY (equipment_id) REFERENCES equipment(id) ON DELETE CASCADE,
+                    CHECK (source IN ('manual', 'auto'))
+                )
+            """)
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_equipment_events_equipment_time 
+                ON equipment_events(equipment_id, changed_at)
+            """)
+            
+            # Время работы оборудования за завершённые месяцы (кэш отчётов об энергопотреблении)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS equipment_energy_monthly (
+                    equipment_id INTEGER NOT NULL,
+                    month TEXT NOT NULL,
+                    on_seconds REAL NOT NULL DEFAULT 0,
+                    switches INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (equipment_id, month),
+                    FOREIGN KEY (equipment_id) REFERENCES equipment(id) ON DELETE CASCADE
+                )
+            """)
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sensor_alerts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sensor_id INTEGER,
+                    room_id INTEGER,
+                    alert_type TEXT NOT NULL,
+                    value REAL,
+                    message TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (sensor_id) REFERENCES sensors(id) ON DELETE CASCADE,
+                    FOREIGN KEY (room_id) REFERENCES rooms(id) ON DELETE CASCADE,
+                    CHECK (alert_type IN ('spike', 'flatline', 'dropout'))
+                )
+            """)
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_sensor_alerts_room_time 
+                ON sensor_alerts(room_id, created_at DESC)
+            """)
+            
+            # Проверка, сообщалось ли уже о пропуске данных датчика
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_sensor_alerts_sensor_type_time
+                ON sensor_alerts(sensor_id, alert_type, created_at)
+            """)
+            
+            # Прежняя таблица хранила уровень по параметру помещения: датчики одного типа
+            # сбивали уровни друг друга. Текущие уровни пересчитываются по новым измерениям
+            columns = {row['name'] for row in cursor.execute("PRAGMA table_info(alert_states)").fetchall()}
+            if columns and 'sensor_id' not in columns:
+                cursor.execute("DROP TABLE alert_states")
+            
+            # Текущий уровень тревоги по датчику: условная смена уровня позволяет одному
+            # из нескольких процессов отправить уведомление о переходе. notified_at - время
+            # тревоги, о которой отправлено уведомление, version - номер последнего изменения
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS alert_states (
+                    sensor_id INTEGER PRIMARY KEY,
+                    room_id INTEGER NOT NULL,
+                    parameter TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    status TEXT,
+                    value REAL,
+                    changed_at TIMESTAMP NOT NULL,
+                    notified_at TIMESTAMP,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    FOREIGN KEY (sensor_id) REFERENCES sensors(id) ON DELETE CASCADE,
+                    FOREIGN KEY (room_id) REFERENCES rooms(id) ON DELETE CASCADE,
+                    CHECK (level IN ('normal', 'critical'))
+                )
+            """)
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_alert_states_version
+                ON alert_states(version)
+            """)
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sensor_aggregates (
+                    sensor_id INTEGER NOT NULL,
+                    period TEXT NOT NULL,
+                    period_start TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    sum REAL NOT NULL DEFAULT 0,
+                    sum_sq REAL NOT NULL DEFAULT 0,
+                    min_value REAL,
+                    max_value REAL,
+                    PRIMARY KEY (sensor_id, period, period_start),
+                    FOREIGN KEY (sensor_id) REFERENCES sensors(id) ON DELETE CASCADE,
+                    CHECK (period IN ('day', 'week', 'month'))
+                )
+            """)
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sensor_aggregate_bands (
+                    sensor_id INTEGER NOT NULL,
+                    period TEXT NOT NULL,
+                    period_start TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    seconds REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (sensor_id, period, period_start, status),
+                    FOREIGN KEY (sensor_id) REFERENCES sensors(id) ON DELETE CASCADE
+                )
+            """)
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS cache_generations (
+                    namespace TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS decision_rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    parameter TEXT NOT NULL,
+                    statuses TEXT,
+                    min_value REAL,
+                    max_value REAL,
+                    equipment_type TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    equipment_status TEXT,
+                    reason TEXT,
+                    enabled INTEGER DEFAULT 1,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    CHECK (parameter IN ('temperature', 'humidity', 'co2', 'dust')),
+                    CHECK (equipment_type IN ('heating', 'ventilation', 'air_conditioner', 'humidifier')),
+                    CHECK (action IN ('turn_on', 'turn_off'))
+                )
+            """)
+            
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS decisions (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -100,5 +412,10 @@ class Database:
                     FOREIGN KEY (room_id) REFERENCES rooms(id) ON DELETE CASCADE
                 )
             """)
+        
+        from database.partitions import partitions
+        partitions.migrate_unique_index()
+        with self.get_connection() as conn:
+            partitions.migrate_legacy(conn)
 
 db = Database()
@@ -0,0 +1,56 @@
+import base64
+import json
+from config import Config
+from database.db import db
+
+def encode_cursor(values):
+    """Курсор страницы: значения ключа сортировки последней строки"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(token):
+    """Разбор курсора страницы"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Некорректный курсор страницы")
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("Некорректный курсор страницы")
+    
+    # Значение поля сортировки (может быть NULL) и id последней строки
+    sort_value, row_id = values
+    if isinstance(sort_value, bool) or not isinstance(sort_value, (str, int, float, type(None))):
+        raise ValueError("Некорректный курсор страницы")
+    if isinstance(row_id, bool) or not isinstance(row_id, int):
+        raise ValueError("Некорректный курсор страницы")
+    return values
+
+def keyset_page(query, id_column, sort_column, sort_key, conditions=None, params=None,
+                descending=False, cursor=None, limit=None):
+    """Страница выборки по ключу (sort_column, id) без OFFSET: работа не зависит от номера страницы"""
+    if limit is not None and limit < 1:
+        raise ValueError(f"Размер страницы должен быть положительным: {limit}")
+    limit = min(limit or Config.PAGE_SIZE['default'], Config.PAGE_SIZE['max'])
+    conditions = list(conditions or [])
+    params = list(params or [])
+    
+    if cursor:
+        conditions.append(f"({sort_column}, {id_column}) {'<' if descending else '>'} (?, ?)")
+        params.extend(decode_cursor(cursor))
+    
+    direction = 'DESC' if descending else 'ASC'
+    sql = query
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {sort_column} {direction}, {id_column} {direction} LIMIT ?"
+    
+    with db.get_cursor() as cur:
+        # Лишняя строка показывает, есть ли следующая страница
+        cur.execute(sql, params + [limit + 1])
+        items = [dict(row) for row in cur.fetchall()]
+    
+    next_cursor = None
+    if items and len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([items[-1][sort_key], items[-1]['id']])
+    
+    return {'items': items, 'next_cursor': next_cursor, 'limit': limit}
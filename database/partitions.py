@@ -0,0 +1,224 @@
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from config import Config
+from database.db import db, connect_readonly
+
+class PartitionManager:
+    """Помесячные файлы SQLite с измерениями (по одному файлу на месяц)"""
+    
+    NAME_PATTERN = re.compile(r'^measurements_(\d{4})_(\d{2})\.db$')
+    
+    # Смещение идентификаторов партиции: id уникальны между месяцами и растут со временем
+    ID_SPACE = 10 ** 10
+    
+    UNIQUE_INDEX = 'idx_measurements_sensor_time_unique'
+    
+    def __init__(self):
+        self._ready = set()
+        self._lock = threading.Lock()
+    
+    @property
+    def directory(self):
+        """Каталог файлов партиций (по умолчанию рядом с основной БД)"""
+        if db.snapshot:
+            return os.path.join(db.snapshot, 'partitions')
+        return Config.PARTITION_DIR or os.path.join(os.path.dirname(os.path.abspath(db.db_path)), 'partitions')
+    
+    @staticmethod
+    def name_for(moment):
+        """Имя партиции (ГГГГ_ММ) для момента времени"""
+        return f'{moment.year:04d}_{moment.month:02d}'
+    
+    @staticmethod
+    def month_start(name):
+        """Начало месяца партиции"""
+        year, month = name.split('_')
+        return datetime(int(year), int(month), 1)
+    
+    @staticmethod
+    def next_month(moment):
+        """Начало следующего месяца"""
+        return datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+    
+    def path_for(self, name):
+        """Путь к файлу партиции"""
+        return os.path.join(self.directory, f'measurements_{name}.db')
+    
+    def list_partitions(self):
+        """Имена существующих партиций в хронологическом порядке"""
+        if not os.path.isdir(self.directory):
+            return []
+        
+        names = []
+        for filename in os.listdir(self.directory):
+            match = self.NAME_PATTERN.match(filename)
+            if match:
+                names.append(f'{match.group(1)}_{match.group(2)}')
+        return sorted(names)
+    
+    def partitions_for_range(self, start=None, end=None):
+        """Партиции, пересекающиеся с периодом [start, end)"""
+        return [
+            name for name in self.list_partitions()
+            if (end is None or self.month_start(name) < end)
+            and (start is None or self.next_month(self.month_start(name)) > start)
+        ]
+    
+    def ensure(self, name):
+        """Создание файла партиции со схемой (однократно для процесса)"""
+        path = self.path_for(name)
+        if path in self._ready and os.path.exists(path):
+            return path
+        
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(path, timeout=Config.DB_BUSY_TIMEOUT, isolation_level=None)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                # Схема создаётся под блокировкой записи, чтобы воркеры не задали смещение id дважды
+                conn.execute("BEGIN IMMEDIATE")
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'measurements'"
+                ).fetchone()
+                if not exists:
+                    conn.execute("""
+                        CREATE TABLE measurements (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            sensor_id INTEGER,
+                            value REAL NOT NULL,
+                            measured_at TIMESTAMP NOT NULL
+                        )
+                    """)
+                    conn.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) VALUES ('measurements', ?)",
+                        (int(name.replace('_', '')) * self.ID_SPACE,)
+                    )
+                    conn.execute(f"CREATE UNIQUE INDEX {self.UNIQUE_INDEX} ON measurements(sensor_id, measured_at)")
+                elif not self._has_unique_index(conn):
+                    # Удаление повторов в партиции прежней схемы не выполняется на пути записи
+                    raise RuntimeError(
+                        f"Партиция {name} не переведена на уникальный индекс измерений: выполните python init_db.py"
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+            
+            self._ready.add(path)
+        return path
+    
+    @classmethod
+    def _has_unique_index(cls, conn):
+        """Есть ли в партиции уникальный индекс (sensor_id, measured_at)"""
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (cls.UNIQUE_INDEX,)
+        ).fetchone() is not None
+    
+    def migrate_unique_index(self):
+        """Перевод партиций прежней схемы на уникальный индекс (однократно, из init_db)"""
+        removed = 0
+        for name in self.list_partitions():
+            conn = sqlite3.connect(self.path_for(name), timeout=Config.DB_BUSY_TIMEOUT, isolation_level=None)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                if not self._has_unique_index(conn):
+                    # Из измерений датчика с одинаковым временем остаётся последняя запись
+                    # (на неё ссылаются последние значения), остальные удаляются
+                    removed += conn.execute("""
+                        DELETE FROM measurements WHERE id NOT IN (
+                            SELECT MAX(id) FROM measurements GROUP BY sensor_id, measured_at
+                        )
+                    """).rowcount
+                    conn.execute("DROP INDEX IF EXISTS idx_measurements_sensor_time")
+                    conn.execute(f"CREATE UNIQUE INDEX {self.UNIQUE_INDEX} ON measurements(sensor_id, measured_at)")
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+        return removed
+    
+    @contextmanager
+    def read(self, name):
+        """Подключение для чтения одной партиции (без ATTACH к основной БД)"""
+        if db.snapshot:
+            conn = connect_readonly(self.path_for(name))
+        else:
+            conn = sqlite3.connect(self.path_for(name), timeout=Config.DB_BUSY_TIMEOUT)
+            conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def drop(self, name):
+        """Удаление партиции за месяц (удаление файла)"""
+        if name == self.name_for(datetime.utcnow()):
+            raise ValueError("Нельзя удалить текущую партицию")
+        
+        path = self.path_for(name)
+        if not os.path.exists(path):
+            raise ValueError(f"Партиция не найдена: {name}")
+        
+        with self._lock:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            self._ready.discard(path)
+        
+        db.bump_data_version()
+    
+    def describe(self):
+        """Список партиций с размерами файлов"""
+        return [
+            {'name': name, 'size_bytes': os.path.getsize(self.path_for(name))}
+            for name in self.list_partitions()
+        ]
+    
+    def migrate_legacy(self, conn):
+        """Перенос измерений из таблицы основной БД по партициям (однократно)"""
+        legacy = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'measurements'"
+        ).fetchone()
+        if not legacy:
+            return 0
+        
+        months = [row[0] for row in conn.execute(
+            "SELECT DISTINCT strftime('%Y_%m', measured_at) FROM measurements WHERE measured_at IS NOT NULL"
+        )]
+        moved = 0
+        for name in months:
+            conn.execute("ATTACH DATABASE ? AS part", (self.ensure(name),))
+            # Из повторов (датчик, время) сохраняется запись с наибольшим id, как при переводе на уникальный индекс
+            moved += conn.execute("""
+                INSERT OR IGNORE INTO part.measurements (id, sensor_id, value, measured_at)
+                SELECT id, sensor_id, value, measured_at FROM main.measurements
+                WHERE strftime('%Y_%m', measured_at) = ?
+                ORDER BY id DESC
+            """, (name,)).rowcount
+            conn.commit()
+            conn.execute("DETACH DATABASE part")
+        
+        conn.execute("""
+            INSERT INTO latest_measurements (sensor_id, measurement_id, value, measured_at)
+            SELECT sensor_id, id, value, measured_at FROM measurements m
+            WHERE id = (
+                SELECT id FROM measurements WHERE sensor_id = m.sensor_id
+                ORDER BY measured_at DESC, id DESC LIMIT 1
+            )
+            ON CONFLICT(sensor_id) DO NOTHING
+        """)
+        conn.execute("DROP TABLE measurements")
+        conn.commit()
+        return moved
+
+partitions = PartitionManager()
@@ -0,0 +1,472 @@
+import itertools
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from config import Config
+from database.db import db
+from database.partitions import partitions
+
+EPOCH = datetime(1970, 1, 1)
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def to_seconds(moment):
+    """Unix-время (целые секунды) для naive datetime в UTC"""
+    return int((moment - EPOCH).total_seconds())
+
+def format_seconds(seconds):
+    """Строка времени в формате БД для unix-времени"""
+    return (EPOCH + timedelta(seconds=seconds)).strftime(TIMESTAMP_FORMAT)
+
+class MeasurementStore(ABC):
+    """Интерфейс хранилища измерений"""
+    
+    # Данные видны другим процессам (пулу отчётов, воркерам gunicorn)
+    shared = True
+    
+    def append(self, readings):
+        """Сохранение измерений [(sensor_id, value, measured_at)]; возвращает их id (None - уже сохранено)"""
+        return self.append_series(readings)[0]
+    
+    @abstractmethod
+    def append_series(self, readings, context_seconds=None):
+        """Сохранение измерений; возвращает их id и ряды датчиков на момент записи [(sensor_id, ряд)]"""
+        # Ряд - [(unix-время, значение, новое ли)] за период новых измерений ± context_seconds
+        # и первое измерение после него (context_seconds=None - без рядов)
+    
+    @abstractmethod
+    def latest(self, sensor_ids=None):
+        """Последние измерения датчиков {sensor_id: {id, sensor_id, value, measured_at}}"""
+    
+    @abstractmethod
+    def range(self, sensor_id, start, end=None):
+        """Измерения датчика за период [start, end) по возрастанию времени"""
+    
+    @abstractmethod
+    def iter_range_chunks(self, sensor_id, start, end, chunk_size):
+        """Измерения датчика за период порциями кортежей (unix-время, значение)"""
+
+class SQLiteMeasurementStore(MeasurementStore):
+    """Хранилище измерений в помесячных партициях SQLite"""
+    
+    def append_series(self, readings, context_seconds=None):
+        ids = [None] * len(readings)
+        context = []
+        by_partition = {}
+        for i, (_, _, measured_at) in enumerate(readings):
+            by_partition.setdefault(partitions.name_for(measured_at), []).append(i)
+        
+        # Измерения за разные месяцы (выгрузка накопленных данных) - по транзакции на партицию
+        for name, positions in by_partition.items():
+            with db.get_cursor(attach={'part': partitions.ensure(name)}) as cursor:
+                # isoformat даёт формат TIMESTAMP_FORMAT заметно быстрее strftime
+                rows = [
+                    (readings[i][0], readings[i][1], readings[i][2].isoformat(sep=' ', timespec='seconds'))
+                    for i in positions
+                ]
+                
+                # Блокировка записи партиции берётся до чтения последовательности:
+                # все id больше прочитанного значения выданы этой транзакции
+                cursor.execute("UPDATE part.sqlite_sequence SET seq = seq WHERE name = 'measurements'")
+                cursor.execute("SELECT seq FROM part.sqlite_sequence WHERE name = 'measurements'")
+                last_id = cursor.fetchone()[0]
+                
+                # Повтор (sensor_id, measured_at) отсекается уникальным индексом партиции
+                cursor.executemany("""
+                    INSERT INTO part.measurements (sensor_id, value, measured_at) VALUES (?, ?, ?)
+                    ON CONFLICT(sensor_id, measured_at) DO NOTHING
+                """, rows)
+                cursor.row_factory = None
+                cursor.execute("SELECT sensor_id, measured_at, id FROM part.measurements WHERE id > ?", (last_id,))
+                inserted = {(sensor_id, timestamp): measurement_id for sensor_id, timestamp, measurement_id in cursor}
+                
+                latest = {}
+                for i, (sensor_id, value, timestamp) in zip(positions, rows):
+                    # Повтор внутри пакета получает None, как и уже сохранённое измерение
+                    ids[i] = inserted.pop((sensor_id, timestamp), None)
+                    if ids[i] is not None and (sensor_id not in latest or timestamp >= latest[sensor_id][3]):
+                        latest[sensor_id] = (sensor_id, ids[i], value, timestamp)
+                
+                # Ряды читаются в транзакции записи: в них учтены все ранее зафиксированные измерения
+                if context_seconds is not None:
+                    new = {}
+                    for i in positions:
+                        if ids[i] is not None:
+                            new.setdefault(readings[i][0], []).append(readings[i][2])
+                    new_ids = {measurement_id for measurement_id in ids if measurement_id is not None}
+                    delta = timedelta(seconds=context_seconds)
+                    for sensor_id, moments in new.items():
+                        context.append((sensor_id, self._context(
+                            cursor, name, sensor_id, min(moments) - delta, max(moments) + delta, new_ids)))
+                
+                # Запоздавшие измерения не вытесняют более свежее последнее значение
+                cursor.executemany("""
+                    INSERT INTO latest_measurements (sensor_id, measurement_id, value, measured_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(sensor_id) DO UPDATE SET
+                        measurement_id = excluded.measurement_id,
+                        value = excluded.value,
+                        measured_at = excluded.measured_at
+                    WHERE excluded.measured_at >= latest_measurements.measured_at
+                """, list(latest.values()))
+        return ids, context
+    
+    @staticmethod
+    def _window(cursor, table, sensor_id, start, end, new_ids=()):
+        """Измерения датчика за [start, end] и первое измерение после end"""
+        cursor.row_factory = None
+        cursor.execute(f"""
+            SELECT CAST(strftime('%s', measured_at) AS INTEGER), value, id FROM {table}
+            WHERE sensor_id = ? AND measured_at >= ? AND measured_at <= ?
+            ORDER BY measured_at ASC
+        """, (sensor_id, start, end))
+        points = [(ts, value, measurement_id in new_ids) for ts, value, measurement_id in cursor.fetchall()]
+        cursor.execute(f"""
+            SELECT CAST(strftime('%s', measured_at) AS INTEGER), value FROM {table}
+            WHERE sensor_id = ? AND measured_at > ?
+            ORDER BY measured_at ASC LIMIT 1
+        """, (sensor_id, end))
+        following = cursor.fetchone()
+        return points, None if following is None else (following[0], following[1], False)
+    
+    def _context(self, cursor, name, sensor_id, start, end, new_ids):
+        """Ряд датчика за [start, end] с первым измерением после end (окно может захватывать соседние месяцы)"""
+        bounds = (start.isoformat(sep=' ', timespec='seconds'), end.isoformat(sep=' ', timespec='seconds'))
+        points = []
+        for other in partitions.partitions_for_range(start, partitions.month_start(name)):
+            with partitions.read(other) as conn:
+                points += self._window(conn.cursor(), 'measurements', sensor_id, *bounds)[0]
+        
+        window, following = self._window(cursor, 'part.measurements', sensor_id, *bounds, new_ids)
+        points += window
+        for other in partitions.list_partitions():
+            if following is not None:
+                break
+            if other > name:
+                with partitions.read(other) as conn:
+                    window, following = self._window(conn.cursor(), 'measurements', sensor_id, *bounds)
+                    points += window
+        
+        return points + ([following] if following is not None else [])
+    
+    def latest(self, sensor_ids=None):
+        query = "SELECT measurement_id AS id, sensor_id, value, measured_at FROM latest_measurements"
+        params = []
+        if sensor_ids is not None:
+            sensor_ids = list(sensor_ids)
+            if not sensor_ids:
+                return {}
+            query += f" WHERE sensor_id IN ({', '.join('?' * len(sensor_ids))})"
+            params = sensor_ids
+        
+        with db.get_cursor() as cursor:
+            cursor.execute(query, params)
+            return {row['sensor_id']: dict(row) for row in cursor.fetchall()}
+    
+    def range(self, sensor_id, start, end=None):
+        conditions = "sensor_id = ? AND measured_at >= ?"
+        params = [sensor_id, start.strftime(TIMESTAMP_FORMAT)]
+        if end is not None:
+            conditions += " AND measured_at < ?"
+            params.append(end.strftime(TIMESTAMP_FORMAT))
+        
+        result = []
+        for name in partitions.partitions_for_range(start, end):
+            with partitions.read(name) as conn:
+                rows = conn.execute(
+                    f"SELECT * FROM measurements WHERE {conditions} ORDER BY measured_at ASC", params
+                ).fetchall()
+                result.extend(dict(row) for row in rows)
+        return result
+    
+    def iter_range_chunks(self, sensor_id, start, end, chunk_size):
+        params = (sensor_id, start.strftime(TIMESTAMP_FORMAT), end.strftime(TIMESTAMP_FORMAT))
+        
+        for name in partitions.partitions_for_range(start, end):
+            with partitions.read(name) as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                cursor.execute("""
+                    SELECT CAST(strftime('%s', measured_at) AS INTEGER), value
+                    FROM measurements
+                    WHERE sensor_id = ? AND measured_at >= ? AND measured_at < ?
+                    ORDER BY measured_at ASC
+                """, params)
+                
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+
+class SensorSeries:
+    """Ряд измерений датчика в массивах array (кольцевой буфер со сдвигом начала)"""
+    
+    __slots__ = ('ids', 'timestamps', 'values', 'offset', 'complete_from')
+    
+    def __init__(self, complete_from):
+        self.ids = array('q')
+        self.timestamps = array('q')
+        self.values = array('d')
+        self.offset = 0
+        # Начиная с этого момента ряд содержит все измерения датчика
+        self.complete_from = complete_from
+    
+    def __len__(self):
+        return len(self.timestamps) - self.offset
+    
+    def append(self, measurement_id, ts, value):
+        """Добавление измерения (с сохранением порядка по времени)"""
+        if not len(self) or ts >= self.timestamps[-1]:
+            position = len(self.timestamps)
+        else:
+            position = bisect_right(self.timestamps, ts, self.offset)
+        
+        # Повторная запись того же измерения (после прогрева из БД) пропускается
+        if self.has(ts, position):
+            return False
+        
+        if position == len(self.timestamps):
+            self.ids.append(measurement_id)
+            self.timestamps.append(ts)
+            self.values.append(value)
+        else:
+            self.ids.insert(position, measurement_id)
+            self.timestamps.insert(position, ts)
+            self.values.insert(position, value)
+        return True
+    
+    def has(self, ts, position=None):
+        """Есть ли в ряду измерение с этим временем (время уникально для датчика)"""
+        position = bisect_right(self.timestamps, ts, self.offset) if position is None else position
+        return position > self.offset and self.timestamps[position - 1] == ts
+    
+    def trim(self, min_ts, max_points):
+        """Отбрасывание измерений старше min_ts и сверх max_points"""
+        drop = max(bisect_left(self.timestamps, min_ts, self.offset) - self.offset, len(self) - max_points, 0)
+        if not drop:
+            return
+        
+        self.offset += drop
+        self.complete_from = max(self.complete_from, self.timestamps[self.offset - 1] + 1)
+        
+        # Сжатие массивов, когда отброшенная часть превышает половину (амортизированно O(1))
+        if self.offset * 2 > len(self.timestamps):
+            del self.ids[:self.offset]
+            del self.timestamps[:self.offset]
+            del self.values[:self.offset]
+            self.offset = 0
+    
+    def bounds(self, start_ts, end_ts=None):
+        """Индексы измерений периода [start_ts, end_ts)"""
+        lo = bisect_left(self.timestamps, start_ts, self.offset)
+        hi = len(self.timestamps) if end_ts is None else bisect_left(self.timestamps, end_ts, lo)
+        return lo, hi
+
+class MemoryMeasurementStore(MeasurementStore):
+    """Хранилище измерений в памяти процесса за скользящее окно"""
+    
+    shared = False
+    
+    def __init__(self, settings=None):
+        self.settings = settings or Config.MEMORY_STORE
+        self._series = {}
+        self._latest = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+    
+    def _trim_threshold(self, now_ts):
+        """Граница окна хранения"""
+        return now_ts - self.settings['window_hours'] * 3600
+    
+    def add(self, sensor_id, measurement_id, ts, value, complete_from=None):
+        """Добавление измерения с известным id (вызывается под блокировкой)"""
+        series = self._series.get(sensor_id)
+        if series is None:
+            series = self._series[sensor_id] = SensorSeries(ts if complete_from is None else complete_from)
+        series.append(measurement_id, ts, value)
+        series.trim(self._trim_threshold(max(ts, series.timestamps[-1])), self.settings['max_points_per_sensor'])
+        self.set_latest(sensor_id, measurement_id, ts, value)
+    
+    def set_latest(self, sensor_id, measurement_id, ts, value):
+        """Обновление последнего значения, если измерение не старше текущего"""
+        current = self._latest.get(sensor_id)
+        if current is None or ts >= current[1]:
+            self._latest[sensor_id] = (measurement_id, ts, value)
+    
+    def append_series(self, readings, context_seconds=None, ids=None):
+        result = []
+        context = []
+        with self._lock:
+            for i, (sensor_id, value, measured_at) in enumerate(readings):
+                ts = to_seconds(measured_at)
+                series = self._series.get(sensor_id)
+                # Без внешних id повтор определяется по времени измерения в ряду датчика
+                measurement_id = ids[i] if ids is not None else (
+                    None if series is not None and series.has(ts) else next(self._ids))
+                if measurement_id is not None:
+                    self.add(sensor_id, measurement_id, ts, value)
+                result.append(measurement_id)
+            
+            if context_seconds is not None:
+                new = {}
+                for (sensor_id, _, measured_at), measurement_id in zip(readings, result):
+                    if measurement_id is not None:
+                        new.setdefault(sensor_id, []).append(to_seconds(measured_at))
+                new_ids = {measurement_id for measurement_id in result if measurement_id is not None}
+                for sensor_id, moments in new.items():
+                    series = self._series[sensor_id]
+                    lo, hi = series.bounds(min(moments) - context_seconds, max(moments) + context_seconds + 1)
+                    # Ряд с первым измерением после окна
+                    hi = min(hi + 1, len(series.timestamps))
+                    context.append((sensor_id, [
+                        (series.timestamps[i], series.values[i], series.ids[i] in new_ids) for i in range(lo, hi)
+                    ]))
+        
+        # Запись не затрагивает БД, поэтому кэши сбрасываются явно
+        db.bump_data_version()
+        return result, context
+    
+    def load(self, sensor_id, rows, complete_from):
+        """Замена ряда датчика данными из другого хранилища (прогрев)"""
+        with self._lock:
+            previous = self._series.pop(sensor_id, None)
+            series = self._series[sensor_id] = SensorSeries(complete_from)
+            for row in rows:
+                series.append(row['id'], to_seconds(datetime.fromisoformat(row['measured_at'])), row['value'])
+            
+            # Измерения, добавленные после чтения из БД, сохраняются
+            if previous is not None:
+                for i in range(previous.offset, len(previous.timestamps)):
+                    series.append(previous.ids[i], previous.timestamps[i], previous.values[i])
+    
+    def covers(self, sensor_id, start):
+        """Содержит ли память все измерения датчика начиная с start"""
+        series = self._series.get(sensor_id)
+        return series is not None and to_seconds(start) >= series.complete_from
+    
+    def latest(self, sensor_ids=None):
+        with self._lock:
+            sensor_ids = list(self._latest) if sensor_ids is None else sensor_ids
+            result = {}
+            for sensor_id in sensor_ids:
+                latest = self._latest.get(sensor_id)
+                if latest is not None:
+                    result[sensor_id] = {
+                        'id': latest[0],
+                        'sensor_id': sensor_id,
+                        'value': latest[2],
+                        'measured_at': format_seconds(latest[1])
+                    }
+            return result
+    
+    def _slice(self, sensor_id, start, end):
+        """Копии массивов ряда за период"""
+        with self._lock:
+            series = self._series.get(sensor_id)
+            if series is None:
+                return array('q'), array('q'), array('d')
+            lo, hi = series.bounds(to_seconds(start), None if end is None else to_seconds(end))
+            return series.ids[lo:hi], series.timestamps[lo:hi], series.values[lo:hi]
+    
+    def range(self, sensor_id, start, end=None):
+        ids, timestamps, values = self._slice(sensor_id, start, end)
+        return [
+            {'id': measurement_id, 'sensor_id': sensor_id, 'value': value, 'measured_at': format_seconds(ts)}
+            for measurement_id, ts, value in zip(ids, timestamps, values)
+        ]
+    
+    def iter_range_chunks(self, sensor_id, start, end, chunk_size):
+        _, timestamps, values = self._slice(sensor_id, start, end)
+        for i in range(0, len(timestamps), chunk_size):
+            yield list(zip(timestamps[i:i + chunk_size], values[i:i + chunk_size]))
+
+class TieredMeasurementStore(MeasurementStore):
+    """SQLite для всей истории и память для недавнего окна и последних значений"""
+    
+    # Окно и последние значения в памяти не видят записи других процессов
+    shared = False
+    
+    def __init__(self, cold=None, hot=None):
+        self.cold = cold or SQLiteMeasurementStore()
+        self.hot = hot or MemoryMeasurementStore()
+        self._warm = set()
+        self._latest_loaded = False
+        self._lock = threading.Lock()
+    
+    def _ensure_latest(self):
+        """Однократная загрузка последних значений всех датчиков"""
+        if self._latest_loaded:
+            return
+        with self._lock:
+            if self._latest_loaded:
+                return
+            # Кэш процесса заполняется из рабочей БД, даже если поток читает снимок
+            with db.live():
+                rows = self.cold.latest()
+            for sensor_id, row in rows.items():
+                with self.hot._lock:
+                    self.hot.set_latest(sensor_id, row['id'],
+                                        to_seconds(datetime.fromisoformat(row['measured_at'])), row['value'])
+            self._latest_loaded = True
+    
+    def _ensure_warm(self, sensor_id):
+        """Однократная загрузка окна истории датчика в память"""
+        if sensor_id in self._warm:
+            return
+        with self._lock:
+            if sensor_id in self._warm:
+                return
+            start = datetime.utcnow() - timedelta(hours=self.hot.settings['window_hours'])
+            with db.live():
+                rows = self.cold.range(sensor_id, start)
+            self.hot.load(sensor_id, rows, to_seconds(start))
+            self._warm.add(sensor_id)
+    
+    def append_series(self, readings, context_seconds=None):
+        ids, context = self.cold.append_series(readings, context_seconds)
+        self.hot.append_series(readings, ids=ids)
+        return ids, context
+    
+    def latest(self, sensor_ids=None):
+        self._ensure_latest()
+        return self.hot.latest(sensor_ids)
+    
+    def range(self, sensor_id, start, end=None):
+        self._ensure_warm(sensor_id)
+        if self.hot.covers(sensor_id, start):
+            return self.hot.range(sensor_id, start, end)
+        return self.cold.range(sensor_id, start, end)
+    
+    def iter_range_chunks(self, sensor_id, start, end, chunk_size):
+        self._ensure_warm(sensor_id)
+        if self.hot.covers(sensor_id, start):
+            return self.hot.iter_range_chunks(sensor_id, start, end, chunk_size)
+        return self.cold.iter_range_chunks(sensor_id, start, end, chunk_size)
+
+STORES = {
+    'sqlite': SQLiteMeasurementStore,
+    'memory': MemoryMeasurementStore,
+    'tiered': TieredMeasurementStore
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_measurement_store():
+    """Хранилище измерений, выбранное в Config.MEASUREMENT_STORE"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if Config.MEASUREMENT_STORE not in STORES:
+                    raise ValueError(f"Неизвестное хранилище измерений: {Config.MEASUREMENT_STORE}")
+                _store = STORES[Config.MEASUREMENT_STORE]()
+    return _store
+
+def set_measurement_store(store):
+    """Замена хранилища измерений (для тестов и демонстрационных развёртываний)"""
+    global _store
+    with _store_lock:
+        _store = store
@@ -0,0 +1,27 @@
+"""
+Конфигурация gunicorn для запуска приложения в нескольких процессах
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5001')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+
+# Каждый воркер импортирует приложение сам: подключения SQLite не переживают fork
+preload_app = False
+
+def on_starting(server):
+    """Инициализация схемы БД один раз в мастер-процессе до запуска воркеров"""
+    from database.db import db
+    db.init_db()
+
+def worker_exit(server, worker):
+    """Сохранение накопленной статистики датчиков и отправка ожидающих уведомлений при остановке воркера"""
+    from services.aggregates import running_aggregates
+    from services.alerting import alert_dispatcher
+    running_aggregates.flush()
+    alert_dispatcher.stop()
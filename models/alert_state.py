@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+from database.db import db
+
+class AlertState:
+    """Модель текущего уровня тревоги по датчику (общая для всех процессов)"""
+    
+    VALID_LEVELS = ['normal', 'critical']
+    
+    # Номер изменения строки: следующий после наибольшего (вычисляется в том же запросе)
+    NEXT_VERSION = "(SELECT COALESCE(MAX(version), 0) + 1 FROM alert_states)"
+    
+    @staticmethod
+    def get_generation():
+        """Поколение состояний тревог (меняется при каждом переходе в любом процессе)"""
+        return db.get_generation('alert_states')
+    
+    @staticmethod
+    def get_changes(since_version):
+        """Уровни датчиков, изменённые после since_version"""
+        with db.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT sensor_id, level, version FROM alert_states WHERE version > ?", (since_version,)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def transition(sensor_id, room_id, parameter, level, status, value, changed_at, cooldown_seconds=0):
+        """Фиксация уровня: ('changed' - сменился, 'created' - первое наблюдение или None, уведомлять ли)"""
+        if level not in AlertState.VALID_LEVELS:
+            raise ValueError(f"Недопустимый уровень тревоги: {level}")
+        
+        version = AlertState.NEXT_VERSION
+        cutoff = datetime.fromisoformat(changed_at) - timedelta(seconds=cooldown_seconds)
+        with db.get_cursor() as cursor:
+            # Каждое условное обновление атомарно: переход засчитывается только одному процессу.
+            # О тревоге уведомляется не чаще раза в cooldown_seconds, о восстановлении - только
+            # если было отправлено уведомление о завершившейся тревоге (notified_at = changed_at)
+            if level == 'critical':
+                cursor.execute(f"""
+                    UPDATE alert_states SET level = ?, status = ?, value = ?, changed_at = ?, notified_at = ?,
+                                            version = {version}
+                    WHERE sensor_id = ? AND level != ?
+                    AND (notified_at IS NULL OR notified_at <= ?)
+                """, (level, status, value, changed_at, changed_at, sensor_id, level,
+                      cutoff.strftime('%Y-%m-%d %H:%M:%S')))
+            else:
+                cursor.execute(f"""
+                    UPDATE alert_states SET level = ?, status = ?, value = ?, changed_at = ?, version = {version}
+                    WHERE sensor_id = ? AND level != ? AND notified_at = changed_at
+                """, (level, status, value, changed_at, sensor_id, level))
+            if cursor.rowcount:
+                result, notify = 'changed', True
+            else:
+                cursor.execute(f"""
+                    UPDATE alert_states SET level = ?, status = ?, value = ?, changed_at = ?, version = {version}
+                    WHERE sensor_id = ? AND level != ?
+                """, (level, status, value, changed_at, sensor_id, level))
+                result, notify = ('changed', False) if cursor.rowcount else (None, False)
+            
+            if result is None:
+                notified_at = changed_at if level == 'critical' else None
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO alert_states
+                    (sensor_id, room_id, parameter, level, status, value, changed_at, notified_at, version)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, {version})
+                """, (sensor_id, room_id, parameter, level, status, value, changed_at, notified_at))
+                if cursor.rowcount:
+                    result, notify = 'created', level == 'critical'
+        
+        if result is not None:
+            db.bump_generation('alert_states')
+        return result, notify
+    
+    @staticmethod
+    def get_active():
+        """Датчики в критическом состоянии"""
+        with db.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT a.*, r.name AS room_name, s.location
+                FROM alert_states a
+                JOIN rooms r ON r.id = a.room_id
+                JOIN sensors s ON s.id = a.sensor_id
+                WHERE a.level = 'critical'
+                ORDER BY a.changed_at DESC
+            """)
+            return [dict(row) for row in cursor.fetchall()]
@@ -0,0 +1,145 @@
+import math
+import numbers
+import string
+from database.db import db
+from models.sensor import Sensor
+from models.equipment import Equipment
+
+class DecisionRule:
+    """Модель правила управления оборудованием"""
+    
+    VALID_ACTIONS = ['turn_on', 'turn_off']
+    
+    # Статусы оценки параметра (AnalysisService.evaluate_parameter)
+    PARAMETER_STATUSES = {
+        'temperature': ['critical_low', 'low', 'optimal', 'high', 'critical_high'],
+        'humidity': ['critical_low', 'low', 'optimal', 'high', 'critical_high'],
+        'co2': ['optimal', 'acceptable', 'high', 'critical'],
+        'dust': ['optimal', 'acceptable', 'high', 'critical']
+    }
+    
+    # Поля, доступные в шаблоне пояснения
+    REASON_FIELDS = ['parameter', 'value']
+    
+    def __init__(self, id=None, parameter=None, statuses=None, min_value=None, max_value=None,
+                 equipment_type=None, action=None, equipment_status=None, reason=None, enabled=True):
+        self.id = id
+        self.parameter = parameter
+        self.statuses = statuses
+        self.min_value = min_value
+        self.max_value = max_value
+        self.equipment_type = equipment_type
+        self.action = action
+        self.equipment_status = equipment_status
+        self.reason = reason
+        self.enabled = enabled
+    
+    @staticmethod
+    def get_version():
+        """Версия набора правил (общая для всех процессов приложения)"""
+        return db.get_generation('decision_rules')
+    
+    @staticmethod
+    def bump_version():
+        """Отметка изменения набора правил"""
+        db.bump_generation('decision_rules')
+    
+    @staticmethod
+    def validate(rule):
+        """Проверка описания правила"""
+        if rule.get('parameter') not in Sensor.VALID_TYPES:
+            raise ValueError(f"Недопустимый параметр: {rule.get('parameter')}")
+        if rule.get('equipment_type') not in Equipment.VALID_TYPES:
+            raise ValueError(f"Недопустимый тип оборудования: {rule.get('equipment_type')}")
+        if rule.get('action') not in DecisionRule.VALID_ACTIONS:
+            raise ValueError(f"Недопустимое действие: {rule.get('action')}")
+        if rule.get('equipment_status') not in (None, *Equipment.VALID_STATUSES):
+            raise ValueError(f"Недопустимый статус оборудования: {rule.get('equipment_status')}")
+        if not rule.get('statuses') and rule.get('min_value') is None and rule.get('max_value') is None:
+            raise ValueError("Правило должно содержать условие по статусу или значению")
+        
+        statuses = rule.get('statuses') or []
+        if not isinstance(statuses, list):
+            raise ValueError("Статусы правила задаются списком")
+        invalid = [status for status in statuses if status not in DecisionRule.PARAMETER_STATUSES[rule['parameter']]]
+        if invalid:
+            raise ValueError(f"Недопустимые статусы для параметра {rule['parameter']}: {invalid}")
+        
+        for field in ('min_value', 'max_value'):
+            value = rule.get(field)
+            if value is not None and (
+                isinstance(value, bool) or not isinstance(value, numbers.Real) or not math.isfinite(value)
+            ):
+                raise ValueError(f"Граница значения {field} должна быть числом: {value!r}")
+        min_value, max_value = rule.get('min_value'), rule.get('max_value')
+        if min_value is not None and max_value is not None and min_value > max_value:
+            raise ValueError(f"Нижняя граница больше верхней: {min_value} > {max_value}")
+        
+        if rule.get('reason') is not None:
+            DecisionRule.validate_reason(rule['reason'])
+    
+    @staticmethod
+    def validate_reason(reason):
+        """Проверка шаблона пояснения: только поля {parameter} и {value}"""
+        if not isinstance(reason, str):
+            raise ValueError("Пояснение правила должно быть строкой")
+        try:
+            fields = [field for _, field, _, _ in string.Formatter().parse(reason) if field is not None]
+        except ValueError as e:
+            raise ValueError(f"Некорректный шаблон пояснения: {e}")
+        
+        invalid = [field for field in fields if field not in DecisionRule.REASON_FIELDS]
+        if invalid:
+            raise ValueError(
+                f"Недопустимые поля в шаблоне пояснения: {invalid}; допустимы: {DecisionRule.REASON_FIELDS}"
+            )
+    
+    @staticmethod
+    def create(rule):
+        """Создание нового правила"""
+        DecisionRule.validate(rule)
+        
+        with db.get_cursor() as cursor:
+            cursor.execute(
+                """INSERT INTO decision_rules
+                   (parameter, statuses, min_value, max_value, equipment_type, action, equipment_status, reason)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (rule['parameter'], ','.join(rule.get('statuses') or []) or None,
+                 rule.get('min_value'), rule.get('max_value'), rule['equipment_type'],
+                 rule['action'], rule.get('equipment_status'), rule.get('reason'))
+            )
+            rule_id = cursor.lastrowid
+        
+        DecisionRule.bump_version()
+        return rule_id
+    
+    @staticmethod
+    def set_enabled(rule_id, enabled):
+        """Включение или отключение правила"""
+        with db.get_cursor() as cursor:
+            cursor.execute(
+                "UPDATE decision_rules SET enabled = ? WHERE id = ?",
+                (1 if enabled else 0, rule_id)
+            )
+        
+        DecisionRule.bump_version()
+    
+    @staticmethod
+    def delete(rule_id):
+        """Удаление правила"""
+        with db.get_cursor() as cursor:
+            cursor.execute("DELETE FROM decision_rules WHERE id = ?", (rule_id,))
+        
+        DecisionRule.bump_version()
+    
+    @staticmethod
+    def get_all():
+        """Получение всех правил"""
+        with db.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM decision_rules ORDER BY id")
+            rules = []
+            for row in cursor.fetchall():
+                rule = dict(row)
+                rule['statuses'] = rule['statuses'].split(',') if rule['statuses'] else []
+                rules.append(rule)
+            return rules
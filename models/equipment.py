@@ -1,4 +1,6 @@
+from datetime import datetime
 from database.db import db
+from database.pagination import keyset_page
 
 class Equipment:
     """Модель оборудования"""
@@ -6,6 +8,19 @@ class Equipment:
     VALID_TYPES = ['heating', 'ventilation', 'air_conditioner', 'humidifier']
     VALID_STATUSES = ['on', 'off', 'maintenance']
     
+    # Поля сортировки списка (ключ страницы - поле и id)
+    SORT_COLUMNS = {'name': 'e.name', 'equipment_type': 'e.equipment_type', 'created_at': 'e.created_at', 'id': 'e.id'}
+    
+    @staticmethod
+    def get_version():
+        """Версия списка оборудования и его статусов (общая для всех процессов)"""
+        return db.get_generation('equipment')
+    
+    @staticmethod
+    def bump_version():
+        """Отметка изменения списка оборудования или статуса"""
+        db.bump_generation('equipment')
+    
     def __init__(self, id=None, room_id=None, equipment_type=None, name=None, 
                  power=None, status='off', auto_mode=True):
         self.id = id
@@ -27,7 +42,10 @@ class Equipment:
                 "INSERT INTO equipment (room_id, equipment_type, name, power) VALUES (?, ?, ?, ?)",
                 (room_id, equipment_type, name, power)
             )
-            return cursor.lastrowid
+            equipment_id = cursor.lastrowid
+        
+        Equipment.bump_version()
+        return equipment_id
     
     @staticmethod
     def get_by_room(room_id):
@@ -40,12 +58,19 @@ class Equipment:
             return [dict(row) for row in cursor.fetchall()]
     
     @staticmethod
-    def update_status(equipment_id, status, auto_mode=None):
-        """Обновление статуса оборудования"""
+    def update_status(equipment_id, status, auto_mode=None, source='manual'):
+        """Обновление статуса оборудования (с записью переключения в журнал)"""
         if status not in Equipment.VALID_STATUSES:
             raise ValueError(f"Недопустимый статус: {status}")
         
         with db.get_cursor() as cursor:
+            # Событие пишется до обновления в той же транзакции, чтобы прочитать прежний статус
+            cursor.execute("""
+                INSERT INTO equipment_events (equipment_id, old_status, new_status, source, changed_at)
+                SELECT id, status, ?, ?, ? FROM equipment WHERE id = ? AND status != ?
+            """, (status, source, datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'), equipment_id, status))
+            switched = cursor.rowcount > 0
+            
             if auto_mode is not None:
                 cursor.execute(
                     "UPDATE equipment SET status = ?, auto_mode = ? WHERE id = ?",
@@ -56,6 +81,63 @@ class Equipment:
                     "UPDATE equipment SET status = ? WHERE id = ?",
                     (status, equipment_id)
                 )
+        
+        # Повторная установка того же статуса кэши не сбрасывает
+        if switched:
+            Equipment.bump_version()
+    
+    @staticmethod
+    def get_page(filters=None, sort='name', descending=False, cursor=None, limit=None):
+        """Страница списка оборудования с фильтрами по помещению, типу, статусу и режиму"""
+        if sort not in Equipment.SORT_COLUMNS:
+            raise ValueError(f"Недопустимое поле сортировки: {sort}")
+        
+        filters = filters or {}
+        conditions, params = [], []
+        if filters.get('room_id') is not None:
+            conditions.append("e.room_id = ?")
+            params.append(filters['room_id'])
+        if filters.get('equipment_type'):
+            if filters['equipment_type'] not in Equipment.VALID_TYPES:
+                raise ValueError(f"Недопустимый тип оборудования: {filters['equipment_type']}")
+            conditions.append("e.equipment_type = ?")
+            params.append(filters['equipment_type'])
+        if filters.get('status'):
+            if filters['status'] not in Equipment.VALID_STATUSES:
+                raise ValueError(f"Недопустимый статус: {filters['status']}")
+            conditions.append("e.status = ?")
+            params.append(filters['status'])
+        if filters.get('auto_mode') is not None:
+            conditions.append("e.auto_mode = ?")
+            params.append(1 if filters['auto_mode'] else 0)
+        
+        return keyset_page(
+            "SELECT e.*, r.name AS room_name FROM equipment e JOIN rooms r ON e.room_id = r.id",
+            'e.id', Equipment.SORT_COLUMNS[sort], sort, conditions, params, descending, cursor, limit
+        )
+    
+    @staticmethod
+    def get_many(equipment_ids=None, room_ids=None):
+        """Получение оборудования по списку ID и/или помещений (None - без ограничения)"""
+        conditions, params = [], []
+        for column, values in (('e.id', equipment_ids), ('e.room_id', room_ids)):
+            if values is None:
+                continue
+            values = list(values)
+            if not values:
+                return []
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        
+        with db.get_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT e.*, r.name as room_name 
+                FROM equipment e 
+                JOIN rooms r ON e.room_id = r.id 
+                {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                ORDER BY r.name, e.equipment_type
+            """, params)
+            return [dict(row) for row in cursor.fetchall()]
     
     @staticmethod
     def get_all():
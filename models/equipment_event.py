@@ -0,0 +1,77 @@
+from database.db import db
+
+class EquipmentEvent:
+    """Модель журнала переключений оборудования"""
+    
+    @staticmethod
+    def get_by_equipment(equipment_id, limit=50):
+        """Последние переключения оборудования"""
+        with db.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT * FROM equipment_events
+                WHERE equipment_id = ?
+                ORDER BY changed_at DESC, id DESC
+                LIMIT ?
+            """, (equipment_id, limit))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def get_states_at(moment, equipment_ids=None):
+        """Оборудование со статусом на момент времени (по последнему переключению до него)"""
+        condition, params = '', {'moment': moment}
+        if equipment_ids is not None:
+            condition = f"WHERE e.id IN ({', '.join(':id%d' % i for i in range(len(equipment_ids)))})"
+            params.update({f'id{i}': equipment_id for i, equipment_id in enumerate(equipment_ids)})
+        
+        with db.get_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT e.id, e.room_id, e.equipment_type, e.name, e.power, e.status, e.created_at,
+                       (SELECT new_status FROM equipment_events
+                        WHERE equipment_id = e.id AND changed_at < :moment
+                        ORDER BY changed_at DESC, id DESC LIMIT 1) AS status_before,
+                       (SELECT old_status FROM equipment_events
+                        WHERE equipment_id = e.id AND changed_at >= :moment
+                        ORDER BY changed_at ASC, id ASC LIMIT 1) AS status_until_next
+                FROM equipment e
+                {condition}
+                ORDER BY e.id
+            """, params)
+            return [dict(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def get_between(start, end, equipment_ids=None):
+        """Переключения за период [start, end) в порядке оборудования и времени"""
+        condition, params = '', [start, end]
+        if equipment_ids is not None:
+            condition = f"AND equipment_id IN ({', '.join('?' * len(equipment_ids))})"
+            params.extend(equipment_ids)
+        
+        with db.get_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT equipment_id, new_status, changed_at FROM equipment_events
+                WHERE changed_at >= ? AND changed_at < ? {condition}
+                ORDER BY equipment_id, changed_at, id
+            """, params)
+            return cursor.fetchall()
+    
+    @staticmethod
+    def get_monthly_usage(month):
+        """Кэшированное время работы оборудования за завершённый месяц {equipment_id: строка}"""
+        with db.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT equipment_id, on_seconds, switches FROM equipment_energy_monthly WHERE month = ?",
+                (month,)
+            )
+            return {row['equipment_id']: dict(row) for row in cursor.fetchall()}
+    
+    @staticmethod
+    def save_monthly_usage(month, usage):
+        """Сохранение времени работы оборудования за завершённый месяц"""
+        with db.get_cursor() as cursor:
+            cursor.executemany("""
+                INSERT INTO equipment_energy_monthly (equipment_id, month, on_seconds, switches)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(equipment_id, month) DO UPDATE SET
+                    on_seconds = excluded.on_seconds,
+                    switches = excluded.switches
+            """, [(equipment_id, month, u['on_seconds'], u['switches']) for equipment_id, u in usage.items()])
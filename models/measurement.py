@@ -1,4 +1,6 @@
-from database.db import db
+from database.partitions import partitions
+from database.storage import get_measurement_store
+from models.sensor import Sensor
 from datetime import datetime, timedelta
 
 class Measurement:
@@ -11,47 +13,86 @@ class Measurement:
         self.measured_at = measured_at
     
     @staticmethod
-    def create(sensor_id, value):
-        """Создание нового измерения"""
-        with db.get_cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO measurements (sensor_id, value) VALUES (?, ?)",
-                (sensor_id, value)
-            )
-            return cursor.lastrowid
+    def create(sensor_id, value, measured_at=None):
+        """Создание нового измерения (None - измерение датчика с этим временем уже сохранено)"""
+        return get_measurement_store().append([(sensor_id, value, measured_at or datetime.utcnow())])[0]
+    
+    @staticmethod
+    def create_many(readings, context_seconds=None):
+        """Пакетное создание измерений: id в порядке readings (None - повтор) и ряды датчиков вокруг новых
+        измерений (MeasurementStore.append_series)"""
+        now = datetime.utcnow()
+        return get_measurement_store().append_series(
+            [(r['sensor_id'], r['value'], r.get('measured_at') or now) for r in readings], context_seconds
+        )
     
     @staticmethod
     def get_latest_by_sensor(sensor_id):
         """Получение последнего измерения датчика"""
-        with db.get_cursor() as cursor:
-            cursor.execute(
-                "SELECT * FROM measurements WHERE sensor_id = ? ORDER BY measured_at DESC LIMIT 1",
-                (sensor_id,)
-            )
-            row = cursor.fetchone()
-            return dict(row) if row else None
+        return get_measurement_store().latest([sensor_id]).get(sensor_id)
+    
+    @staticmethod
+    def get_latest_many(sensor_ids):
+        """Последние измерения указанных датчиков {sensor_id: измерение}"""
+        return get_measurement_store().latest(sensor_ids)
     
     @staticmethod
     def get_latest_by_room(room_id):
         """Получение последних измерений всех датчиков в помещении"""
-        with db.get_cursor() as cursor:
-            cursor.execute("""
-                SELECT m.*, s.sensor_type, s.location
-                FROM measurements m
-                JOIN sensors s ON m.sensor_id = s.id
-                WHERE s.room_id = ?
-                GROUP BY s.sensor_type
-                HAVING m.measured_at = MAX(m.measured_at)
-            """, (room_id,))
-            return [dict(row) for row in cursor.fetchall()]
+        sensors = Sensor.get_by_room(room_id)
+        latest = get_measurement_store().latest([s['id'] for s in sensors])
+        
+        # Для каждого типа параметра - самое свежее измерение
+        by_type = {}
+        for sensor in sensors:
+            measurement = latest.get(sensor['id'])
+            if measurement is None:
+                continue
+            current = by_type.get(sensor['sensor_type'])
+            if current is None or measurement['measured_at'] > current['measured_at']:
+                by_type[sensor['sensor_type']] = {
+                    **measurement, 'sensor_type': sensor['sensor_type'], 'location': sensor['location']
+                }
+        
+        return list(by_type.values())
+    
+    @staticmethod
+    def get_range(sensor_id, start, end=None):
+        """Измерения датчика за период [start, end)"""
+        return get_measurement_store().range(sensor_id, start, end)
     
     @staticmethod
     def get_history(sensor_id, hours=24):
         """Получение истории измерений за последние N часов"""
-        with db.get_cursor() as cursor:
-            time_threshold = (datetime.now() - timedelta(hours=hours)).isoformat()
-            cursor.execute(
-                "SELECT * FROM measurements WHERE sensor_id = ? AND measured_at >= ? ORDER BY measured_at ASC",
-                (sensor_id, time_threshold)
-            )
-            return [dict(row) for row in cursor.fetchall()]
+        return Measurement.get_range(sensor_id, datetime.utcnow() - timedelta(hours=hours))
+    
+    @staticmethod
+    def iter_range_chunks(sensor_id, start, end, chunk_size):
+        """Измерения датчика за период порциями кортежей (unix-время, значение)"""
+        return get_measurement_store().iter_range_chunks(sensor_id, start, end, chunk_size)
+    
+    @staticmethod
+    def get_latest_all():
+        """Последние измерения всех датчиков (для пакетной обработки помещений)"""
+        latest = get_measurement_store().latest()
+        result = []
+        for sensor in sorted(Sensor.get_all(), key=lambda s: (s['room_id'], s['sensor_type'])):
+            measurement = latest.get(sensor['id'])
+            if measurement is not None:
+                result.append({
+                    **measurement,
+                    'sensor_type': sensor['sensor_type'],
+                    'location': sensor['location'],
+                    'room_id': sensor['room_id']
+                })
+        return result
+    
+    @staticmethod
+    def get_partitions():
+        """Список помесячных партиций измерений"""
+        return partitions.describe()
+    
+    @staticmethod
+    def drop_partition(name):
+        """Удаление измерений за месяц (файл партиции удаляется целиком)"""
+        partitions.drop(name)
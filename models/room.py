@@ -1,23 +1,63 @@
+from config import Config
 from database.db import db
+from database.pagination import keyset_page
+from models.sensor import Sensor
 
 class Room:
     """Модель помещения"""
     
-    def __init__(self, id=None, name=None, area=None, description=None):
+    # Поля сортировки списка (ключ страницы - поле и id)
+    SORT_COLUMNS = {'name': 'r.name', 'area': 'r.area', 'created_at': 'r.created_at', 'id': 'r.id'}
+    
+    def __init__(self, id=None, name=None, area=None, description=None, zone_id=None):
         self.id = id
         self.name = name
         self.area = area
         self.description = description
+        self.zone_id = zone_id
+    
+    @staticmethod
+    def get_version():
+        """Версия списка помещений и их привязки к зонам (общая для всех процессов)"""
+        return db.get_generation('rooms')
+    
+    @staticmethod
+    def bump_version():
+        """Отметка изменения списка помещений"""
+        db.bump_generation('rooms')
     
     @staticmethod
-    def create(name, area, description=None):
+    def create(name, area, description=None, zone_id=None):
         """Создание нового помещения"""
         with db.get_cursor() as cursor:
+            Room._check_zone(cursor, zone_id)
             cursor.execute(
-                "INSERT INTO rooms (name, area, description) VALUES (?, ?, ?)",
-                (name, area, description)
+                "INSERT INTO rooms (name, area, description, zone_id) VALUES (?, ?, ?, ?)",
+                (name, area, description, zone_id)
             )
-            return cursor.lastrowid
+            room_id = cursor.lastrowid
+        
+        Room.bump_version()
+        return room_id
+    
+    @staticmethod
+    def _check_zone(cursor, zone_id):
+        """Проверка существования зоны (None - без зоны)"""
+        if zone_id is not None:
+            cursor.execute("SELECT 1 FROM zones WHERE id = ?", (zone_id,))
+            if cursor.fetchone() is None:
+                raise ValueError(f"Зона не найдена: {zone_id}")
+    
+    @staticmethod
+    def set_zone(room_id, zone_id):
+        """Привязка помещения к зоне (None - без зоны)"""
+        with db.get_cursor() as cursor:
+            Room._check_zone(cursor, zone_id)
+            cursor.execute("UPDATE rooms SET zone_id = ? WHERE id = ?", (zone_id, room_id))
+            if cursor.rowcount == 0:
+                raise ValueError(f"Помещение не найдено: {room_id}")
+        
+        Room.bump_version()
     
     @staticmethod
     def get_all():
@@ -26,6 +66,39 @@ class Room:
             cursor.execute("SELECT * FROM rooms ORDER BY name")
             return [dict(row) for row in cursor.fetchall()]
     
+    @staticmethod
+    def get_choices(selected_id=None, limit=None):
+        """Помещения для выпадающего списка: id и название, не более limit (и выбранное помещение)"""
+        limit = limit or Config.PAGE_SIZE['max']
+        with db.get_cursor() as cursor:
+            cursor.execute("SELECT id, name FROM rooms ORDER BY name, id LIMIT ?", (limit,))
+            choices = [dict(row) for row in cursor.fetchall()]
+            if selected_id is not None and selected_id not in {room['id'] for room in choices}:
+                cursor.execute("SELECT id, name FROM rooms WHERE id = ?", (selected_id,))
+                choices += [dict(row) for row in cursor.fetchall()]
+        return choices
+    
+    @staticmethod
+    def get_page(filters=None, sort='name', descending=False, cursor=None, limit=None):
+        """Страница списка помещений (фильтры: q - начало названия, zone_id - зона с вложенными)"""
+        if sort not in Room.SORT_COLUMNS:
+            raise ValueError(f"Недопустимое поле сортировки: {sort}")
+        
+        filters = filters or {}
+        conditions, params = [], []
+        if filters.get('q'):
+            conditions.append("r.name >= ? AND r.name < ?")
+            params.extend([filters['q'], filters['q'] + '\uffff'])
+        if filters.get('zone_id') is not None:
+            conditions.append("""r.zone_id IN (
+                SELECT z.id FROM zones z, zones parent
+                WHERE parent.id = ? AND z.path >= parent.path AND z.path < parent.path || char(65535)
+            )""")
+            params.append(filters['zone_id'])
+        
+        return keyset_page("SELECT r.* FROM rooms r", 'r.id', Room.SORT_COLUMNS[sort], sort,
+                           conditions, params, descending, cursor, limit)
+    
     @staticmethod
     def get_by_id(room_id):
         """Получение помещения по ID"""
@@ -39,3 +112,24 @@ class Room:
         """Удаление помещения"""
         with db.get_cursor() as cursor:
             cursor.execute("DELETE FROM rooms WHERE id = ?", (room_id,))
+        
+        # Датчики удалённого помещения больше не должны принимать измерения
+        Sensor.bump_version()
+        Room.bump_version()
+    
+    @staticmethod
+    def get_overview_rows():
+        """Активные датчики по всем помещениям и общие счётчики (один запрос)"""
+        with db.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT r.id AS room_id, r.name AS room_name, r.area, r.zone_id,
+                       s.id AS sensor_id, s.sensor_type,
+                       (SELECT COUNT(*) FROM sensors) AS total_sensors,
+                       (SELECT COUNT(*) FROM equipment) AS total_equipment,
+                       (SELECT COUNT(*) FROM equipment WHERE status = 'on') AS active_equipment
+                FROM rooms r
+                -- унарный + исключает индекс по статусу: датчики ищутся по помещению
+                LEFT JOIN sensors s ON s.room_id = r.id AND +s.status = 'active'
+                ORDER BY r.name, r.id
+            """)
+            return [dict(row) for row in cursor.fetchall()]
@@ -1,9 +1,14 @@
 from database.db import db
+from database.pagination import keyset_page
 
 class Sensor:
     """Модель датчика"""
     
     VALID_TYPES = ['temperature', 'humidity', 'co2', 'dust']
+    VALID_STATUSES = ['active', 'inactive', 'maintenance']
+    
+    # Поля сортировки списка (ключ страницы - поле и id)
+    SORT_COLUMNS = {'sensor_type': 's.sensor_type', 'created_at': 's.created_at', 'id': 's.id'}
     
     def __init__(self, id=None, room_id=None, sensor_type=None, location=None, status='active'):
         self.id = id
@@ -12,6 +17,16 @@ class Sensor:
         self.location = location
         self.status = status
     
+    @staticmethod
+    def get_version():
+        """Версия метаданных датчиков (общая для всех процессов приложения)"""
+        return db.get_generation('sensors')
+    
+    @staticmethod
+    def bump_version():
+        """Отметка изменения метаданных датчиков"""
+        db.bump_generation('sensors')
+    
     @staticmethod
     def create(room_id, sensor_type, location=None):
         """Создание нового датчика"""
@@ -23,7 +38,24 @@ class Sensor:
                 "INSERT INTO sensors (room_id, sensor_type, location) VALUES (?, ?, ?)",
                 (room_id, sensor_type, location)
             )
-            return cursor.lastrowid
+            sensor_id = cursor.lastrowid
+        
+        Sensor.bump_version()
+        return sensor_id
+    
+    @staticmethod
+    def update_status(sensor_id, status):
+        """Обновление статуса датчика"""
+        if status not in Sensor.VALID_STATUSES:
+            raise ValueError(f"Недопустимый статус датчика: {status}")
+        
+        with db.get_cursor() as cursor:
+            cursor.execute(
+                "UPDATE sensors SET status = ? WHERE id = ?",
+                (status, sensor_id)
+            )
+        
+        Sensor.bump_version()
     
     @staticmethod
     def get_by_room(room_id):
@@ -35,6 +67,33 @@ class Sensor:
             )
             return [dict(row) for row in cursor.fetchall()]
     
+    @staticmethod
+    def get_page(filters=None, sort='sensor_type', descending=False, cursor=None, limit=None):
+        """Страница списка датчиков с фильтрами по помещению, типу и статусу"""
+        if sort not in Sensor.SORT_COLUMNS:
+            raise ValueError(f"Недопустимое поле сортировки: {sort}")
+        
+        filters = filters or {}
+        conditions, params = [], []
+        if filters.get('room_id') is not None:
+            conditions.append("s.room_id = ?")
+            params.append(filters['room_id'])
+        if filters.get('sensor_type'):
+            if filters['sensor_type'] not in Sensor.VALID_TYPES:
+                raise ValueError(f"Недопустимый тип датчика: {filters['sensor_type']}")
+            conditions.append("s.sensor_type = ?")
+            params.append(filters['sensor_type'])
+        if filters.get('status'):
+            if filters['status'] not in Sensor.VALID_STATUSES:
+                raise ValueError(f"Недопустимый статус датчика: {filters['status']}")
+            conditions.append("s.status = ?")
+            params.append(filters['status'])
+        
+        return keyset_page(
+            "SELECT s.*, r.name AS room_name FROM sensors s JOIN rooms r ON s.room_id = r.id",
+            's.id', Sensor.SORT_COLUMNS[sort], sort, conditions, params, descending, cursor, limit
+        )
+    
     @staticmethod
     def get_all():
         """Получение всех датчиков"""
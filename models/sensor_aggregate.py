@@ -0,0 +1,58 @@
+from database.db import db
+
+class SensorAggregate:
+    """Модель накопительной статистики датчика за период"""
+    
+    VALID_PERIODS = ['day', 'week', 'month']
+    
+    @staticmethod
+    def add_deltas(aggregates, bands):
+        """Прибавление накопленных приращений к сохранённой статистике"""
+        with db.get_cursor() as cursor:
+            cursor.executemany("""
+                INSERT INTO sensor_aggregates
+                    (sensor_id, period, period_start, count, sum, sum_sq, min_value, max_value)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(sensor_id, period, period_start) DO UPDATE SET
+                    count = count + excluded.count,
+                    sum = sum + excluded.sum,
+                    sum_sq = sum_sq + excluded.sum_sq,
+                    min_value = MIN(COALESCE(min_value, excluded.min_value),
+                                    COALESCE(excluded.min_value, min_value)),
+                    max_value = MAX(COALESCE(max_value, excluded.max_value),
+                                    COALESCE(excluded.max_value, max_value))
+            """, aggregates)
+            
+            cursor.executemany("""
+                INSERT INTO sensor_aggregate_bands (sensor_id, period, period_start, status, seconds)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(sensor_id, period, period_start, status) DO UPDATE SET
+                    seconds = seconds + excluded.seconds
+            """, bands)
+    
+    @staticmethod
+    def get_by_room(room_id, period_starts):
+        """Статистика датчиков помещения за периоды ({период: дата начала})"""
+        conditions = ' OR '.join(['(a.period = ? AND a.period_start = ?)'] * len(period_starts))
+        params = [room_id]
+        for period, start in period_starts.items():
+            params.extend([period, start])
+        
+        with db.get_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT a.*, s.sensor_type
+                FROM sensor_aggregates a
+                JOIN sensors s ON a.sensor_id = s.id
+                WHERE s.room_id = ? AND ({conditions})
+            """, params)
+            aggregates = [dict(row) for row in cursor.fetchall()]
+            
+            cursor.execute(f"""
+                SELECT a.*
+                FROM sensor_aggregate_bands a
+                JOIN sensors s ON a.sensor_id = s.id
+                WHERE s.room_id = ? AND ({conditions})
+            """, params)
+            bands = [dict(row) for row in cursor.fetchall()]
+        
+        return aggregates, bands
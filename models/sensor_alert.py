@@ -0,0 +1,61 @@
+from database.db import db
+
+class SensorAlert:
+    """Модель оповещения об аномалии в показаниях датчика"""
+    
+    VALID_TYPES = ['spike', 'flatline', 'dropout']
+    
+    def __init__(self, id=None, sensor_id=None, room_id=None, alert_type=None,
+                 value=None, message=None, created_at=None):
+        self.id = id
+        self.sensor_id = sensor_id
+        self.room_id = room_id
+        self.alert_type = alert_type
+        self.value = value
+        self.message = message
+        self.created_at = created_at
+    
+    @staticmethod
+    def create(sensor_id, room_id, alert_type, value=None, message=None):
+        """Сохранение оповещения"""
+        if alert_type not in SensorAlert.VALID_TYPES:
+            raise ValueError(f"Недопустимый тип оповещения: {alert_type}")
+        
+        with db.get_cursor() as cursor:
+            cursor.execute(
+                """INSERT INTO sensor_alerts (sensor_id, room_id, alert_type, value, message)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (sensor_id, room_id, alert_type, value, message)
+            )
+            return cursor.lastrowid
+    
+    @staticmethod
+    def create_dropout(sensor_id, room_id, value, message, since):
+        """Оповещение о пропуске данных после измерения since (None - о пропуске уже сообщалось)"""
+        with db.get_cursor() as cursor:
+            # Проверка и вставка - один запрос: из процессов, заметивших один пропуск,
+            # оповещение сохраняет только один
+            cursor.execute(
+                """INSERT INTO sensor_alerts (sensor_id, room_id, alert_type, value, message)
+                   SELECT ?, ?, 'dropout', ?, ?
+                   WHERE NOT EXISTS (
+                       SELECT 1 FROM sensor_alerts
+                       WHERE sensor_id = ? AND alert_type = 'dropout' AND created_at >= ?
+                   )""",
+                (sensor_id, room_id, value, message, sensor_id, since)
+            )
+            return cursor.lastrowid if cursor.rowcount else None
+    
+    @staticmethod
+    def get_by_room(room_id, limit=20):
+        """Последние оповещения по датчикам помещения"""
+        with db.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT a.*, s.sensor_type
+                FROM sensor_alerts a
+                JOIN sensors s ON a.sensor_id = s.id
+                WHERE a.room_id = ?
+                ORDER BY a.created_at DESC, a.id DESC
+                LIMIT ?
+            """, (room_id, limit))
+            return [dict(row) for row in cursor.fetchall()]
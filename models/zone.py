@@ -0,0 +1,156 @@
+import sqlite3
+import uuid
+from database.db import db
+from models.room import Room
+
+class Zone:
+    """Модель зоны (кампус, здание, этаж, крыло) с материализованным путём '/1/4/9/'"""
+    
+    VALID_TYPES = ['campus', 'building', 'floor', 'wing']
+    
+    @staticmethod
+    def get_version():
+        """Версия дерева зон (общая для всех процессов)"""
+        return db.get_generation('zones')
+    
+    @staticmethod
+    def bump_version():
+        """Отметка изменения дерева зон"""
+        db.bump_generation('zones')
+    
+    @staticmethod
+    def subtree_bounds(path):
+        """Границы пути для выборки поддерева по индексу (path >= ? AND path < ?)"""
+        return path, path + '\uffff'
+    
+    @staticmethod
+    def ancestor_ids(path):
+        """Идентификаторы зон пути от корня до самой зоны"""
+        return [int(part) for part in path.strip('/').split('/')]
+    
+    @staticmethod
+    def create(name, zone_type, parent_id=None):
+        """Создание зоны"""
+        if zone_type not in Zone.VALID_TYPES:
+            raise ValueError(f"Недопустимый тип зоны: {zone_type}")
+        
+        with db.get_cursor() as cursor:
+            prefix, depth = '/', 0
+            if parent_id is not None:
+                cursor.execute("SELECT path, depth FROM zones WHERE id = ?", (parent_id,))
+                parent = cursor.fetchone()
+                if parent is None:
+                    raise ValueError(f"Родительская зона не найдена: {parent_id}")
+                prefix, depth = parent['path'], parent['depth'] + 1
+            
+            # Путь включает собственный id, поэтому задаётся после вставки в той же транзакции
+            cursor.execute(
+                "INSERT INTO zones (parent_id, name, zone_type, path, depth) VALUES (?, ?, ?, ?, ?)",
+                (parent_id, name, zone_type, f'{prefix}{uuid.uuid4().hex}', depth)
+            )
+            zone_id = cursor.lastrowid
+            cursor.execute("UPDATE zones SET path = ? WHERE id = ?", (f'{prefix}{zone_id}/', zone_id))
+        
+        Zone.bump_version()
+        return zone_id
+    
+    @staticmethod
+    def get_all():
+        """Все зоны в порядке обхода дерева"""
+        with db.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM zones ORDER BY path")
+            return [dict(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def get_by_id(zone_id):
+        """Получение зоны по ID"""
+        with db.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM zones WHERE id = ?", (zone_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    @staticmethod
+    def get_subtree(zone_id):
+        """Зона и все вложенные зоны (выборка по префиксу пути)"""
+        zone = Zone.get_by_id(zone_id)
+        if zone is None:
+            return []
+        
+        with db.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM zones WHERE path >= ? AND path < ? ORDER BY path",
+                           Zone.subtree_bounds(zone['path']))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def rename(zone_id, name):
+        """Переименование зоны"""
+        with db.get_cursor() as cursor:
+            cursor.execute("UPDATE zones SET name = ? WHERE id = ?", (name, zone_id))
+            if cursor.rowcount == 0:
+                raise ValueError(f"Зона не найдена: {zone_id}")
+        
+        Zone.bump_version()
+    
+    @staticmethod
+    def _move(cursor, zone_id, parent_id):
+        """Перенос поддерева в открытой транзакции"""
+        cursor.execute("SELECT path, depth FROM zones WHERE id = ?", (zone_id,))
+        zone = cursor.fetchone()
+        if zone is None:
+            raise ValueError(f"Зона не найдена: {zone_id}")
+        
+        prefix, depth = '/', 0
+        if parent_id is not None:
+            cursor.execute("SELECT path, depth FROM zones WHERE id = ?", (parent_id,))
+            parent = cursor.fetchone()
+            if parent is None:
+                raise ValueError(f"Родительская зона не найдена: {parent_id}")
+            if parent['path'].startswith(zone['path']):
+                raise ValueError("Нельзя перенести зону внутрь собственного поддерева")
+            prefix, depth = parent['path'], parent['depth'] + 1
+        
+        # Пути и глубины всего поддерева меняются одним запросом по префиксу
+        cursor.execute("""
+            UPDATE zones SET path = ? || substr(path, ?), depth = depth + ?
+            WHERE path >= ? AND path < ?
+        """, (f'{prefix}{zone_id}/', len(zone['path']) + 1, depth - zone['depth'],
+              *Zone.subtree_bounds(zone['path'])))
+        try:
+            cursor.execute("UPDATE zones SET parent_id = ? WHERE id = ?", (parent_id, zone_id))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"В зоне {parent_id} уже есть зона с таким названием")
+    
+    @staticmethod
+    def move(zone_id, parent_id):
+        """Перенос зоны с поддеревом под другую зону (None - в корень)"""
+        with db.get_cursor() as cursor:
+            Zone._move(cursor, zone_id, parent_id)
+        
+        Zone.bump_version()
+    
+    @staticmethod
+    def delete(zone_id):
+        """Удаление зоны (вложенные зоны и помещения переходят к родительской зоне)"""
+        with db.get_cursor() as cursor:
+            cursor.execute("SELECT parent_id FROM zones WHERE id = ?", (zone_id,))
+            zone = cursor.fetchone()
+            if zone is None:
+                raise ValueError(f"Зона не найдена: {zone_id}")
+            
+            cursor.execute("SELECT id FROM zones WHERE parent_id = ?", (zone_id,))
+            for child in cursor.fetchall():
+                Zone._move(cursor, child['id'], zone['parent_id'])
+            
+            cursor.execute("UPDATE rooms SET zone_id = ? WHERE zone_id = ?", (zone['parent_id'], zone_id))
+            cursor.execute("DELETE FROM zones WHERE id = ?", (zone_id,))
+        
+        # Помещения удалённой зоны переходят к родительской
+        Zone.bump_version()
+        Room.bump_version()
+    
+    @staticmethod
+    def get_children(zone_id):
+        """Непосредственно вложенные зоны"""
+        with db.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM zones WHERE parent_id = ? ORDER BY name", (zone_id,))
+            return [dict(row) for row in cursor.fetchall()]
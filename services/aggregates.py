@@ -0,0 +1,229 @@
+import atexit
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from database.storage import EPOCH
+from config import Config
+from models.sensor_aggregate import SensorAggregate
+from services.sensor_registry import sensor_registry
+
+logger = logging.getLogger(__name__)
+
+class AggregateBucket:
+    """Приращения статистики датчика за один период"""
+    
+    __slots__ = ('count', 'sum', 'sum_sq', 'min', 'max', 'bands')
+    
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.min = None
+        self.max = None
+        self.bands = {}
+    
+    def add_value(self, value):
+        """Учёт нового значения"""
+        self.count += 1
+        self.sum += value
+        self.sum_sq += value * value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+    
+    def add_band_time(self, status, seconds):
+        """Учёт времени пребывания в статусе"""
+        self.bands[status] = self.bands.get(status, 0.0) + seconds
+    
+    def merge(self, other):
+        """Прибавление приращений другого буфера"""
+        self.count += other.count
+        self.sum += other.sum
+        self.sum_sq += other.sum_sq
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        for status, seconds in other.bands.items():
+            self.add_band_time(status, seconds)
+
+class RunningAggregates:
+    """Инкрементальная статистика датчиков за текущие день, неделю и месяц"""
+    
+    PERIODS = ['day', 'week', 'month']
+    
+    def __init__(self, settings=None):
+        self.settings = settings or Config.AGGREGATES
+        self._pending = {}
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def period_start(period, moment):
+        """Дата начала периода, содержащего момент времени"""
+        day = moment.date()
+        if period == 'week':
+            day -= timedelta(days=day.weekday())
+        elif period == 'month':
+            day = day.replace(day=1)
+        return day
+    
+    @staticmethod
+    def next_period_start(period, start):
+        """Дата начала следующего периода"""
+        if period == 'day':
+            return start + timedelta(days=1)
+        if period == 'week':
+            return start + timedelta(days=7)
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    
+    def _bucket(self, sensor_id, period, start):
+        """Буфер приращений для датчика и периода"""
+        key = (sensor_id, period, start.isoformat())
+        bucket = self._pending.get(key)
+        if bucket is None:
+            bucket = self._pending[key] = AggregateBucket()
+        return bucket
+    
+    def _add_band_time(self, sensor_id, status, start, end, sign=1):
+        """Учёт (sign=-1 - отмена учёта) времени [start, end) в статусе по всем периодам"""
+        for period in self.PERIODS:
+            moment = start
+            while moment < end:
+                period_start = self.period_start(period, moment)
+                boundary = datetime.combine(self.next_period_start(period, period_start), datetime.min.time())
+                boundary = min(end, boundary)
+                self._bucket(sensor_id, period, period_start).add_band_time(
+                    status, sign * (boundary - moment).total_seconds())
+                moment = boundary
+    
+    def update(self, reading, measured_at=None):
+        """Учёт значения нового измерения (вызывается из конвейера сбора данных)"""
+        measured_at = measured_at or datetime.utcnow()
+        with self._lock:
+            for period in self.PERIODS:
+                self._bucket(reading['sensor_id'], period, self.period_start(period, measured_at)).add_value(
+                    reading['value'])
+        self._flush_if_due()
+    
+    def _add_series_band_time(self, sensor_id, sensor_type, points, sign):
+        """Учёт времени ряда: интервал до следующего измерения (не более max_gap) - в статус измерения"""
+        from services.analysis import AnalysisService
+        
+        max_gap = self.settings['max_gap_seconds']
+        for (ts, value), (next_ts, _) in zip(points, points[1:]):
+            status = AnalysisService.evaluate_parameter(sensor_type, value)['status']
+            self._add_band_time(sensor_id, status, EPOCH + timedelta(seconds=ts),
+                                EPOCH + timedelta(seconds=min(next_ts, ts + max_gap)), sign)
+    
+    def update_series(self, sensor_id, sensor_type, points):
+        """Учёт времени по статусам для ряда датчика вокруг новых измерений (MeasurementStore.append_series)"""
+        # Приращение - разность учёта ряда с новыми измерениями и без них: запоздавшие и неупорядоченные
+        # измерения делят интервалы уже учтённых соседей, а ряд прочитан в транзакции записи
+        with self._lock:
+            self._add_series_band_time(sensor_id, sensor_type, [(ts, value) for ts, value, _ in points], 1)
+            self._add_series_band_time(sensor_id, sensor_type,
+                                       [(ts, value) for ts, value, new in points if not new], -1)
+        self._flush_if_due()
+    
+    def _flush_if_due(self):
+        """Периодическое сохранение накопленных приращений"""
+        with self._lock:
+            flush_due = time.time() - self._last_flush >= self.settings['flush_seconds']
+        
+        if flush_due:
+            try:
+                self.flush()
+            except Exception:
+                # Приращения остаются в буфере и сохраняются при следующей попытке
+                logger.exception("Ошибка сохранения статистики датчиков")
+    
+    def flush(self):
+        """Сохранение накопленных приращений в БД"""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._last_flush = time.time()
+        
+        if not pending:
+            return
+        
+        aggregates = []
+        bands = []
+        for (sensor_id, period, start), bucket in pending.items():
+            aggregates.append((sensor_id, period, start, bucket.count, bucket.sum,
+                               bucket.sum_sq, bucket.min, bucket.max))
+            for status, seconds in bucket.bands.items():
+                bands.append((sensor_id, period, start, status, seconds))
+        
+        try:
+            SensorAggregate.add_deltas(aggregates, bands)
+        except Exception:
+            # Возврат приращений в буфер, чтобы не потерять их при сбое записи
+            with self._lock:
+                for key, bucket in pending.items():
+                    self._pending.setdefault(key, AggregateBucket()).merge(bucket)
+            raise
+    
+    def get_room_summary(self, room_id, now=None):
+        """Статистика параметров помещения за текущие день, неделю и месяц (датчики одного типа вместе)"""
+        now = now or datetime.utcnow()
+        sensor_types = {s['id']: s['sensor_type'] for s in sensor_registry.get_by_room(room_id)}
+        period_starts = {p: self.period_start(p, now).isoformat() for p in self.PERIODS}
+        aggregates, bands = SensorAggregate.get_by_room(room_id, period_starts)
+        
+        totals = {}
+        for row in aggregates:
+            bucket = totals.setdefault((row['sensor_id'], row['period']), AggregateBucket())
+            bucket.count = row['count']
+            bucket.sum = row['sum']
+            bucket.sum_sq = row['sum_sq']
+            bucket.min = row['min_value']
+            bucket.max = row['max_value']
+        for row in bands:
+            totals.setdefault((row['sensor_id'], row['period']), AggregateBucket()).add_band_time(
+                row['status'], row['seconds'])
+        
+        # Ещё не сохранённые приращения текущего процесса
+        with self._lock:
+            for (sensor_id, period, start), pending in self._pending.items():
+                if sensor_id in sensor_types and period_starts[period] == start:
+                    totals.setdefault((sensor_id, period), AggregateBucket()).merge(pending)
+        
+        # Несколько датчиков одного типа: значения объединяются, время по статусам суммируется
+        merged = {}
+        for (sensor_id, period), bucket in totals.items():
+            sensor_type = sensor_types.get(sensor_id)
+            if sensor_type is None:
+                continue
+            merged.setdefault((sensor_type, period), AggregateBucket()).merge(bucket)
+        
+        summary = {}
+        for (sensor_type, period), bucket in merged.items():
+            summary.setdefault(sensor_type, {})[period] = self._describe(bucket)
+        return summary
+    
+    @staticmethod
+    def _describe(bucket):
+        """Итоговые показатели по накопленным суммам"""
+        mean = bucket.sum / bucket.count if bucket.count else None
+        std = None
+        if bucket.count:
+            std = math.sqrt(max(bucket.sum_sq / bucket.count - mean * mean, 0.0))
+        
+        band_total = sum(bucket.bands.values())
+        shares = {status: seconds / band_total * 100 for status, seconds in bucket.bands.items()} if band_total else {}
+        
+        return {
+            'count': bucket.count,
+            'mean': mean,
+            'std': std,
+            'min': bucket.min,
+            'max': bucket.max,
+            'band_seconds': dict(bucket.bands),
+            'band_percent': shares,
+            'optimal_percent': shares.get('optimal') if band_total else None
+        }
+
+running_aggregates = RunningAggregates()
+atexit.register(running_aggregates.flush)
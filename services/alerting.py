@@ -0,0 +1,384 @@
+import atexit
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from datetime import datetime
+from email.message import EmailMessage
+from config import Config
+from models.room import Room
+from models.alert_state import AlertState
+
+# Приоритет статуса (AnalysisService.STATUS_PRIORITY), начиная с которого состояние критическое
+CRITICAL_PRIORITY = 3
+
+PARAMETER_NAMES = {
+    'temperature': 'Температура',
+    'humidity': 'Влажность',
+    'co2': 'CO2',
+    'dust': 'Пыль'
+}
+
+class AlertSink(ABC):
+    """Интерфейс получателя уведомлений"""
+    
+    # Параметр конфигурации, без которого получатель не используется
+    REQUIRED = None
+    
+    @abstractmethod
+    def send(self, notification):
+        """Доставка уведомления; исключение означает неудачу (будет повтор)"""
+
+class WebhookSink(AlertSink):
+    """Уведомления JSON-запросом POST на URL"""
+    
+    REQUIRED = 'url'
+    
+    def __init__(self, url, timeout=5.0, headers=None):
+        self.name = f'webhook:{url}'
+        self.url = url
+        self.timeout = timeout
+        self.headers = headers or {}
+    
+    def send(self, notification):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(notification, ensure_ascii=False).encode('utf-8'),
+            headers={'Content-Type': 'application/json; charset=utf-8', **self.headers},
+            method='POST'
+        )
+        # Ответ с кодом ошибки вызывает HTTPError
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+class SmtpSink(AlertSink):
+    """Уведомления по электронной почте"""
+    
+    REQUIRED = 'host'
+    
+    def __init__(self, host, port=25, sender='air-quality@localhost', recipients=(), username=None,
+                 password=None, starttls=False, timeout=10.0):
+        self.name = f'smtp:{host}:{port}'
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = list(recipients)
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+    
+    def send(self, notification):
+        message = EmailMessage()
+        message['Subject'] = notification['subject']
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content(notification['text'])
+        
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+class FileSink(AlertSink):
+    """Уведомления строками JSON в файл"""
+    
+    REQUIRED = 'path'
+    
+    def __init__(self, path):
+        self.name = f'file:{path}'
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def send(self, notification):
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(notification, ensure_ascii=False) + '\n')
+
+SINKS = {
+    'webhook': WebhookSink,
+    'smtp': SmtpSink,
+    'file': FileSink
+}
+
+def build_sinks(configs):
+    """Получатели по конфигурации [{'type': ..., параметры}]"""
+    sinks = []
+    for config in configs:
+        sink_class = SINKS.get(config['type'])
+        if sink_class is None:
+            raise ValueError(f"Неизвестный тип получателя уведомлений: {config['type']}")
+        if config.get(sink_class.REQUIRED):
+            sinks.append(sink_class(**{k: v for k, v in config.items() if k != 'type'}))
+    return sinks
+
+def build_notification(events, room_names):
+    """Одиночное уведомление или дайджест по пакету событий"""
+    lines = []
+    for event in events:
+        room = room_names.get(event['room_id'], f"#{event['room_id']}")
+        parameter = PARAMETER_NAMES.get(event['parameter'], event['parameter'])
+        if event['level'] == 'critical':
+            lines.append(f"{event['at']} {room}: {parameter} = {event['value']:g} ({event['status']})")
+        else:
+            lines.append(f"{event['at']} {room}: {parameter} = {event['value']:g} - норма восстановлена")
+    
+    critical = sum(1 for event in events if event['level'] == 'critical')
+    if len(events) == 1:
+        subject = f"Качество воздуха: {lines[0].split(' ', 2)[2]}"
+    else:
+        rooms = len({event['room_id'] for event in events})
+        subject = f"Качество воздуха: сводка событий ({len(events)}), помещений: {rooms}, критических: {critical}"
+    
+    return {
+        'subject': subject,
+        'created_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+        'digest': len(events) > 1,
+        'events': [{**event, 'room_name': room_names.get(event['room_id'])} for event in events],
+        'text': '\n'.join(lines)
+    }
+
+class AlertDispatcher:
+    """Асинхронная рассылка уведомлений о критических состояниях (очередь, дайджесты, повторы)"""
+    
+    _STOP = object()
+    
+    def __init__(self, settings=None, sinks=None):
+        self.settings = settings or Config.ALERTS
+        self._sinks = sinks
+        self._levels = {}
+        self._levels_generation = None
+        self._levels_version = 0
+        self._levels_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._stats = {
+            'enqueued': 0, 'dropped': 0, 'transitions': 0, 'suppressed': 0,
+            'notifications': 0, 'delivered': 0, 'failed': 0, 'retries': 0, 'sinks': {}
+        }
+    
+    @property
+    def sinks(self):
+        """Получатели уведомлений (по конфигурации при первом обращении)"""
+        if self._sinks is None:
+            self._sinks = build_sinks(self.settings['sinks'])
+        return self._sinks
+    
+    def _ensure_started(self):
+        """Запуск потоков рассылки (заново в дочернем процессе после fork)"""
+        if self._pid == os.getpid():
+            return
+        
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.settings['queue_size'])
+            self._deliveries = queue.Queue()
+            self._stopping = threading.Event()
+            
+            # Фоновые потоки не задерживают завершение процесса: остановка - через stop()
+            self._coordinator = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+            self._workers = [
+                threading.Thread(target=self._deliver_loop, name=f'alert-delivery-{i}', daemon=True)
+                for i in range(self.settings['workers'])
+            ]
+            for thread in [self._coordinator, *self._workers]:
+                thread.start()
+            self._pid = os.getpid()
+    
+    def observe(self, reading, now=None):
+        """Учёт измерения: переход датчика в критическое состояние и обратно ставится в очередь"""
+        if not self.settings['enabled']:
+            return
+        
+        # Отложенный импорт: анализ зависит от сбора данных, который вызывает этот метод
+        from services.analysis import AnalysisService
+        
+        status = AnalysisService.evaluate_parameter(reading['sensor_type'], reading['value'])['status']
+        level = 'critical' if AnalysisService.STATUS_PRIORITY.get(status, 0) >= CRITICAL_PRIORITY else 'normal'
+        
+        # Повторы того же уровня датчика отсекаются в памяти без обращения к БД. Это только подсказка:
+        # после переходов в любом процессе обновляются уровни изменённых датчиков, решение
+        # принимается по alert_states
+        generation = AlertState.get_generation()
+        if generation != self._levels_generation:
+            self._refresh_levels(generation)
+        key = reading['sensor_id']
+        if self._levels.get(key) == level:
+            return
+        self._levels[key] = level
+        
+        self._ensure_started()
+        try:
+            self._queue.put_nowait({
+                'sensor_id': reading['sensor_id'],
+                'room_id': reading['room_id'],
+                'parameter': reading['sensor_type'],
+                'level': level,
+                'status': status,
+                'value': reading['value'],
+                'at': datetime.utcfromtimestamp(now or time.time()).strftime('%Y-%m-%d %H:%M:%S')
+            })
+            self._count('enqueued')
+        except queue.Full:
+            self._levels.pop(key, None)
+            self._count('dropped')
+    
+    def _refresh_levels(self, generation):
+        """Уровни датчиков, изменённых после прошлой проверки (в этом или другом процессе)"""
+        with self._levels_lock:
+            if generation == self._levels_generation:
+                return
+            for change in AlertState.get_changes(self._levels_version):
+                self._levels[change['sensor_id']] = change['level']
+                self._levels_version = max(self._levels_version, change['version'])
+            self._levels_generation = generation
+    
+    def _count(self, name, amount=1, sink=None):
+        """Учёт статистики рассылки (общей и по получателю)"""
+        with self._lock:
+            self._stats[name] += amount
+            if sink is not None:
+                self._sink_stats(sink)[name] += amount
+    
+    def _sink_stats(self, sink):
+        """Счётчики получателя (вызывается под блокировкой)"""
+        return self._stats['sinks'].setdefault(sink.name, {'delivered': 0, 'failed': 0, 'last_error': None})
+    
+    def _accept(self, event):
+        """Фиксация перехода в БД и подавление повторных тревог по датчику"""
+        # Время последнего уведомления хранится в alert_states: интервал общий для всех процессов
+        result, notify = AlertState.transition(event['sensor_id'], event['room_id'], event['parameter'],
+                                               event['level'], event['status'], event['value'], event['at'],
+                                               self.settings['cooldown_seconds'])
+        if result is None:
+            return False
+        
+        if event['level'] == 'critical':
+            self._count('transitions')
+            if not notify:
+                self._count('suppressed')
+        elif notify:
+            # О восстановлении сообщается, только если о тревоге было отправлено уведомление
+            self._count('transitions')
+        return notify
+    
+    def _forget(self, events):
+        """Сброс уровней в памяти: следующее измерение датчика снова попадёт в очередь"""
+        for event in events:
+            self._levels.pop(event['sensor_id'], None)
+    
+    def _run(self):
+        """Сбор событий в дайджесты: не чаще одного уведомления за digest_seconds"""
+        last_flush = float('-inf')
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            
+            events = [item]
+            deadline = last_flush + self.settings['digest_seconds']
+            while len(events) < self.settings['max_digest_events']:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                events.append(item)
+            
+            # Уведомление готовится до фиксации переходов: после неё ошибка потеряла бы события
+            try:
+                room_names = {}
+                for room_id in {event['room_id'] for event in events}:
+                    room = Room.get_by_id(room_id)
+                    room_names[room_id] = room['name'] if room else None
+                build_notification(events, room_names)
+            except Exception:
+                # Ошибка БД не должна останавливать рассылку: переходы не зафиксированы
+                self._forget(events)
+                self._count('dropped', len(events))
+                continue
+            
+            accepted = []
+            for event in events:
+                try:
+                    if self._accept(event):
+                        accepted.append(event)
+                except Exception:
+                    self._forget([event])
+                    self._count('dropped')
+            if not accepted:
+                continue
+            notification = build_notification(accepted, room_names)
+            
+            last_flush = time.monotonic()
+            self._count('notifications')
+            for sink in self.sinks:
+                self._deliveries.put((sink, notification))
+    
+    def _deliver_loop(self):
+        """Поток доставки: медленный получатель не задерживает сбор событий в дайджесты"""
+        while True:
+            item = self._deliveries.get()
+            if item is self._STOP:
+                break
+            self._deliver(*item)
+    
+    def _deliver(self, sink, notification):
+        """Доставка одному получателю с повторами и экспоненциальной паузой"""
+        delay = self.settings['backoff_seconds']
+        for attempt in range(1, self.settings['max_attempts'] + 1):
+            try:
+                sink.send(notification)
+                self._count('delivered', sink=sink)
+                return True
+            except Exception as e:
+                with self._lock:
+                    self._sink_stats(sink)['last_error'] = str(e)
+                if attempt == self.settings['max_attempts']:
+                    break
+                self._count('retries')
+                # При остановке повторы прекращаются
+                if self._stopping.wait(delay):
+                    break
+                delay = min(delay * 2, self.settings['backoff_max_seconds'])
+        
+        self._count('failed', sink=sink)
+        return False
+    
+    def get_stats(self):
+        """Счётчики очереди и доставки"""
+        with self._lock:
+            stats = {**self._stats, 'sinks': {k: dict(v) for k, v in self._stats['sinks'].items()}}
+        stats['queued'] = self._queue.qsize() if self._pid == os.getpid() else 0
+        return stats
+    
+    def stop(self, timeout=5.0):
+        """Отправка накопленных событий и остановка потоков"""
+        if self._pid != os.getpid():
+            return
+        
+        deadline = time.monotonic() + timeout
+        self._queue.put(self._STOP)
+        self._coordinator.join(timeout)
+        
+        # Ожидающие уведомления получают по одной попытке, повторы прекращаются
+        self._stopping.set()
+        for _ in self._workers:
+            self._deliveries.put(self._STOP)
+        for thread in self._workers:
+            thread.join(max(deadline - time.monotonic(), 0))
+        self._pid = None
+
+alert_dispatcher = AlertDispatcher()
+atexit.register(alert_dispatcher.stop)
@@ -1,9 +1,24 @@
 from config import Config
 from services.data_collection import DataCollectionService
+from services.sensor_registry import sensor_registry
+from services.anomaly_detection import anomaly_detector
+from services.rule_engine import rule_engine
+from models.sensor_alert import SensorAlert
 
 class AnalysisService:
     """Сервис анализа качества воздуха"""
     
+    # Приоритет статусов (чем больше, тем хуже)
+    STATUS_PRIORITY = {
+        'optimal': 0,
+        'acceptable': 1,
+        'low': 2,
+        'high': 2,
+        'critical_low': 3,
+        'critical_high': 3,
+        'critical': 3
+    }
+    
     @staticmethod
     def evaluate_parameter(param_type, value):
         """Оценка отдельного параметра микроклимата"""
@@ -39,22 +54,23 @@ class AnalysisService:
     def analyze_room_air_quality(room_id):
         """Комплексный анализ качества воздуха в помещении"""
         state = DataCollectionService.get_room_current_state(room_id)
+        analysis = AnalysisService.evaluate_state(room_id, state)
+        
+        # Аномалии датчиков (выбросы, залипание, пропуски данных)
+        anomaly_detector.check_dropouts(sensor_registry.get_by_room(room_id))
+        analysis['alerts'] = SensorAlert.get_by_room(room_id)
         
+        return analysis
+    
+    @staticmethod
+    def evaluate_state(room_id, state):
+        """Оценка текущего состояния микроклимата по нормативам"""
         analysis = {
             'room_id': room_id,
             'parameters': {},
             'overall_status': 'optimal',
-            'issues': []
-        }
-        
-        status_priority = {
-            'optimal': 0,
-            'acceptable': 1,
-            'low': 2,
-            'high': 2,
-            'critical_low': 3,
-            'critical_high': 3,
-            'critical': 3
+            'issues': [],
+            'alerts': []
         }
         
         for param_type, data in state.items():
@@ -75,8 +91,8 @@ class AnalysisService:
             }
             
             # Определение общего статуса (наихудший из всех параметров)
-            current_priority = status_priority.get(evaluation['status'], 0)
-            overall_priority = status_priority.get(analysis['overall_status'], 0)
+            current_priority = AnalysisService.STATUS_PRIORITY.get(evaluation['status'], 0)
+            overall_priority = AnalysisService.STATUS_PRIORITY.get(analysis['overall_status'], 0)
             
             if current_priority > overall_priority:
                 analysis['overall_status'] = evaluation['status']
@@ -102,43 +118,15 @@ class AnalysisService:
             'recommendations': []
         }
         
-        # Анализ необходимости включения/выключения оборудования
-        for equipment in equipment_list:
-            eq_type = equipment['equipment_type']
-            eq_status = equipment['status']
-            
-            # Проверка соответствия работы оборудования текущим условиям
-            if eq_type == 'heating':
-                temp_status = analysis['parameters'].get('temperature', {}).get('status')
-                if temp_status in ['critical_low', 'low'] and eq_status == 'off':
-                    efficiency['recommendations'].append(
-                        f"Рекомендуется включить {equipment['name']}"
-                    )
-                elif temp_status in ['critical_high', 'high'] and eq_status == 'on':
-                    efficiency['recommendations'].append(
-                        f"Рекомендуется выключить {equipment['name']}"
-                    )
-            
-            elif eq_type == 'air_conditioner':
-                temp_status = analysis['parameters'].get('temperature', {}).get('status')
-                if temp_status in ['critical_high', 'high'] and eq_status == 'off':
-                    efficiency['recommendations'].append(
-                        f"Рекомендуется включить {equipment['name']}"
-                    )
-            
-            elif eq_type == 'humidifier':
-                humidity_status = analysis['parameters'].get('humidity', {}).get('status')
-                if humidity_status in ['critical_low', 'low'] and eq_status == 'off':
-                    efficiency['recommendations'].append(
-                        f"Рекомендуется включить {equipment['name']}"
-                    )
-            
-            elif eq_type == 'ventilation':
-                co2_status = analysis['parameters'].get('co2', {}).get('status')
-                dust_status = analysis['parameters'].get('dust', {}).get('status')
-                if (co2_status in ['high', 'critical'] or dust_status in ['high', 'critical']) and eq_status == 'off':
-                    efficiency['recommendations'].append(
-                        f"Рекомендуется включить {equipment['name']}"
-                    )
+        # Рекомендации по тем же правилам, что и автоматическое управление
+        for action in rule_engine.evaluate(analysis['parameters'], equipment_list, respect_auto_mode=False):
+            if action['action'] == 'turn_on' and action['equipment_status'] == 'off':
+                efficiency['recommendations'].append(
+                    f"Рекомендуется включить {action['equipment_name']}"
+                )
+            elif action['action'] == 'turn_off' and action['equipment_status'] == 'on':
+                efficiency['recommendations'].append(
+                    f"Рекомендуется выключить {action['equipment_name']}"
+                )
         
         return efficiency
@@ -0,0 +1,155 @@
+import math
+import threading
+import time
+from datetime import datetime
+from config import Config
+from database.db import db
+from database.storage import to_seconds, format_seconds
+from models.measurement import Measurement
+from models.sensor_alert import SensorAlert
+
+class SensorStreamState:
+    """Состояние потока измерений одного датчика (O(1) памяти)"""
+    
+    __slots__ = ('mean', 'var', 'count', 'last_value', 'repeats', 'flatline_reported')
+    
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+        self.last_value = None
+        self.repeats = 0
+        self.flatline_reported = False
+
+class AnomalyDetector:
+    """Потоковое обнаружение выбросов, залипания и пропусков измерений (O(1) на измерение)"""
+    
+    # Состояние EWMA и залипания хранится в памяти процесса и при нескольких воркерах строится
+    # только по измерениям этого воркера. Пропуски определяются по общим последним измерениям
+    
+    def __init__(self, settings=None):
+        self.settings = settings or Config.ANOMALY_DETECTION
+        self._states = {}
+        self._lock = threading.Lock()
+    
+    def process(self, reading, now=None, previous_seen=None):
+        """Обработка измерения; previous_seen - время предыдущего сохранённого измерения датчика"""
+        now = time.time() if now is None else now
+        value = reading['value']
+        alerts = []
+        
+        # Пропуск: измерение пришло после слишком долгой паузы
+        if previous_seen is not None and now - previous_seen > self.settings['dropout_seconds']:
+            alerts.append(self._dropout(reading, value, now - previous_seen, previous_seen))
+        
+        with self._lock:
+            state = self._states.get(reading['sensor_id'])
+            if state is None:
+                state = self._states[reading['sensor_id']] = SensorStreamState()
+            
+            # Выброс: z-оценка относительно EWMA до обновления
+            if state.count >= self.settings['warmup_readings']:
+                min_std = self.settings['min_std'].get(reading['sensor_type'], 0.0)
+                std = max(math.sqrt(state.var), min_std)
+                if std > 0:
+                    z = (value - state.mean) / std
+                    if abs(z) > self.settings['spike_z_threshold']:
+                        alerts.append(self._alert(
+                            reading, 'spike', value,
+                            f"Резкое изменение: {value:g} при среднем {state.mean:.2f} (z = {z:.1f})"
+                        ))
+            
+            # Залипание: одно и то же значение подряд
+            if value == state.last_value:
+                state.repeats += 1
+            else:
+                state.repeats = 0
+                state.flatline_reported = False
+            
+            if state.repeats + 1 >= self.settings['flatline_repeats'] and not state.flatline_reported:
+                state.flatline_reported = True
+                alerts.append(self._alert(
+                    reading, 'flatline', value,
+                    f"Значение {value:g} не меняется {state.repeats + 1} измерений подряд"
+                ))
+            
+            # Обновление EWMA среднего и дисперсии
+            alpha = self.settings['ewma_alpha']
+            if state.count == 0:
+                state.mean = value
+                state.var = 0.0
+            else:
+                diff = value - state.mean
+                increment = alpha * diff
+                state.mean += increment
+                state.var = (1 - alpha) * (state.var + diff * increment)
+            
+            state.count += 1
+            state.last_value = value
+        
+        return self._store(alerts)
+    
+    def check_dropouts(self, sensors, now=None):
+        """Проверка датчиков, от которых давно не поступали измерения"""
+        now = time.time() if now is None else now
+        alerts = []
+        
+        # Последние измерения общие для всех процессов; отчёты могут читать снимок, а пропуск - по живой БД
+        with db.live():
+            latest = Measurement.get_latest_many([sensor['id'] for sensor in sensors])
+        
+        for sensor in sensors:
+            measurement = latest.get(sensor['id'])
+            if measurement is None:
+                continue
+            
+            last_seen = to_seconds(datetime.fromisoformat(measurement['measured_at']))
+            if now - last_seen > self.settings['dropout_seconds']:
+                alerts.append(self._dropout(
+                    {'sensor_id': sensor['id'], 'room_id': sensor['room_id']}, None, now - last_seen, last_seen
+                ))
+        
+        return self._store(alerts)
+    
+    def _dropout(self, reading, value, gap, since):
+        """Описание пропуска данных после измерения, полученного в момент since"""
+        alert = self._alert(
+            reading, 'dropout', value,
+            f"Нет данных {int(gap)} с (норма ≤ {self.settings['dropout_seconds']} с)"
+        )
+        alert['since'] = since
+        return alert
+    
+    @staticmethod
+    def _alert(reading, alert_type, value, message):
+        """Формирование описания аномалии"""
+        return {
+            'sensor_id': reading['sensor_id'],
+            'room_id': reading['room_id'],
+            'alert_type': alert_type,
+            'value': value,
+            'message': message
+        }
+    
+    @staticmethod
+    def _store(alerts):
+        """Сохранение аномалий в таблицу sensor_alerts; возвращает сохранённые"""
+        stored = []
+        # Проверка пропусков вызывается и из отчётов, читающих снимок только для чтения
+        with db.live():
+            for alert in alerts:
+                since = alert.pop('since', None)
+                if since is None:
+                    SensorAlert.create(
+                        alert['sensor_id'], alert['room_id'], alert['alert_type'],
+                        alert['value'], alert['message']
+                    )
+                elif SensorAlert.create_dropout(
+                    alert['sensor_id'], alert['room_id'], alert['value'], alert['message'], format_seconds(since)
+                ) is None:
+                    # О пропуске после этого измерения уже сообщил другой процесс или проверка
+                    continue
+                stored.append(alert)
+        return stored
+
+anomaly_detector = AnomalyDetector()
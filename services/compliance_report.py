@@ -0,0 +1,326 @@
+import csv
+import io
+import itertools
+import os
+from datetime import datetime
+import numpy as np
+from config import Config
+from models.room import Room
+from models.sensor import Sensor
+from models.measurement import Measurement
+from database.db import db
+from database.storage import get_measurement_store
+from services.process_pools import process_pools
+
+# Порядок статусов по типам параметров (индекс - код статуса)
+STATUS_BANDS = {
+    'temperature': ['critical_low', 'low', 'optimal', 'high', 'critical_high'],
+    'humidity': ['critical_low', 'low', 'optimal', 'high', 'critical_high'],
+    'co2': ['optimal', 'acceptable', 'high', 'critical'],
+    'dust': ['optimal', 'acceptable', 'high', 'critical']
+}
+
+# Статусы, при которых параметр считается соответствующим нормативу
+COMPLIANT_STATUSES = ('optimal', 'acceptable')
+
+def classify_values(param_type, values):
+    """Векторная оценка значений по нормативам (коды статусов из STATUS_BANDS)"""
+    standards = Config.AIR_QUALITY_STANDARDS[param_type]
+    bands = STATUS_BANDS[param_type]
+    
+    if param_type in ['temperature', 'humidity']:
+        conditions = [
+            values < standards['min'],
+            values < standards['optimal_min'],
+            values <= standards['optimal_max'],
+            values <= standards['max']
+        ]
+        return np.select(conditions, [0, 1, 2, 3], default=4).astype(np.int8)
+    
+    conditions = [
+        values <= standards['optimal'],
+        values <= standards['acceptable'],
+        values <= standards['max']
+    ]
+    return np.select(conditions, [0, 1, 2], default=len(bands) - 1).astype(np.int8)
+
+def deviation_from_norm(param_type, values):
+    """Векторное отклонение значений от нормы (0 - в пределах нормы)"""
+    standards = Config.AIR_QUALITY_STANDARDS[param_type]
+    
+    if param_type in ['temperature', 'humidity']:
+        return np.maximum(np.maximum(standards['optimal_min'] - values, values - standards['optimal_max']), 0.0)
+    
+    return np.maximum(values - standards['acceptable'], 0.0)
+
+def _format_ts(ts):
+    """Unix-время в строку ISO (UTC)"""
+    return datetime.utcfromtimestamp(int(ts)).isoformat(sep=' ')
+
+class SensorComplianceAccumulator:
+    """Потоковый расчёт соответствия нормативам по порциям измерений датчика"""
+    
+    def __init__(self, param_type, max_gap_seconds):
+        self.param_type = param_type
+        self.bands = STATUS_BANDS[param_type]
+        self.compliant = np.array([b in COMPLIANT_STATUSES for b in self.bands])
+        self.max_gap = max_gap_seconds
+        
+        self.samples = 0
+        self.band_seconds = np.zeros(len(self.bands))
+        self.band_samples = np.zeros(len(self.bands), dtype=np.int64)
+        self.value_sum = 0.0
+        self.value_min = None
+        self.value_max = None
+        self.episodes = []
+        self.hours = {}
+        
+        # Последнее измерение предыдущей порции (длительность ещё неизвестна)
+        self._carry_ts = None
+        self._carry_value = None
+        self._open_episode = None
+    
+    def add_chunk(self, rows):
+        """Обработка порции кортежей (unix-время, значение)"""
+        flat = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.float64, count=len(rows) * 2)
+        ts = flat[0::2]
+        values = flat[1::2]
+        
+        if self._carry_ts is not None:
+            ts = np.concatenate(([self._carry_ts], ts))
+            values = np.concatenate(([self._carry_value], values))
+        
+        if len(ts) < 2:
+            self._carry_ts, self._carry_value = ts[-1], values[-1]
+            return
+        
+        durations = np.minimum(np.diff(ts), self.max_gap)
+        self._process(ts[:-1], values[:-1], durations)
+        self._carry_ts, self._carry_value = ts[-1], values[-1]
+    
+    def finish(self, end_ts):
+        """Завершение расчёта (последнее измерение действует до конца периода)"""
+        if self._carry_ts is not None:
+            duration = np.array([min(max(end_ts - self._carry_ts, 0.0), self.max_gap)])
+            self._process(np.array([self._carry_ts]), np.array([self._carry_value]), duration)
+            self._carry_ts = None
+        
+        if self._open_episode is not None:
+            self.episodes.append(self._open_episode)
+            self._open_episode = None
+    
+    def _process(self, ts, values, durations):
+        """Векторная обработка измерений с известной длительностью"""
+        codes = classify_values(self.param_type, values)
+        deviations = deviation_from_norm(self.param_type, values)
+        
+        self.samples += len(values)
+        self.band_seconds += np.bincount(codes, weights=durations, minlength=len(self.bands))
+        self.band_samples += np.bincount(codes, minlength=len(self.bands))
+        self.value_sum += float(values.sum())
+        chunk_min, chunk_max = float(values.min()), float(values.max())
+        self.value_min = chunk_min if self.value_min is None else min(self.value_min, chunk_min)
+        self.value_max = chunk_max if self.value_max is None else max(self.value_max, chunk_max)
+        
+        self._collect_hours(ts, values, deviations)
+        self._collect_episodes(ts, values, durations, deviations, ~self.compliant[codes])
+    
+    def _collect_hours(self, ts, values, deviations):
+        """Почасовые суммы значений и отклонений"""
+        hours, inverse = np.unique((ts // 3600).astype(np.int64), return_inverse=True)
+        sums = np.bincount(inverse, weights=values)
+        counts = np.bincount(inverse)
+        dev_sums = np.bincount(inverse, weights=deviations)
+        maxima = np.full(len(hours), -np.inf)
+        np.maximum.at(maxima, inverse, values)
+        
+        for hour, value_sum, count, dev_sum, value_max in zip(hours.tolist(), sums, counts, dev_sums, maxima):
+            acc = self.hours.get(hour)
+            if acc is None:
+                self.hours[hour] = [value_sum, count, dev_sum, value_max]
+            else:
+                acc[0] += value_sum
+                acc[1] += count
+                acc[2] += dev_sum
+                acc[3] = max(acc[3], value_max)
+    
+    def _collect_episodes(self, ts, values, durations, deviations, exceeded):
+        """Поиск непрерывных эпизодов превышения норматива"""
+        edges = np.diff(np.concatenate(([0], exceeded.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        
+        # Эпизод, начавшийся в предыдущей порции, заканчивается на её первом нормальном измерении
+        if self._open_episode is not None and (len(starts) == 0 or starts[0] != 0):
+            self.episodes.append(self._open_episode)
+            self._open_episode = None
+        
+        for start, end in zip(starts, ends):
+            peak = start + int(np.argmax(deviations[start:end]))
+            episode = {
+                'start': float(ts[start]),
+                'end': float(ts[end - 1] + durations[end - 1]),
+                'peak_value': float(values[peak]),
+                'peak_deviation': float(deviations[peak]),
+                'peak_at': float(ts[peak])
+            }
+            
+            if start == 0 and self._open_episode is not None:
+                previous = self._open_episode
+                episode['start'] = previous['start']
+                if previous['peak_deviation'] >= episode['peak_deviation']:
+                    for key in ('peak_value', 'peak_deviation', 'peak_at'):
+                        episode[key] = previous[key]
+                self._open_episode = None
+            
+            if end == len(ts):
+                self._open_episode = episode
+            else:
+                self.episodes.append(episode)
+    
+    def result(self, worst_hours):
+        """Итоговая сводка по датчику"""
+        total_seconds = float(self.band_seconds.sum())
+        
+        worst = sorted(
+            self.hours.items(),
+            key=lambda item: (item[1][2] / item[1][1], item[1][0] / item[1][1]),
+            reverse=True
+        )[:worst_hours]
+        
+        return {
+            'samples': self.samples,
+            'mean': self.value_sum / self.samples if self.samples else None,
+            'min': self.value_min,
+            'max': self.value_max,
+            'covered_seconds': total_seconds,
+            'bands': {
+                band: {
+                    'seconds': float(self.band_seconds[i]),
+                    'samples': int(self.band_samples[i]),
+                    'percent': float(self.band_seconds[i] / total_seconds * 100) if total_seconds else None
+                }
+                for i, band in enumerate(self.bands)
+            },
+            'compliance_percent': (
+                float(self.band_seconds[self.compliant].sum() / total_seconds * 100) if total_seconds else None
+            ),
+            'episodes': [
+                {
+                    'start': _format_ts(e['start']),
+                    'end': _format_ts(e['end']),
+                    'duration_minutes': (e['end'] - e['start']) / 60,
+                    'peak_value': e['peak_value'],
+                    'peak_at': _format_ts(e['peak_at'])
+                }
+                for e in self.episodes
+            ],
+            'worst_hours': [
+                {
+                    'hour': _format_ts(hour * 3600),
+                    'mean': float(acc[0] / acc[1]),
+                    'max': float(acc[3]),
+                    'mean_deviation': float(acc[2] / acc[1]),
+                    'samples': int(acc[1])
+                }
+                for hour, acc in worst
+            ]
+        }
+
+def _score_sensor_worker(args):
+    """Оценка датчика в отдельном процессе"""
+    sensor, start, end, snapshot = args
+    if snapshot is None:
+        return ComplianceReportService.score_sensor(sensor, start, end)
+    
+    # Снимок, из которого читает запрос, передаётся процессам пула явно
+    with db.read_snapshot(snapshot):
+        return ComplianceReportService.score_sensor(sensor, start, end)
+
+class ComplianceReportService:
+    """Сервис отчётов о соответствии нормативам качества воздуха за период"""
+    
+    @staticmethod
+    def score_sensor(sensor, start, end):
+        """Оценка одного датчика за период"""
+        settings = Config.COMPLIANCE_REPORT
+        accumulator = SensorComplianceAccumulator(sensor['sensor_type'], settings['max_gap_seconds'])
+        
+        for rows in Measurement.iter_range_chunks(sensor['id'], start, end, settings['chunk_size']):
+            accumulator.add_chunk(rows)
+        
+        end_ts = (end - datetime(1970, 1, 1)).total_seconds()
+        accumulator.finish(min(end_ts, (datetime.utcnow() - datetime(1970, 1, 1)).total_seconds()))
+        
+        result = accumulator.result(settings['worst_hours'])
+        result.update({
+            'sensor_id': sensor['id'],
+            'sensor_type': sensor['sensor_type'],
+            'location': sensor['location']
+        })
+        return result
+    
+    @staticmethod
+    def build_report(start, end, room_ids=None, processes=None):
+        """Отчёт о соответствии нормативам по помещениям за период [start, end)"""
+        if end <= start:
+            raise ValueError("Конец периода должен быть позже начала")
+        
+        rooms = Room.get_all()
+        if room_ids is not None:
+            rooms = [r for r in rooms if r['id'] in set(room_ids)]
+        
+        room_reports = {room['id']: {'room': room, 'sensors': []} for room in rooms}
+        sensors = [s for s in Sensor.get_all() if s['room_id'] in room_reports]
+        
+        # Датчики оцениваются независимо, поэтому распределяются по пулу процессов
+        settings = Config.COMPLIANCE_REPORT
+        processes = processes or settings['processes'] or os.cpu_count() or 1
+        if not get_measurement_store().shared:
+            # Измерения в памяти процесса недоступны пулу
+            processes = 1
+        # Небольшой отчёт быстрее посчитать сразу, чем передавать задачи пулу
+        if len(sensors) * (end - start).total_seconds() / 86400 < settings['parallel_min_sensor_days']:
+            processes = 1
+        tasks = [(sensor, start, end, db.snapshot) for sensor in sensors]
+        
+        if processes > 1 and len(tasks) > 1:
+            results = process_pools.map('compliance_report', processes, _score_sensor_worker, tasks)
+        else:
+            results = [_score_sensor_worker(task) for task in tasks]
+        
+        for sensor, result in zip(sensors, results):
+            room_reports[sensor['room_id']]['sensors'].append(result)
+        
+        return {
+            'start': start.isoformat(sep=' '),
+            'end': end.isoformat(sep=' '),
+            'generated_at': datetime.utcnow().isoformat(sep=' ', timespec='seconds'),
+            'rooms': list(room_reports.values())
+        }
+    
+    @staticmethod
+    def to_csv(report):
+        """Экспорт сводки отчёта в CSV"""
+        statuses = sorted({band for bands in STATUS_BANDS.values() for band in bands})
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(
+            ['room', 'sensor_id', 'sensor_type', 'samples', 'mean', 'min', 'max', 'compliance_percent']
+            + [f'{status}_percent' for status in statuses]
+            + ['episodes', 'longest_episode_minutes', 'worst_hour']
+        )
+        
+        for room_report in report['rooms']:
+            for sensor in room_report['sensors']:
+                longest = max((e['duration_minutes'] for e in sensor['episodes']), default=0)
+                writer.writerow(
+                    [room_report['room']['name'], sensor['sensor_id'], sensor['sensor_type'],
+                     sensor['samples'], sensor['mean'], sensor['min'], sensor['max'],
+                     sensor['compliance_percent']]
+                    + [sensor['bands'].get(status, {}).get('percent', '') for status in statuses]
+                    + [len(sensor['episodes']), longest,
+                       sensor['worst_hours'][0]['hour'] if sensor['worst_hours'] else '']
+                )
+        
+        return output.getvalue()
@@ -1,22 +1,157 @@
+from datetime import datetime, timedelta, timezone
+from config import Config
+from database.storage import to_seconds
 from models.sensor import Sensor
 from models.measurement import Measurement
+from services.sensor_registry import sensor_registry
+from services.anomaly_detection import anomaly_detector
+from services.aggregates import running_aggregates
+from services.forecasting import forecasting_service
+from services.alerting import alert_dispatcher
 
 class DataCollectionService:
     """Сервис сбора данных с датчиков"""
     
     @staticmethod
-    def collect_measurement(sensor_id, value):
-        """Сбор и сохранение измерения от датчика"""
-        if value < 0:
-            raise ValueError("Значение измерения не может быть отрицательным")
+    def parse_measured_at(value, now=None):
+        """Время измерения по часам устройства (ISO 8601 или unix-время) в UTC с точностью до секунды"""
+        now = (now or datetime.utcnow()).replace(microsecond=0)
+        if value is None:
+            return now
         
-        return Measurement.create(sensor_id, value)
+        if isinstance(value, datetime):
+            moment = value
+        elif isinstance(value, (int, float)):
+            try:
+                moment = datetime.fromtimestamp(value, timezone.utc)
+            except (OverflowError, OSError, ValueError):
+                # Значение вне диапазона time_t платформы
+                raise ValueError(f"Некорректное время измерения: {value}")
+        else:
+            try:
+                moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+            except ValueError:
+                raise ValueError(f"Некорректное время измерения: {value}")
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        moment = moment.replace(microsecond=0)
+        
+        settings = Config.INGESTION
+        if moment > now + timedelta(seconds=settings['max_future_seconds']):
+            raise ValueError(f"Время измерения в будущем: {value}")
+        if moment < now - timedelta(days=settings['max_age_days']):
+            raise ValueError(f"Измерение старше {settings['max_age_days']} дней: {value}")
+        return moment
+    
+    @staticmethod
+    def validate_reading(sensor_id, value, measured_at=None):
+        """Проверка измерения по кэшу датчиков и маршрутизация по помещению"""
+        sensor = sensor_registry.get(sensor_id)
+        if sensor is None:
+            raise ValueError(f"Датчик не найден: {sensor_id}")
+        if sensor['status'] != 'active':
+            raise ValueError(f"Датчик {sensor_id} не активен (статус: {sensor['status']})")
+        
+        min_value, max_value = Config.SENSOR_VALUE_RANGES[sensor['sensor_type']]
+        if not min_value <= value <= max_value:
+            raise ValueError(
+                f"Значение {value} вне физического диапазона датчика "
+                f"{sensor['sensor_type']} ({min_value}..{max_value})"
+            )
+        
+        return {
+            'sensor_id': sensor_id,
+            'room_id': sensor['room_id'],
+            'sensor_type': sensor['sensor_type'],
+            'value': value,
+            'measured_at': DataCollectionService.parse_measured_at(measured_at)
+        }
+    
+    @staticmethod
+    def _store(readings):
+        """Сохранение измерений и обновление потоковых состояний; возвращает id и число запоздавших"""
+        # Время последних измерений до записи общее для всех процессов: по нему определяются пропуски
+        previous = {
+            sensor_id: to_seconds(datetime.fromisoformat(measurement['measured_at']))
+            for sensor_id, measurement in Measurement.get_latest_many({r['sensor_id'] for r in readings}).items()
+        }
+        ids, series = Measurement.create_many(readings, Config.AGGREGATES['max_gap_seconds'])
+        
+        # Повтор уже сохранённого измерения состояние не меняет
+        stored = [reading for reading, measurement_id in zip(readings, ids) if measurement_id is not None]
+        sensor_types = {reading['sensor_id']: reading['sensor_type'] for reading in stored}
+        for reading in stored:
+            running_aggregates.update(reading, reading['measured_at'])
+        
+        # Ряды прочитаны при записи: время по статусам учитывается относительно уже учтённых измерений,
+        # самое позднее из них отделяет запоздавшие измерения
+        latest = {}
+        for sensor_id, points in series:
+            running_aggregates.update_series(sensor_id, sensor_types[sensor_id], points)
+            for ts, _, new in points:
+                if not new:
+                    latest[sensor_id] = max(latest.get(sensor_id, ts), ts)
+        
+        late = 0
+        for reading in sorted(stored, key=lambda r: r['measured_at']):
+            ts = to_seconds(reading['measured_at'])
+            if ts < latest.get(reading['sensor_id'], ts):
+                # Запоздавшее измерение не отражает текущее состояние: без аномалий, прогноза и тревог
+                late += 1
+                continue
+            
+            anomaly_detector.process(reading, now=ts, previous_seen=previous.get(reading['sensor_id']))
+            previous[reading['sensor_id']] = ts
+            forecasting_service.update(reading, reading['measured_at'])
+            alert_dispatcher.observe(reading, now=ts)
+        return ids, late
+    
+    @staticmethod
+    def collect_measurement(sensor_id, value, measured_at=None):
+        """Сбор и сохранение измерения от датчика (None - измерение с этим временем уже сохранено)"""
+        reading = DataCollectionService.validate_reading(sensor_id, value, measured_at)
+        return DataCollectionService._store([reading])[0][0]
+    
+    @staticmethod
+    def collect_measurements(readings):
+        """Пакетный сбор измерений с группировкой по помещениям (повторы пропускаются)"""
+        accepted = []
+        rejected = []
+        
+        for item in readings:
+            try:
+                accepted.append(DataCollectionService.validate_reading(
+                    int(item['sensor_id']), float(item['value']), item.get('measured_at')
+                ))
+            except (KeyError, TypeError, ValueError) as e:
+                rejected.append({'reading': item, 'error': str(e)})
+        
+        stored = []
+        late = 0
+        if accepted:
+            ids, late = DataCollectionService._store(accepted)
+            stored = [reading for reading, measurement_id in zip(accepted, ids) if measurement_id is not None]
+        
+        rooms = {}
+        for reading in stored:
+            rooms[reading['room_id']] = rooms.get(reading['room_id'], 0) + 1
+        
+        return {
+            'accepted': len(stored),
+            'duplicates': len(accepted) - len(stored),
+            'late': late,
+            'rejected': rejected,
+            'rooms': rooms
+        }
     
     @staticmethod
     def get_room_current_state(room_id):
         """Получение текущего состояния микроклимата в помещении"""
-        measurements = Measurement.get_latest_by_room(room_id)
-        
+        return DataCollectionService.build_state(Measurement.get_latest_by_room(room_id))
+    
+    @staticmethod
+    def build_state(measurements):
+        """Состояние микроклимата по последним измерениям датчиков"""
         state = {
             'temperature': None,
             'humidity': None,
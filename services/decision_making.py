@@ -1,5 +1,10 @@
 from services.analysis import AnalysisService
+from services.data_collection import DataCollectionService
+from services.forecasting import forecasting_service
+from services.rule_engine import rule_engine
+from models.room import Room
 from models.equipment import Equipment
+from models.measurement import Measurement
 from database.db import db
 import json
 
@@ -7,11 +12,62 @@ class DecisionMakingService:
     """Сервис принятия решений по управлению оборудованием"""
     
     @staticmethod
-    def make_decision(room_id):
+    def apply_forecast(parameters, forecast):
+        """Замена статусов параметров прогнозными, если ожидается ухудшение"""
+        effective = dict(parameters)
+        
+        for param_type, prediction in forecast.items():
+            current_status = parameters.get(param_type, {}).get('status')
+            current_priority = AnalysisService.STATUS_PRIORITY.get(current_status, 0)
+            predicted_priority = AnalysisService.STATUS_PRIORITY.get(prediction['status'], 0)
+            
+            if predicted_priority > current_priority:
+                effective[param_type] = {
+                    'value': round(prediction['value'], 2),
+                    'status': prediction['status'],
+                    'message': prediction['message'],
+                    'predicted': True,
+                    'horizon_minutes': prediction['horizon_minutes']
+                }
+        
+        return effective
+    
+    @staticmethod
+    def make_decision(room_id, predictive=False, horizon_minutes=None):
         """Принятие решения на основе анализа качества воздуха"""
         analysis = AnalysisService.analyze_room_air_quality(room_id)
         equipment_list = Equipment.get_by_room(room_id)
-        
+        return DecisionMakingService._build_decision(
+            room_id, analysis, equipment_list, predictive, horizon_minutes
+        )
+    
+    @staticmethod
+    def make_decisions(room_ids=None, predictive=False, horizon_minutes=None):
+        """Пакетное принятие решений по помещениям (по одному запросу к измерениям и оборудованию)"""
+        measurements_by_room = {}
+        for measurement in Measurement.get_latest_all():
+            measurements_by_room.setdefault(measurement['room_id'], []).append(measurement)
+        
+        equipment_by_room = {}
+        for eq in Equipment.get_all():
+            equipment_by_room.setdefault(eq['room_id'], []).append(eq)
+        
+        if room_ids is None:
+            room_ids = [room['id'] for room in Room.get_all()]
+        
+        decisions = []
+        for room_id in room_ids:
+            state = DataCollectionService.build_state(measurements_by_room.get(room_id, []))
+            analysis = AnalysisService.evaluate_state(room_id, state)
+            decisions.append(DecisionMakingService._build_decision(
+                room_id, analysis, equipment_by_room.get(room_id, []), predictive, horizon_minutes
+            ))
+        
+        return decisions
+    
+    @staticmethod
+    def _build_decision(room_id, analysis, equipment_list, predictive, horizon_minutes):
+        """Формирование решения по правилам для оценённого состояния помещения"""
         decision = {
             'room_id': room_id,
             'overall_status': analysis['overall_status'],
@@ -19,69 +75,14 @@ class DecisionMakingService:
             'recommendations': []
         }
         
-        # Решения по температуре
-        temp_data = analysis['parameters'].get('temperature', {})
-        temp_status = temp_data.get('status')
-        
-        if temp_status in ['critical_low', 'low']:
-            for eq in equipment_list:
-                if eq['equipment_type'] == 'heating' and eq['auto_mode']:
-                    decision['actions'].append({
-                        'equipment_id': eq['id'],
-                        'equipment_name': eq['name'],
-                        'action': 'turn_on',
-                        'reason': f"Низкая температура: {temp_data.get('value', 'N/A')}°C"
-                    })
-        elif temp_status in ['critical_high', 'high']:
-            for eq in equipment_list:
-                if eq['equipment_type'] == 'air_conditioner' and eq['auto_mode']:
-                    decision['actions'].append({
-                        'equipment_id': eq['id'],
-                        'equipment_name': eq['name'],
-                        'action': 'turn_on',
-                        'reason': f"Высокая температура: {temp_data.get('value', 'N/A')}°C"
-                    })
-                elif eq['equipment_type'] == 'heating' and eq['status'] == 'on' and eq['auto_mode']:
-                    decision['actions'].append({
-                        'equipment_id': eq['id'],
-                        'equipment_name': eq['name'],
-                        'action': 'turn_off',
-                        'reason': f"Высокая температура: {temp_data.get('value', 'N/A')}°C"
-                    })
-        
-        # Решения по влажности
-        humidity_data = analysis['parameters'].get('humidity', {})
-        humidity_status = humidity_data.get('status')
-        
-        if humidity_status in ['critical_low', 'low']:
-            for eq in equipment_list:
-                if eq['equipment_type'] == 'humidifier' and eq['auto_mode']:
-                    decision['actions'].append({
-                        'equipment_id': eq['id'],
-                        'equipment_name': eq['name'],
-                        'action': 'turn_on',
-                        'reason': f"Низкая влажность: {humidity_data.get('value', 'N/A')}%"
-                    })
-        
-        # Решения по CO2 и пыли
-        co2_data = analysis['parameters'].get('co2', {})
-        dust_data = analysis['parameters'].get('dust', {})
-        
-        if co2_data.get('status') in ['high', 'critical'] or dust_data.get('status') in ['high', 'critical']:
-            for eq in equipment_list:
-                if eq['equipment_type'] == 'ventilation' and eq['auto_mode']:
-                    reasons = []
-                    if co2_data.get('status') in ['high', 'critical']:
-                        reasons.append(f"CO2: {co2_data.get('value', 'N/A')} ppm")
-                    if dust_data.get('status') in ['high', 'critical']:
-                        reasons.append(f"Пыль: {dust_data.get('value', 'N/A')} мг/м³")
-                    
-                    decision['actions'].append({
-                        'equipment_id': eq['id'],
-                        'equipment_name': eq['name'],
-                        'action': 'turn_on',
-                        'reason': ', '.join(reasons)
-                    })
+        # Упреждающее управление: реакция на прогнозируемое пересечение порогов
+        parameters = analysis['parameters']
+        if predictive:
+            forecast = forecasting_service.forecast_room(room_id, horizon_minutes)
+            parameters = DecisionMakingService.apply_forecast(parameters, forecast)
+            decision['forecast'] = forecast
+        
+        decision['actions'] = rule_engine.evaluate(parameters, equipment_list)
         
         # Общие рекомендации
         if analysis['overall_status'] == 'optimal':
@@ -101,7 +102,7 @@ class DecisionMakingService:
             new_status = 'on' if action['action'] == 'turn_on' else 'off'
             
             try:
-                Equipment.update_status(equipment_id, new_status)
+                Equipment.update_status(equipment_id, new_status, source='auto')
                 executed_actions.append({
                     'equipment_id': equipment_id,
                     'equipment_name': action['equipment_name'],
@@ -0,0 +1,141 @@
+from datetime import datetime
+from models.equipment import Equipment
+from models.equipment_event import EquipmentEvent
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def _month_start(moment):
+    """Начало месяца"""
+    return datetime(moment.year, moment.month, 1)
+
+def _next_month(moment):
+    """Начало следующего месяца"""
+    return datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+
+class EnergyService:
+    """Учёт времени работы и энергопотребления оборудования по журналу переключений"""
+    
+    @staticmethod
+    def scan(start, end, now=None, equipment_ids=None):
+        """Время работы и число включений оборудования за период (один проход по переключениям)"""
+        now = now or datetime.utcnow()
+        end = min(end, now)
+        usage = {}
+        if end <= start:
+            return usage
+        
+        timestamp = start.strftime(TIMESTAMP_FORMAT)
+        for eq in EquipmentEvent.get_states_at(timestamp, equipment_ids):
+            # Статус до первого переключения в периоде - последний известный
+            state = eq['status_before'] or eq['status_until_next'] or eq['status']
+            usage[eq['id']] = {
+                'state': state,
+                'since': max(start, datetime.fromisoformat(eq['created_at'])),
+                'on_seconds': 0.0,
+                'switches': 0
+            }
+        
+        transitions = EquipmentEvent.get_between(timestamp, end.strftime(TIMESTAMP_FORMAT), equipment_ids)
+        for equipment_id, new_status, changed_at in transitions:
+            acc = usage.get(equipment_id)
+            if acc is None:
+                continue
+            
+            moment = max(datetime.fromisoformat(changed_at), acc['since'])
+            if acc['state'] == 'on':
+                acc['on_seconds'] += (moment - acc['since']).total_seconds()
+            if new_status == 'on' and acc['state'] != 'on':
+                acc['switches'] += 1
+            acc['state'] = new_status
+            acc['since'] = moment
+        
+        for acc in usage.values():
+            if acc['state'] == 'on' and end > acc['since']:
+                acc['on_seconds'] += (end - acc['since']).total_seconds()
+        
+        return {
+            equipment_id: {'on_seconds': acc['on_seconds'], 'switches': acc['switches']}
+            for equipment_id, acc in usage.items()
+        }
+    
+    @staticmethod
+    def get_month(month_start, now=None):
+        """Время работы оборудования за завершённый месяц (из кэша или с сохранением в кэш)"""
+        month = month_start.strftime('%Y-%m')
+        cached = EquipmentEvent.get_monthly_usage(month)
+        
+        month_end = _next_month(month_start)
+        expected = {eq['id'] for eq in Equipment.get_all() if datetime.fromisoformat(eq['created_at']) < month_end}
+        if expected <= set(cached):
+            return cached
+        
+        usage = EnergyService.scan(month_start, month_end, now)
+        EquipmentEvent.save_monthly_usage(month, {k: v for k, v in usage.items() if k in expected})
+        return usage
+    
+    @staticmethod
+    def get_usage(start, end, room_ids=None, equipment_ids=None, now=None):
+        """Время работы и энергопотребление (кВт·ч) по оборудованию, помещениям и типам за период"""
+        if end <= start:
+            raise ValueError("Конец периода должен быть позже начала")
+        
+        now = now or datetime.utcnow()
+        
+        # Фильтры применяются в запросе: сканируется журнал только выбранного оборудования
+        if equipment_ids is None and room_ids is None:
+            selected = Equipment.get_all()
+            scan_ids = None
+        else:
+            selected = Equipment.get_many(equipment_ids, room_ids)
+            scan_ids = {eq['id'] for eq in selected}
+        
+        # Целые завершённые месяцы берутся из кэша, остаток периода сканируется
+        totals = {}
+        segment_start = start
+        while selected and segment_start < end:
+            month_end = _next_month(segment_start)
+            whole_month = segment_start == _month_start(segment_start) and month_end <= end
+            
+            if whole_month and month_end <= now:
+                part = EnergyService.get_month(segment_start, now)
+            else:
+                part = EnergyService.scan(segment_start, min(month_end, end), now, scan_ids)
+            
+            for key, value in part.items():
+                if scan_ids is not None and key not in scan_ids:
+                    continue
+                acc = totals.setdefault(key, {'on_seconds': 0.0, 'switches': 0})
+                acc['on_seconds'] += value['on_seconds']
+                acc['switches'] += value['switches']
+            segment_start = min(month_end, end)
+        
+        equipment = []
+        rooms = {}
+        by_type = {}
+        for eq in selected:
+            usage = totals.get(eq['id'], {'on_seconds': 0.0, 'switches': 0})
+            energy = usage['on_seconds'] / 3600 * eq['power'] / 1000 if eq['power'] else None
+            equipment.append({
+                'equipment_id': eq['id'],
+                'room_id': eq['room_id'],
+                'name': eq['name'],
+                'equipment_type': eq['equipment_type'],
+                'power': eq['power'],
+                'on_hours': usage['on_seconds'] / 3600,
+                'switches': usage['switches'],
+                'energy_kwh': energy
+            })
+            
+            for group, key in ((rooms, eq['room_id']), (by_type, eq['equipment_type'])):
+                acc = group.setdefault(key, {'on_hours': 0.0, 'energy_kwh': 0.0})
+                acc['on_hours'] += usage['on_seconds'] / 3600
+                acc['energy_kwh'] += energy or 0.0
+        
+        return {
+            'start': start.isoformat(sep=' '),
+            'end': end.isoformat(sep=' '),
+            'equipment': equipment,
+            'rooms': rooms,
+            'equipment_types': by_type,
+            'total_energy_kwh': sum(acc['energy_kwh'] for acc in rooms.values())
+        }
@@ -0,0 +1,154 @@
+import threading
+import time
+from datetime import datetime
+from config import Config
+from database.db import db
+from models.measurement import Measurement
+from services.sensor_registry import sensor_registry
+
+EPOCH = datetime(1970, 1, 1)
+
+def to_timestamp(moment):
+    """Unix-время для naive datetime в UTC или строки из БД"""
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    return (moment - EPOCH).total_seconds()
+
+class HoltState:
+    """Состояние модели Холта для одного датчика (уровень и тренд в единицах/с)"""
+    
+    __slots__ = ('level', 'trend', 'last_ts')
+    
+    def __init__(self, value, ts):
+        self.level = value
+        self.trend = 0.0
+        self.last_ts = ts
+
+class ForecastingService:
+    """Краткосрочный прогноз показателей методом Холта с инкрементальным обновлением"""
+    
+    def __init__(self, settings=None):
+        self.settings = settings or Config.FORECASTING
+        self._states = {}
+        self._no_history = {}
+        self._lock = threading.Lock()
+    
+    def _apply(self, state, value, ts):
+        """Шаг экспоненциального сглаживания Холта для нерегулярного ряда"""
+        dt = ts - state.last_ts
+        if dt < 0:
+            return
+        
+        alpha = self.settings['alpha']
+        if dt == 0:
+            state.level = alpha * value + (1 - alpha) * state.level
+            return
+        
+        beta = self.settings['beta']
+        level = alpha * value + (1 - alpha) * (state.level + state.trend * dt)
+        step = max(dt, self.settings['min_step_seconds'])
+        state.trend = beta * (level - state.level) / step + (1 - beta) * state.trend
+        state.level = level
+        state.last_ts = ts
+    
+    def _warm_start(self, sensor_id):
+        """Начальное состояние по недавней истории (однократно для датчика)"""
+        state = None
+        with db.live():
+            history = Measurement.get_history(sensor_id, self.settings['warmup_hours'])
+        for row in history:
+            ts = to_timestamp(row['measured_at'])
+            if state is None:
+                state = HoltState(float(row['value']), ts)
+            else:
+                self._apply(state, float(row['value']), ts)
+        return state
+    
+    def _get_state(self, sensor_id):
+        """Состояние модели датчика (с ленивой инициализацией по истории)"""
+        state = self._states.get(sensor_id)
+        if state is None:
+            # Отсутствие истории тоже запоминается: датчики без данных не читают историю при каждом прогнозе
+            checked = self._no_history.get(sensor_id)
+            if checked is not None and time.monotonic() - checked < self.settings['empty_recheck_seconds']:
+                return None
+            
+            state = self._warm_start(sensor_id)
+            with self._lock:
+                if state is None:
+                    self._no_history[sensor_id] = time.monotonic()
+                    return self._states.get(sensor_id)
+                state = self._states.setdefault(sensor_id, state)
+        return state
+    
+    def _check_horizon(self, horizon_minutes):
+        """Горизонт прогноза (по умолчанию из настроек) в допустимых пределах"""
+        horizon_minutes = horizon_minutes or self.settings['horizon_minutes']
+        if not self.settings['min_horizon_minutes'] <= horizon_minutes <= self.settings['max_horizon_minutes']:
+            raise ValueError(
+                f"Горизонт прогноза должен быть от {self.settings['min_horizon_minutes']} "
+                f"до {self.settings['max_horizon_minutes']} минут"
+            )
+        return horizon_minutes
+    
+    def update(self, reading, measured_at=None):
+        """Учёт нового измерения (вызывается из конвейера сбора данных)"""
+        ts = to_timestamp(measured_at or datetime.utcnow())
+        state = self._states.get(reading['sensor_id'])
+        
+        if state is None:
+            # Свежая история уже содержит сохранённое измерение
+            if self._get_state(reading['sensor_id']) is not None:
+                return
+            with self._lock:
+                self._states.setdefault(reading['sensor_id'], HoltState(reading['value'], ts))
+                self._no_history.pop(reading['sensor_id'], None)
+            return
+        
+        with self._lock:
+            self._apply(state, reading['value'], ts)
+    
+    def forecast(self, sensor_id, horizon_minutes=None, now=None):
+        """Прогноз значения датчика через horizon_minutes минут (None - нет данных)"""
+        horizon_minutes = self._check_horizon(horizon_minutes)
+        state = self._get_state(sensor_id)
+        if state is None:
+            return None
+        
+        now_ts = to_timestamp(now or datetime.utcnow())
+        if now_ts - state.last_ts > self.settings['max_staleness_minutes'] * 60:
+            return None
+        
+        target_ts = max(now_ts, state.last_ts) + horizon_minutes * 60
+        return {
+            'value': state.level + state.trend * (target_ts - state.last_ts),
+            'level': state.level,
+            'trend_per_minute': state.trend * 60,
+            'horizon_minutes': horizon_minutes
+        }
+    
+    def forecast_room(self, room_id, horizon_minutes=None, now=None):
+        """Прогноз всех параметров помещения с оценкой ожидаемого статуса"""
+        from services.analysis import AnalysisService
+        
+        horizon_minutes = self._check_horizon(horizon_minutes)
+        forecast = {}
+        for sensor in sensor_registry.get_by_room(room_id):
+            if sensor['status'] != 'active':
+                continue
+            
+            prediction = self.forecast(sensor['id'], horizon_minutes, now)
+            if prediction is None:
+                continue
+            
+            evaluation = AnalysisService.evaluate_parameter(sensor['sensor_type'], prediction['value'])
+            prediction.update({
+                'sensor_id': sensor['id'],
+                'status': evaluation['status'],
+                'message': evaluation['message']
+            })
+            forecast[sensor['sensor_type']] = prediction
+        
+        return forecast
+
+forecasting_service = ForecastingService()
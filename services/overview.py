@@ -0,0 +1,122 @@
+import threading
+import time
+from datetime import datetime
+from config import Config
+from database.db import db
+from models.equipment import Equipment
+from models.room import Room
+from models.sensor import Sensor
+from models.measurement import Measurement
+from services.analysis import AnalysisService
+
+class OverviewService:
+    """Сводка по всем помещениям для главной страницы (кэшируется по версиям состава и времени)"""
+    
+    _cache = None
+    _cache_key = None
+    _cache_built = None
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def _key():
+        """Версии помещений, датчиков и оборудования: их изменение сразу сбрасывает кэш"""
+        return Room.get_version(), Sensor.get_version(), Equipment.get_version()
+    
+    @staticmethod
+    def _is_fresh(key):
+        """Построен ли кэш для текущего состава не раньше max_age_seconds назад"""
+        return (OverviewService._cache_key == key
+                and time.monotonic() - OverviewService._cache_built < Config.OVERVIEW['max_age_seconds'])
+    
+    @staticmethod
+    def _build():
+        """Расчёт сводки по агрегирующему запросу и последним значениям из хранилища измерений"""
+        rows = Room.get_overview_rows()
+        latest = Measurement.get_latest_many([row['sensor_id'] for row in rows if row['sensor_id'] is not None])
+        overview = {
+            'total_rooms': 0,
+            'total_sensors': rows[0]['total_sensors'] if rows else 0,
+            'total_equipment': rows[0]['total_equipment'] if rows else 0,
+            'active_equipment': rows[0]['active_equipment'] if rows else 0,
+            'status_counts': {},
+            'rooms': []
+        }
+        
+        rooms = {}
+        for row in rows:
+            room = rooms.get(row['room_id'])
+            if room is None:
+                room = rooms[row['room_id']] = {
+                    'id': row['room_id'],
+                    'name': row['room_name'],
+                    'area': row['area'],
+                    'zone_id': row['zone_id'],
+                    'overall_status': 'no_data',
+                    'worst_parameter': None,
+                    'worst_value': None,
+                    'last_update': None,
+                    'parameters': {}
+                }
+                overview['rooms'].append(room)
+            
+            measurement = latest.get(row['sensor_id'])
+            if measurement is None:
+                continue
+            
+            evaluation = AnalysisService.evaluate_parameter(row['sensor_type'], measurement['value'])
+            room['parameters'][row['sensor_type']] = {
+                'value': measurement['value'],
+                'status': evaluation['status']
+            }
+            
+            # Наихудший параметр помещения определяет его общий статус
+            priority = AnalysisService.STATUS_PRIORITY.get(evaluation['status'], 0)
+            worst_priority = AnalysisService.STATUS_PRIORITY.get(room['overall_status'], -1)
+            if priority > worst_priority:
+                room['overall_status'] = evaluation['status']
+                room['worst_parameter'] = row['sensor_type']
+                room['worst_value'] = measurement['value']
+            
+            if room['last_update'] is None or measurement['measured_at'] > room['last_update']:
+                room['last_update'] = measurement['measured_at']
+        
+        for room in overview['rooms']:
+            status = room['overall_status']
+            overview['status_counts'][status] = overview['status_counts'].get(status, 0) + 1
+        
+        overview['total_rooms'] = len(overview['rooms'])
+        return overview
+    
+    @staticmethod
+    def get_cached():
+        """Кэшированная сводка без возраста данных и номер её расчёта"""
+        # Каждое измерение меняет последние значения, поэтому по ним сводка пересчитывается
+        # не чаще раза в max_age_seconds, а изменения состава учитываются без задержки
+        key = OverviewService._key()
+        if not OverviewService._is_fresh(key):
+            with OverviewService._lock:
+                if not OverviewService._is_fresh(key):
+                    # Кэш процесса строится из рабочей БД, даже если поток читает снимок
+                    with db.live():
+                        overview = OverviewService._build()
+                    build = OverviewService._cache[1] + 1 if OverviewService._cache else 1
+                    OverviewService._cache = overview, build
+                    OverviewService._cache_key = key
+                    OverviewService._cache_built = time.monotonic()
+        return OverviewService._cache
+    
+    @staticmethod
+    def get_overview(now=None):
+        """Сводка по помещениям с возрастом данных на текущий момент"""
+        overview, build = OverviewService.get_cached()
+        now = now or datetime.utcnow()
+        
+        # Возраст данных зависит от текущего времени и не кэшируется
+        rooms = []
+        for room in overview['rooms']:
+            age = None
+            if room['last_update']:
+                age = int((now - datetime.fromisoformat(room['last_update'])).total_seconds())
+            rooms.append({**room, 'last_update_age': age})
+        
+        return {**overview, 'rooms': rooms, 'version': build}
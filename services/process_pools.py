@@ -0,0 +1,53 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+class ProcessPools:
+    """Пулы процессов, общие для запросов (по одному на задачу: отчёты, моделирование)"""
+    
+    def __init__(self):
+        self._pools = {}
+        self._lock = threading.Lock()
+    
+    def get(self, name, processes):
+        """Пул задачи заданного размера (создаётся заново в дочернем процессе после fork)"""
+        key = (os.getpid(), processes)
+        with self._lock:
+            current = self._pools.get(name)
+            if current is None or current[0] != key:
+                if current is not None and current[0][0] == os.getpid():
+                    current[1].shutdown(wait=False)
+                current = (key, ProcessPoolExecutor(max_workers=processes))
+                self._pools[name] = current
+            return current[1]
+    
+    def discard(self, name, pool):
+        """Сброс пула, процесс которого завершился аварийно"""
+        with self._lock:
+            current = self._pools.get(name)
+            if current is not None and current[1] is pool:
+                del self._pools[name]
+        pool.shutdown(wait=False)
+    
+    def map(self, name, processes, function, tasks):
+        """Выполнение задач в пуле; при аварии пула - в текущем процессе"""
+        pool = self.get(name, processes)
+        try:
+            return list(pool.map(function, tasks))
+        except BrokenProcessPool:
+            # Пул пересоздаётся при следующем обращении
+            self.discard(name, pool)
+        return [function(task) for task in tasks]
+    
+    def shutdown(self):
+        """Остановка пулов текущего процесса"""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for (pid, _), pool in pools.values():
+            if pid == os.getpid():
+                pool.shutdown(wait=False, cancel_futures=True)
+
+process_pools = ProcessPools()
+atexit.register(process_pools.shutdown)
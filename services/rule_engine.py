@@ -0,0 +1,127 @@
+import threading
+from config import Config
+from database.db import db
+from models.decision_rule import DecisionRule
+
+class ReasonFields(dict):
+    """Поля шаблона пояснения: неизвестное поле остаётся в тексте как есть"""
+    
+    def __missing__(self, key):
+        return '{' + key + '}'
+
+class RuleEngine:
+    """Движок правил управления оборудованием (индекс (параметр, статус) -> правила)"""
+    
+    def __init__(self):
+        self._compiled = ({}, {})
+        self._rules = []
+        self._version = None
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def compile(rules):
+        """Построение индекса правил"""
+        status_index = {}
+        value_rules = {}
+        
+        for rule in rules:
+            if not rule.get('enabled', True):
+                continue
+            
+            if rule.get('statuses'):
+                for status in rule['statuses']:
+                    status_index.setdefault((rule['parameter'], status), []).append(rule)
+            else:
+                value_rules.setdefault(rule['parameter'], []).append(rule)
+        
+        return status_index, value_rules
+    
+    def _ensure_compiled(self):
+        """Перекомпиляция правил при изменении их версии"""
+        version = DecisionRule.get_version()
+        if self._version == version:
+            return
+        
+        with self._lock:
+            if self._version == version:
+                return
+            
+            # Кэш процесса заполняется из рабочей БД, даже если поток читает снимок
+            with db.live():
+                rules = DecisionRule.get_all() or [dict(r) for r in Config.DECISION_RULES]
+            self._compiled = self.compile(rules)
+            self._rules = rules
+            self._version = version
+    
+    def reload(self):
+        """Принудительная перезагрузка правил"""
+        with self._lock:
+            self._version = None
+        self._ensure_compiled()
+    
+    def get_rules(self):
+        """Действующий набор правил"""
+        self._ensure_compiled()
+        return list(self._rules)
+    
+    def match(self, parameter, data):
+        """Правила, условия которых выполняются для параметра"""
+        self._ensure_compiled()
+        status_index, value_rules = self._compiled
+        rules = status_index.get((parameter, data.get('status')), [])
+        
+        value = data.get('value')
+        if value is not None and parameter in value_rules:
+            rules = rules + [
+                rule for rule in value_rules[parameter]
+                if (rule.get('min_value') is None or value >= rule['min_value'])
+                and (rule.get('max_value') is None or value <= rule['max_value'])
+            ]
+        
+        return rules
+    
+    @staticmethod
+    def format_reason(rule, data):
+        """Пояснение к действию по шаблону правила"""
+        template = rule.get('reason') or '{parameter}: {value}'
+        try:
+            reason = template.format_map(ReasonFields(parameter=rule['parameter'], value=data.get('value', 'N/A')))
+        except (ValueError, LookupError, AttributeError, TypeError):
+            # Шаблоны правил, сохранённых до проверки в DecisionRule.validate, выводятся как есть
+            reason = template
+        if data.get('predicted'):
+            reason += f" (прогноз через {data['horizon_minutes']} мин)"
+        return reason
+    
+    def evaluate(self, parameters, equipment_list, respect_auto_mode=True):
+        """Действия по оборудованию помещения для оценённых параметров"""
+        by_type = {}
+        for eq in equipment_list:
+            by_type.setdefault(eq['equipment_type'], []).append(eq)
+        
+        actions = {}
+        for parameter, data in parameters.items():
+            for rule in self.match(parameter, data):
+                for eq in by_type.get(rule['equipment_type'], []):
+                    if respect_auto_mode and not eq['auto_mode']:
+                        continue
+                    if rule.get('equipment_status') and eq['status'] != rule['equipment_status']:
+                        continue
+                    
+                    # Одно действие на оборудование, причины объединяются
+                    key = (eq['id'], rule['action'])
+                    reason = self.format_reason(rule, data)
+                    if key in actions:
+                        actions[key]['reason'] += f", {reason}"
+                    else:
+                        actions[key] = {
+                            'equipment_id': eq['id'],
+                            'equipment_name': eq['name'],
+                            'equipment_status': eq['status'],
+                            'action': rule['action'],
+                            'reason': reason
+                        }
+        
+        return list(actions.values())
+
+rule_engine = RuleEngine()
@@ -0,0 +1,58 @@
+import threading
+from database.db import db
+from models.sensor import Sensor
+
+class SensorRegistry:
+    """Кэш метаданных датчиков в памяти (перечитывается при смене Sensor.get_version())"""
+    
+    def __init__(self):
+        self._sensors = {}
+        self._by_room = {}
+        self._version = None
+        self._lock = threading.Lock()
+    
+    def _ensure_loaded(self):
+        """Перезагрузка кэша при изменении версии метаданных"""
+        version = Sensor.get_version()
+        if self._version == version:
+            return
+        
+        with self._lock:
+            if self._version == version:
+                return
+            
+            sensors = {}
+            by_room = {}
+            # Кэш процесса заполняется из рабочей БД, даже если поток читает снимок
+            with db.live():
+                rows = Sensor.get_all()
+            for row in rows:
+                sensors[row['id']] = {
+                    'id': row['id'],
+                    'room_id': row['room_id'],
+                    'sensor_type': row['sensor_type'],
+                    'location': row['location'],
+                    'status': row['status']
+                }
+                by_room.setdefault(row['room_id'], []).append(sensors[row['id']])
+            
+            self._sensors = sensors
+            self._by_room = by_room
+            self._version = version
+    
+    def get(self, sensor_id):
+        """Метаданные датчика или None, если датчик неизвестен"""
+        self._ensure_loaded()
+        return self._sensors.get(sensor_id)
+    
+    def get_by_room(self, room_id):
+        """Метаданные всех датчиков помещения"""
+        self._ensure_loaded()
+        return list(self._by_room.get(room_id, []))
+    
+    def invalidate(self):
+        """Принудительный сброс кэша"""
+        with self._lock:
+            self._version = None
+
+sensor_registry = SensorRegistry()
@@ -0,0 +1,279 @@
+import itertools
+import math
+import numbers
+import os
+import numpy as np
+from config import Config
+from models.room import Room
+from models.sensor import Sensor
+from models.equipment import Equipment
+from models.measurement import Measurement
+from database.storage import to_seconds
+from services.compliance_report import STATUS_BANDS, classify_values
+from services.process_pools import process_pools
+from services.rule_engine import rule_engine
+
+# Порядок столбцов мощности в массиве конфигураций
+EQUIPMENT_TYPES = Equipment.VALID_TYPES
+HEATING, VENTILATION, AIR_CONDITIONER, HUMIDIFIER = (EQUIPMENT_TYPES.index(t) for t in
+                                                      ('heating', 'ventilation', 'air_conditioner', 'humidifier'))
+
+# Поля описания конфигурации (остальные поля плоской записи - мощности по типам оборудования)
+CONFIGURATION_FIELDS = ('name', 'equipment')
+
+def resample_history(room_id, start, end, step_seconds):
+    """Записанные показатели помещения на равномерной сетке (последнее известное значение)"""
+    grid = np.arange(to_seconds(start), to_seconds(end), step_seconds, dtype=np.float64)
+    series = {}
+    
+    for sensor in Sensor.get_by_room(room_id):
+        chunks = [
+            np.array(rows, dtype=np.float64)
+            for rows in Measurement.iter_range_chunks(sensor['id'], start, end, Config.COMPLIANCE_REPORT['chunk_size'])
+        ]
+        if not chunks:
+            continue
+        
+        data = np.concatenate(chunks)
+        # До первого измерения используется первое значение
+        index = np.clip(np.searchsorted(data[:, 0], grid, side='right') - 1, 0, None)
+        series.setdefault(sensor['sensor_type'], []).append(data[index, 1])
+    
+    # Несколько датчиков одного типа усредняются
+    return grid, {param: np.mean(values, axis=0) for param, values in series.items()}
+
+def compile_rules(rules, parameters):
+    """Правила управления в виде таблиц для векторной проверки"""
+    compiled = []
+    for rule in rules:
+        if not rule.get('enabled', True) or rule['parameter'] not in parameters:
+            continue
+        
+        statuses = rule.get('statuses')
+        required = rule.get('equipment_status')
+        compiled.append({
+            'parameter': rule['parameter'],
+            'lut': np.array([band in statuses for band in STATUS_BANDS[rule['parameter']]]) if statuses else None,
+            'min_value': rule.get('min_value'),
+            'max_value': rule.get('max_value'),
+            'column': EQUIPMENT_TYPES.index(rule['equipment_type']),
+            'turn_on': rule['action'] == 'turn_on',
+            'required_on': None if required is None else required == 'on'
+        })
+    return compiled
+
+def _relax(current, target, rate, dt):
+    """Точное решение dx/dt = rate * (target - x) на шаге dt"""
+    return target + (current - target) * np.exp(-rate * dt)
+
+def simulate_batch(history, powers, area, rules, settings):
+    """Моделирование пакета конфигураций (строки powers - мощности по типам оборудования)"""
+    n = len(powers)
+    dt = settings['step_seconds']
+    steps = len(next(iter(history.values())))
+    volume = area * settings['ceiling_height']
+    outdoor = settings['outdoor']
+    
+    # Коэффициенты модели: возврат к записанным условиям и влияние оборудования
+    k_env = settings['envelope_exchange_per_hour'] / 3600
+    heat_capacity = volume * 1.2 * 1005 * settings['thermal_mass_factor']
+    heat_rate = powers[:, HEATING] / heat_capacity
+    cool_rate = powers[:, AIR_CONDITIONER] * settings['cooling_cop'] / heat_capacity
+    vent_rate = powers[:, VENTILATION] * settings['ventilation_m3h_per_watt'] / 3600 / volume
+    hum_rate = powers[:, HUMIDIFIER] * settings['humidifier_g_per_h_per_watt'] / 3600 \
+        / (volume * settings['saturation_g_per_m3']) * 100
+    
+    state = {param: np.full(n, float(values[0])) for param, values in history.items()}
+    optimal_index = {param: STATUS_BANDS[param].index('optimal') for param in history}
+    optimal_steps = {param: np.zeros(n, dtype=np.int64) for param in history}
+    all_optimal_steps = np.zeros(n, dtype=np.int64)
+    on = np.zeros((n, len(EQUIPMENT_TYPES)), dtype=bool)
+    on_steps = np.zeros((n, len(EQUIPMENT_TYPES)), dtype=np.int64)
+    present = powers > 0
+    
+    for i in range(steps):
+        # Оценка состояния и решения по правилам
+        codes = {}
+        all_optimal = np.ones(n, dtype=bool)
+        for param, values in state.items():
+            codes[param] = classify_values(param, values)
+            optimal = codes[param] == optimal_index[param]
+            optimal_steps[param] += optimal
+            all_optimal &= optimal
+        all_optimal_steps += all_optimal
+        
+        # Как и в движке правил, условия проверяются по состоянию до действий шага
+        before = on.copy()
+        for rule in rules:
+            if rule['lut'] is not None:
+                mask = rule['lut'][codes[rule['parameter']]]
+            else:
+                values = state[rule['parameter']]
+                mask = np.ones(n, dtype=bool)
+                if rule['min_value'] is not None:
+                    mask &= values >= rule['min_value']
+                if rule['max_value'] is not None:
+                    mask &= values <= rule['max_value']
+            if rule['required_on'] is not None:
+                mask &= before[:, rule['column']] == rule['required_on']
+            on[mask, rule['column']] = rule['turn_on']
+        
+        active = on & present
+        on_steps += active
+        
+        # Баланс тепла, CO2, влаги и пыли на шаге
+        if 'temperature' in state:
+            recorded = history['temperature'][i]
+            source = heat_rate * active[:, HEATING] - cool_rate * active[:, AIR_CONDITIONER]
+            state['temperature'] = _relax(state['temperature'], recorded + source / k_env, k_env, dt)
+        
+        vent = vent_rate * active[:, VENTILATION]
+        for param in ('co2', 'dust'):
+            if param in state:
+                target = (k_env * history[param][i] + vent * outdoor[param]) / (k_env + vent)
+                state[param] = _relax(state[param], target, k_env + vent, dt)
+        
+        if 'humidity' in state:
+            target = (k_env * history['humidity'][i] + vent * outdoor['humidity']
+                      + hum_rate * active[:, HUMIDIFIER]) / (k_env + vent)
+            state['humidity'] = np.clip(_relax(state['humidity'], target, k_env + vent, dt), 0.0, 100.0)
+    
+    hours = on_steps * dt / 3600
+    return {
+        'optimal_percent': (all_optimal_steps / steps * 100).tolist(),
+        'parameters': {
+            param: (optimal_steps[param] / steps * 100).tolist() for param in history
+        },
+        'energy_kwh': (hours * powers / 1000).sum(axis=1).tolist(),
+        'on_hours': hours.tolist()
+    }
+
+def _simulate_worker(args):
+    """Моделирование пакета конфигураций в отдельном процессе"""
+    return simulate_batch(*args)
+
+class SimulationService:
+    """Сравнение конфигураций оборудования на записанной истории помещения"""
+    
+    @staticmethod
+    def expand_configurations(configurations=None, sweep=None):
+        """Список конфигураций {name, equipment: {тип: мощность}} из явного списка и/или перебора"""
+        configurations = configurations or []
+        sweep = sweep or {}
+        if not isinstance(configurations, list):
+            raise ValueError("Конфигурации задаются списком")
+        if not isinstance(sweep, dict):
+            raise ValueError("Перебор задаётся объектом {тип оборудования: [мощности]}")
+        for equipment_type, powers in sweep.items():
+            if not isinstance(powers, list) or not powers:
+                raise ValueError(f"Мощности перебора {equipment_type} задаются непустым списком")
+            for power in powers:
+                SimulationService._check_power(equipment_type, power)
+        
+        # Число конфигураций проверяется до построения перебора
+        total = len(configurations) + (math.prod(len(powers) for powers in sweep.values()) if sweep else 0)
+        if total > Config.SIMULATION['max_configurations']:
+            raise ValueError(f"Слишком много конфигураций: {total}")
+        
+        result = []
+        for i, config in enumerate(configurations):
+            if not isinstance(config, dict):
+                raise ValueError(f"Конфигурация должна быть объектом: {config}")
+            # Плоская запись {name, тип: мощность}: поля описания не считаются оборудованием
+            equipment = config.get('equipment', {k: v for k, v in config.items() if k not in CONFIGURATION_FIELDS})
+            if not isinstance(equipment, dict):
+                raise ValueError(f"Оборудование конфигурации задаётся объектом: {equipment}")
+            result.append({'name': config.get('name') or f'config-{i + 1}', 'equipment': equipment})
+        
+        if sweep:
+            types = list(sweep)
+            for powers in itertools.product(*(sweep[t] for t in types)):
+                equipment = dict(zip(types, powers))
+                name = ', '.join(f'{t}={p:g}' for t, p in equipment.items())
+                result.append({'name': name, 'equipment': equipment})
+        
+        for config in result:
+            for equipment_type, power in config['equipment'].items():
+                SimulationService._check_power(equipment_type, power)
+        return result
+    
+    @staticmethod
+    def _check_power(equipment_type, power):
+        """Проверка типа оборудования и мощности (неотрицательное число)"""
+        if equipment_type not in EQUIPMENT_TYPES:
+            raise ValueError(f"Недопустимый тип оборудования: {equipment_type}")
+        if isinstance(power, bool) or not isinstance(power, numbers.Real) or not 0 <= power < math.inf:
+            raise ValueError(f"Некорректная мощность {equipment_type}: {power}")
+    
+    @staticmethod
+    def current_configuration(room_id):
+        """Действующая конфигурация оборудования помещения"""
+        equipment = {}
+        for eq in Equipment.get_by_room(room_id):
+            equipment[eq['equipment_type']] = equipment.get(eq['equipment_type'], 0.0) + (eq['power'] or 0.0)
+        return {'name': 'current', 'equipment': equipment}
+    
+    @staticmethod
+    def simulate(room_id, start, end, configurations=None, sweep=None, top=20, processes=None):
+        """Моделирование конфигураций и их ранжирование по времени в оптимуме и энергии"""
+        if end <= start:
+            raise ValueError("Конец периода должен быть позже начала")
+        
+        room = Room.get_by_id(room_id)
+        if room is None:
+            raise ValueError(f"Помещение не найдено: {room_id}")
+        
+        settings = Config.SIMULATION
+        candidates = [SimulationService.current_configuration(room_id)]
+        candidates += SimulationService.expand_configurations(configurations, sweep)
+        
+        grid, history = resample_history(room_id, start, end, settings['step_seconds'])
+        if not history or not len(grid):
+            raise ValueError("Нет записанных измерений помещения за период")
+        
+        rules = compile_rules(rule_engine.get_rules(), history)
+        powers = np.array([
+            [float(c['equipment'].get(t, 0.0)) for t in EQUIPMENT_TYPES] for c in candidates
+        ])
+        
+        # Конфигурации независимы: пакеты распределяются по пулу процессов
+        # (история передаётся воркерам целиком, хранилище измерений им не требуется).
+        # Чем крупнее пакет, тем меньше накладных расходов цикла по шагам: по пакету на процесс
+        processes = processes or settings['processes'] or os.cpu_count() or 1
+        batch_size = max(settings['batch_size'], -(-len(powers) // processes))
+        tasks = [
+            (history, powers[i:i + batch_size], room['area'], rules, settings)
+            for i in range(0, len(powers), batch_size)
+        ]
+        
+        if processes > 1 and len(tasks) > 1:
+            batches = process_pools.map('simulation', processes, _simulate_worker, tasks)
+        else:
+            batches = [_simulate_worker(task) for task in tasks]
+        
+        results = []
+        for batch in batches:
+            for j in range(len(batch['optimal_percent'])):
+                results.append({
+                    'optimal_percent': batch['optimal_percent'][j],
+                    'parameters': {param: values[j] for param, values in batch['parameters'].items()},
+                    'energy_kwh': batch['energy_kwh'][j],
+                    'on_hours': dict(zip(EQUIPMENT_TYPES, batch['on_hours'][j]))
+                })
+        for candidate, result in zip(candidates, results):
+            result.update(candidate)
+        
+        ranked = sorted(results, key=lambda r: (-r['optimal_percent'], r['energy_kwh']))
+        for rank, result in enumerate(ranked, 1):
+            result['rank'] = rank
+        
+        return {
+            'room': room,
+            'start': start.isoformat(sep=' '),
+            'end': end.isoformat(sep=' '),
+            'steps': len(grid),
+            'parameters': sorted(history),
+            'configurations': len(candidates) - 1,
+            'current': results[0],
+            'ranking': ranked[:top]
+        }
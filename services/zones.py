@@ -0,0 +1,136 @@
+import threading
+from config import Config
+from database.db import db
+from models.zone import Zone
+from services.analysis import AnalysisService
+from services.overview import OverviewService
+
+def _severity(parameter, value):
+    """Удалённость значения от нормы для выбора наихудшего при равном статусе"""
+    standards = Config.AIR_QUALITY_STANDARDS[parameter]
+    if parameter in ['temperature', 'humidity']:
+        return abs(value - (standards['optimal_min'] + standards['optimal_max']) / 2)
+    return value
+
+def _new_node(zone=None):
+    """Пустой агрегат уровня иерархии"""
+    return {
+        'zone': zone,
+        'rooms': 0,
+        'rooms_with_data': 0,
+        'area': 0.0,
+        'overall_status': 'no_data',
+        'status_counts': {},
+        'last_update': None,
+        'parameters': {}
+    }
+
+def _add_room(node, room):
+    """Учёт последнего состояния помещения в агрегате уровня"""
+    node['rooms'] += 1
+    node['area'] += room['area'] or 0.0
+    node['status_counts'][room['overall_status']] = node['status_counts'].get(room['overall_status'], 0) + 1
+    if not room['parameters']:
+        return
+    
+    node['rooms_with_data'] += 1
+    if AnalysisService.STATUS_PRIORITY.get(room['overall_status'], 0) > \
+            AnalysisService.STATUS_PRIORITY.get(node['overall_status'], -1):
+        node['overall_status'] = room['overall_status']
+    if node['last_update'] is None or room['last_update'] > node['last_update']:
+        node['last_update'] = room['last_update']
+    
+    for parameter, data in room['parameters'].items():
+        acc = node['parameters'].get(parameter)
+        if acc is None:
+            acc = node['parameters'][parameter] = {
+                'count': 0, 'sum': 0.0, 'min': data['value'], 'max': data['value'],
+                'worst_status': data['status'], 'worst_value': data['value'], 'worst_room_id': room['id']
+            }
+        acc['count'] += 1
+        acc['sum'] += data['value']
+        acc['min'] = min(acc['min'], data['value'])
+        acc['max'] = max(acc['max'], data['value'])
+        
+        # Наихудшее значение - по приоритету статуса, затем по удалённости от нормы
+        key = (AnalysisService.STATUS_PRIORITY.get(data['status'], 0), _severity(parameter, data['value']))
+        worst = (AnalysisService.STATUS_PRIORITY.get(acc['worst_status'], 0), _severity(parameter, acc['worst_value']))
+        if key > worst:
+            acc.update({'worst_status': data['status'], 'worst_value': data['value'], 'worst_room_id': room['id']})
+
+def _finish(node):
+    """Средние значения параметров агрегата"""
+    for acc in node['parameters'].values():
+        acc['mean'] = acc.pop('sum') / acc['count']
+    return node
+
+class ZoneRollupService:
+    """Агрегаты последних показателей по уровням иерархии зон (кэшируются по сводке и версии зон)"""
+    
+    _cache = None
+    _cache_key = None
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def _build(overview):
+        """Один проход по сводке помещений: каждое помещение учитывается во всех зонах своего пути"""
+        zones = Zone.get_all()
+        nodes = {zone['id']: _new_node(zone) for zone in zones}
+        paths = {zone['id']: Zone.ancestor_ids(zone['path']) for zone in zones}
+        total = _new_node()
+        rooms_by_zone = {}
+        children = {}
+        for zone in zones:
+            children.setdefault(zone['parent_id'], []).append(zone['id'])
+        
+        for room in overview['rooms']:
+            _add_room(total, room)
+            if room['zone_id'] not in nodes:
+                continue
+            
+            rooms_by_zone.setdefault(room['zone_id'], []).append(room['id'])
+            for zone_id in paths[room['zone_id']]:
+                _add_room(nodes[zone_id], room)
+        
+        return {
+            'total': _finish(total),
+            'zones': {zone_id: _finish(node) for zone_id, node in nodes.items()},
+            'rooms_by_zone': rooms_by_zone,
+            'children': children
+        }
+    
+    @staticmethod
+    def _get():
+        """Агрегаты всех уровней; пересчитываются после пересчёта сводки или изменения зон"""
+        overview, build = OverviewService.get_cached()
+        key = (build, Zone.get_version())
+        if ZoneRollupService._cache_key != key:
+            with ZoneRollupService._lock:
+                if ZoneRollupService._cache_key != key:
+                    # Кэш процесса строится из рабочей БД, даже если поток читает снимок
+                    with db.live():
+                        ZoneRollupService._cache = ZoneRollupService._build(overview)
+                    ZoneRollupService._cache_key = key
+        return ZoneRollupService._cache
+    
+    @staticmethod
+    def get_tree():
+        """Агрегаты всех зон в порядке обхода дерева и итог по всем помещениям"""
+        rollups = ZoneRollupService._get()
+        zones = sorted(rollups['zones'].values(), key=lambda node: node['zone']['path'])
+        return {'total': rollups['total'], 'zones': zones}
+    
+    @staticmethod
+    def get_zone(zone_id):
+        """Агрегат зоны, её вложенных зон и список помещений, привязанных непосредственно к ней"""
+        rollups = ZoneRollupService._get()
+        node = rollups['zones'].get(zone_id)
+        if node is None:
+            raise ValueError(f"Зона не найдена: {zone_id}")
+        
+        children = [rollups['zones'][child_id] for child_id in rollups['children'].get(zone_id, [])]
+        return {
+            **node,
+            'children': sorted(children, key=lambda child: child['zone']['name']),
+            'room_ids': rollups['rooms_by_zone'].get(zone_id, [])
+        }
@@ -0,0 +1,47 @@
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import pytest
+
+# Тесты работают с временной БД; настройки из окружения читаются при импорте config
+TEST_DIR = tempfile.mkdtemp(prefix='air-quality-tests-')
+os.environ['PARTITION_DIR'] = os.path.join(TEST_DIR, 'partitions')
+os.environ['BACKUP_DIR'] = os.path.join(TEST_DIR, 'backups')
+os.environ['ALERTS_ENABLED'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from database.db import db
+
+Config.DB_PATH = os.path.join(TEST_DIR, 'air_quality.db')
+db.db_path = Config.DB_PATH
+db.init_db()
+
+_names = itertools.count(1)
+
+@pytest.fixture(scope='session', autouse=True)
+def test_directory():
+    """Каталог временной БД (удаляется после тестов)"""
+    yield TEST_DIR
+    from services.aggregates import running_aggregates
+    
+    # Накопленная статистика сохраняется до удаления БД, а не при выходе из процесса
+    running_aggregates.flush()
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+@pytest.fixture
+def client():
+    """Тестовый клиент приложения"""
+    from app import create_app
+    return create_app().test_client()
+
+@pytest.fixture
+def room():
+    """Помещение с датчиками всех типов: (id помещения, {тип: id датчика})"""
+    from models.room import Room
+    from models.sensor import Sensor
+    
+    room_id = Room.create(f'Помещение {next(_names)}', 40.0)
+    return room_id, {sensor_type: Sensor.create(room_id, sensor_type, 'центр') for sensor_type in Sensor.VALID_TYPES}
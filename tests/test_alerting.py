@@ -0,0 +1,211 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from config import Config
+from models.alert_state import AlertState
+from models.sensor import Sensor
+from services.alerting import AlertDispatcher, AlertSink, SmtpSink, WebhookSink
+
+SETTINGS = {
+    **Config.ALERTS,
+    'enabled': True,
+    'digest_seconds': 0.0,
+    'workers': 1,
+    'max_attempts': 4,
+    'backoff_seconds': 0.05,
+    'backoff_max_seconds': 0.1
+}
+
+class RecordingSink(AlertSink):
+    """Получатель, сохраняющий уведомления в списке"""
+    
+    def __init__(self):
+        self.name = 'recording'
+        self.notifications = []
+    
+    def send(self, notification):
+        self.notifications.append(notification)
+
+def wait_for(predicate, timeout=5.0):
+    """Ожидание условия (доставка идёт в фоновых потоках)"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "Условие не выполнено за отведённое время"
+        time.sleep(0.01)
+
+def co2_reading(room, value, sensor_id=None):
+    room_id, sensors = room
+    return {'sensor_id': sensor_id or sensors['co2'], 'room_id': room_id, 'sensor_type': 'co2', 'value': value}
+
+@pytest.fixture
+def webhook_server():
+    """HTTP-сервер, отвечающий 503 на первые два запроса"""
+    received = []
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            received.append((time.monotonic(), json.loads(body)))
+            self.send_response(503 if len(received) <= 2 else 200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/alerts', received
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def smtp_server():
+    """Минимальный SMTP-сервер: первое письмо отклоняется кодом 451"""
+    listener = socket.create_server(('127.0.0.1', 0))
+    messages = []
+    attempts = []
+    
+    def session(conn):
+        with conn, conn.makefile('rb') as reader:
+            conn.sendall(b'220 localhost\r\n')
+            while line := reader.readline():
+                command = line.decode().strip().upper()
+                if command.startswith(('EHLO', 'HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP')):
+                    conn.sendall(b'250 OK\r\n')
+                elif command == 'DATA':
+                    conn.sendall(b'354 End data with <CR><LF>.<CR><LF>\r\n')
+                    data = b''.join(iter(reader.readline, b'.\r\n'))
+                    attempts.append(time.monotonic())
+                    if len(attempts) == 1:
+                        conn.sendall(b'451 Try again later\r\n')
+                    else:
+                        messages.append(data.decode())
+                        conn.sendall(b'250 Queued\r\n')
+                elif command == 'QUIT':
+                    conn.sendall(b'221 Bye\r\n')
+                    break
+                else:
+                    conn.sendall(b'502 Not implemented\r\n')
+    
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=session, args=(conn,), daemon=True).start()
+    
+    threading.Thread(target=serve, daemon=True).start()
+    yield listener.getsockname()[1], attempts, messages
+    listener.close()
+
+def test_webhook_delivery_is_retried_with_backoff(room, webhook_server):
+    room_id, _ = room
+    url, received = webhook_server
+    dispatcher = AlertDispatcher(SETTINGS, sinks=[WebhookSink(url, timeout=2.0)])
+    
+    dispatcher.observe(co2_reading(room, 2500.0))
+    wait_for(lambda: dispatcher.get_stats()['delivered'] + dispatcher.get_stats()['failed'] == 1)
+    dispatcher.stop()
+    
+    stats = dispatcher.get_stats()
+    assert (stats['delivered'], stats['failed'], stats['retries']) == (1, 0, 2)
+    assert [body['events'][0]['room_id'] for _, body in received] == [room_id] * 3
+    
+    # Паузы между попытками: backoff_seconds, затем удвоенная
+    first, second = (b[0] - a[0] for a, b in zip(received, received[1:]))
+    assert first >= 0.05 and second >= 0.1
+
+def test_smtp_delivery_is_retried_after_temporary_error(room, smtp_server):
+    port, attempts, messages = smtp_server
+    sink = SmtpSink('127.0.0.1', port, recipients=['ops@example.com'], timeout=2.0)
+    dispatcher = AlertDispatcher(SETTINGS, sinks=[sink])
+    
+    dispatcher.observe(co2_reading(room, 2500.0))
+    wait_for(lambda: dispatcher.get_stats()['delivered'] + dispatcher.get_stats()['failed'] == 1)
+    dispatcher.stop()
+    
+    stats = dispatcher.get_stats()
+    assert (stats['delivered'], stats['retries']) == (1, 1)
+    assert stats['sinks'][sink.name]['last_error'] is not None
+    assert len(attempts) == 2 and attempts[1] - attempts[0] >= 0.05
+    assert len(messages) == 1 and 'ops@example.com' in messages[0]
+
+def test_cooldown_and_recovery_are_shared_between_processes(room):
+    room_id, _ = room
+    # Два диспетчера с общей БД - как воркеры gunicorn
+    first_sink, second_sink = RecordingSink(), RecordingSink()
+    first = AlertDispatcher(SETTINGS, sinks=[first_sink])
+    second = AlertDispatcher(SETTINGS, sinks=[second_sink])
+    start = time.time()
+    
+    def sent():
+        events = [event for n in first_sink.notifications + second_sink.notifications for event in n['events']]
+        return [event['level'] for event in sorted(events, key=lambda event: event['at'])]
+    
+    first.observe(co2_reading(room, 2500.0), now=start)
+    wait_for(lambda: sent() == ['critical'])
+    
+    # Восстановление замечено другим процессом: уведомление всё равно отправляется
+    second.observe(co2_reading(room, 600.0), now=start + 60)
+    wait_for(lambda: sent() == ['critical', 'normal'])
+    
+    # Повторная тревога в пределах cooldown подавляется в обоих процессах
+    second.observe(co2_reading(room, 2500.0), now=start + 120)
+    wait_for(lambda: second.get_stats()['suppressed'] == 1)
+    first.observe(co2_reading(room, 600.0), now=start + 180)
+    first.observe(co2_reading(room, 2500.0), now=start + 240)
+    wait_for(lambda: first.get_stats()['suppressed'] == 1)
+    
+    # После cooldown тревога снова отправляется
+    second.observe(co2_reading(room, 600.0), now=start + 300)
+    wait_for(lambda: room_id not in {alert['room_id'] for alert in AlertState.get_active()})
+    first.observe(co2_reading(room, 2500.0), now=start + 300 + SETTINGS['cooldown_seconds'])
+    wait_for(lambda: len(sent()) == 3)
+    first.stop()
+    second.stop()
+    
+    assert sent() == ['critical', 'normal', 'critical']
+
+def test_sensors_of_same_type_keep_separate_levels(room):
+    room_id, sensors = room
+    window = Sensor.create(room_id, 'co2', 'у окна')
+    sink = RecordingSink()
+    dispatcher = AlertDispatcher(SETTINGS, sinks=[sink])
+    start = time.time()
+    
+    # Показания двух датчиков CO2 чередуются: уровень каждого из них не меняется
+    for i in range(3):
+        dispatcher.observe(co2_reading(room, 2500.0), now=start + 2 * i)
+        dispatcher.observe(co2_reading(room, 600.0, window), now=start + 2 * i + 1)
+    wait_for(lambda: {change['sensor_id'] for change in AlertState.get_changes(0)} >= {sensors['co2'], window})
+    dispatcher.stop()
+    
+    stats = dispatcher.get_stats()
+    assert (stats['enqueued'], stats['transitions']) == (2, 1)
+    assert [event['sensor_id'] for n in sink.notifications for event in n['events']] == [sensors['co2']]
+
+def test_transition_in_other_process_refreshes_only_changed_sensor(room):
+    room_id, sensors = room
+    window = Sensor.create(room_id, 'co2', 'у окна')
+    first = AlertDispatcher(SETTINGS, sinks=[RecordingSink()])
+    second = AlertDispatcher(SETTINGS, sinks=[RecordingSink()])
+    start = time.time()
+    
+    first.observe(co2_reading(room, 600.0), now=start)
+    first.observe(co2_reading(room, 600.0, window), now=start)
+    wait_for(lambda: {change['sensor_id'] for change in AlertState.get_changes(0)} >= {sensors['co2'], window})
+    second.observe(co2_reading(room, 2500.0, window), now=start + 60)
+    wait_for(lambda: room_id in {alert['room_id'] for alert in AlertState.get_active()})
+    
+    # Уровни остальных датчиков в памяти сохраняются, изменённый перечитывается из БД
+    first.observe(co2_reading(room, 600.0), now=start + 120)
+    first.observe(co2_reading(room, 2500.0, window), now=start + 120)
+    first.stop()
+    second.stop()
+    
+    assert first.get_stats()['enqueued'] == 2
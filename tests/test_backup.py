@@ -0,0 +1,43 @@
+import itertools
+from datetime import datetime, timedelta
+import pytest
+from config import Config
+from database.backup import backups
+from database.storage import get_measurement_store
+from models.sensor import Sensor
+from models.sensor_alert import SensorAlert
+from services.data_collection import DataCollectionService
+
+_offsets = itertools.count()
+
+def create_snapshot():
+    """Снимок с уникальным именем (несколько снимков в пределах секунды)"""
+    return backups.create(datetime.utcnow() + timedelta(seconds=next(_offsets)))
+
+@pytest.fixture
+def reports_from_snapshot(monkeypatch):
+    if not get_measurement_store().shared:
+        pytest.skip("Измерения в памяти процесса не попадают в снимок")
+    monkeypatch.setitem(Config.BACKUP, 'serve_reports', True)
+    monkeypatch.setitem(Config.BACKUP, 'max_age_minutes', 24 * 60)
+
+def test_reports_store_dropout_alerts_in_live_db(client, room, reports_from_snapshot):
+    room_id, sensors = room
+    DataCollectionService.collect_measurement(sensors['co2'], 600.0, datetime.utcnow() - timedelta(hours=1))
+    create_snapshot()
+    
+    response = client.get('/reports')
+    
+    assert response.status_code == 200
+    assert 'Данные резервной копии' in response.get_data(as_text=True)
+    assert any(alert['alert_type'] == 'dropout' for alert in SensorAlert.get_by_room(room_id))
+
+def test_reports_do_not_fill_process_caches_from_snapshot(client, room, reports_from_snapshot):
+    room_id, _ = room
+    create_snapshot()
+    sensor_id = Sensor.create(room_id, 'co2', 'у окна')
+    
+    assert client.get('/reports').status_code == 200
+    response = client.post('/api/measurements', json={'sensor_id': sensor_id, 'value': 600.0})
+    
+    assert response.get_json()['success'] is True
@@ -0,0 +1,84 @@
+from datetime import datetime
+import pytest
+from database.db import db
+from models.equipment import Equipment
+from models.equipment_event import EquipmentEvent
+from models.room import Room
+from services.energy import EnergyService
+
+NOW = datetime(2026, 10, 1)
+
+def add_equipment(room_id, created_at, switches, power=1000.0):
+    """Оборудование с заданным временем создания и журналом переключений [(время, статус)]"""
+    equipment_id = Equipment.create(room_id, 'ventilation', f'Вентиляция {created_at:%m%d}', power)
+    with db.get_cursor() as cursor:
+        cursor.execute("UPDATE equipment SET created_at = ? WHERE id = ?",
+                       (f'{created_at:%Y-%m-%d %H:%M:%S}', equipment_id))
+        status = 'off'
+        for moment, new_status in switches:
+            cursor.execute(
+                """INSERT INTO equipment_events (equipment_id, old_status, new_status, source, changed_at)
+                   VALUES (?, ?, ?, 'manual', ?)""",
+                (equipment_id, status, new_status, f'{moment:%Y-%m-%d %H:%M:%S}')
+            )
+            status = new_status
+        cursor.execute("UPDATE equipment SET status = ? WHERE id = ?", (status, equipment_id))
+    return equipment_id
+
+def on_hours(usage):
+    return {eq['equipment_id']: eq['on_hours'] for eq in usage['equipment']}
+
+def test_usage_combines_partial_scans_with_cached_closed_months(room):
+    room_id, _ = room
+    equipment_id = add_equipment(room_id, datetime(2025, 12, 15), [
+        (datetime(2026, 1, 10), 'on'), (datetime(2026, 1, 10, 10), 'off'),
+        (datetime(2026, 2, 27), 'on'), (datetime(2026, 3, 2), 'off')
+    ])
+    
+    usage = EnergyService.get_usage(datetime(2026, 1, 5), datetime(2026, 3, 1, 12), now=NOW)
+    
+    # Январь и март сканируются частично, февраль целиком сохраняется в кэш
+    assert on_hours(usage)[equipment_id] == pytest.approx(10 + 48 + 12)
+    assert usage['rooms'][room_id]['energy_kwh'] == pytest.approx(70.0)
+    assert EquipmentEvent.get_monthly_usage('2026-02')[equipment_id]['on_seconds'] == 48 * 3600
+    assert equipment_id not in EquipmentEvent.get_monthly_usage('2026-01')
+    assert equipment_id not in EquipmentEvent.get_monthly_usage('2026-03')
+
+def test_closed_month_cache_is_rebuilt_for_equipment_added_later(room):
+    room_id, _ = room
+    first = add_equipment(room_id, datetime(2026, 3, 20), [
+        (datetime(2026, 4, 3), 'on'), (datetime(2026, 4, 3, 6), 'off')
+    ])
+    month = lambda: on_hours(EnergyService.get_usage(datetime(2026, 4, 1), datetime(2026, 5, 1), now=NOW))
+    assert month()[first] == pytest.approx(6.0)
+    
+    # Кэш завершённого месяца читается без повторного сканирования
+    with db.get_cursor() as cursor:
+        cursor.execute("UPDATE equipment_energy_monthly SET on_seconds = 0 WHERE month = ? AND equipment_id = ?",
+                       ('2026-04', first))
+    assert month()[first] == 0.0
+    
+    # Оборудование, созданное до конца месяца, но отсутствующее в кэше, вызывает пересчёт
+    second = add_equipment(room_id, datetime(2026, 3, 25), [
+        (datetime(2026, 4, 10), 'on'), (datetime(2026, 4, 10, 5), 'off')
+    ])
+    hours = month()
+    assert (hours[first], hours[second]) == (pytest.approx(6.0), pytest.approx(5.0))
+    assert second in EquipmentEvent.get_monthly_usage('2026-04')
+
+def test_usage_is_filtered_by_rooms(room):
+    room_id, _ = room
+    other_room = Room.create('Склад энергии', 20.0)
+    inside = add_equipment(room_id, datetime(2026, 5, 1), [
+        (datetime(2026, 6, 1), 'on'), (datetime(2026, 6, 1, 2), 'off')
+    ])
+    outside = add_equipment(other_room, datetime(2026, 5, 1), [(datetime(2026, 6, 1), 'on')])
+    
+    for start in (datetime(2026, 6, 1), datetime(2026, 6, 1, 1)):
+        usage = EnergyService.get_usage(start, datetime(2026, 7, 1), room_ids=[room_id], now=NOW)
+        
+        assert [eq['equipment_id'] for eq in usage['equipment']] == [inside]
+        assert set(usage['rooms']) == {room_id}
+        assert outside not in on_hours(usage)
+    
+    assert EnergyService.get_usage(datetime(2026, 6, 1), datetime(2026, 7, 1), room_ids=[], now=NOW)['equipment'] == []
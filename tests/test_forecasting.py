@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+import pytest
+from models.measurement import Measurement
+from services.data_collection import DataCollectionService
+from services.forecasting import ForecastingService
+
+def test_sensor_without_history_is_not_queried_on_every_forecast(room, monkeypatch):
+    _, sensors = room
+    service = ForecastingService()
+    calls = []
+    get_history = Measurement.get_history
+    monkeypatch.setattr(Measurement, 'get_history', lambda *args: calls.append(args) or get_history(*args))
+    
+    assert service.forecast(sensors['co2']) is None
+    assert service.forecast(sensors['co2']) is None
+    assert len(calls) == 1
+    
+    # Новое измерение создаёт состояние без повторного чтения истории
+    now = datetime.utcnow().replace(microsecond=0)
+    service.update({'sensor_id': sensors['co2'], 'value': 700.0}, now)
+    assert service.forecast(sensors['co2'], now=now)['value'] == pytest.approx(700.0)
+    assert len(calls) == 1
+
+@pytest.mark.parametrize('horizon', [5, 45, -20])
+def test_forecast_rejects_horizon_outside_range(client, room, horizon):
+    room_id, sensors = room
+    DataCollectionService.collect_measurement(sensors['co2'], 700.0, datetime.utcnow() - timedelta(minutes=1))
+    
+    response = client.get(f'/api/forecast/{room_id}?horizon={horizon}')
+    
+    assert response.status_code == 400
+    assert client.get(f'/api/forecast/{room_id}?horizon=30').status_code == 200
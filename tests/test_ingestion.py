@@ -0,0 +1,105 @@
+import threading
+from datetime import datetime, timedelta
+from models.measurement import Measurement
+from models.sensor import Sensor
+from models.sensor_alert import SensorAlert
+from services.aggregates import running_aggregates
+from services.anomaly_detection import AnomalyDetector
+from services.data_collection import DataCollectionService
+
+def same_day_start(hours):
+    """Момент в прошлом, от которого следующие hours часов не пересекают границу суток"""
+    moment = (datetime.utcnow() - timedelta(hours=hours + 1)).replace(minute=0, second=0, microsecond=0)
+    return moment if moment.hour + hours < 24 else moment.replace(hour=0)
+
+def test_batch_rejects_out_of_range_unix_time_per_item(room):
+    _, sensors = room
+    measured_at = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=5)
+    
+    result = DataCollectionService.collect_measurements([
+        {'sensor_id': sensors['co2'], 'value': 600.0, 'measured_at': 1e20},
+        {'sensor_id': sensors['co2'], 'value': 610.0, 'measured_at': measured_at.isoformat()}
+    ])
+    
+    assert result['accepted'] == 1
+    assert len(result['rejected']) == 1
+    assert 'Некорректное время измерения' in result['rejected'][0]['error']
+    assert Measurement.get_latest_by_sensor(sensors['co2'])['value'] == 610.0
+
+def test_out_of_order_batch_splits_status_time_between_counted_neighbours(room):
+    room_id, sensors = room
+    t0 = same_day_start(1)
+    at = lambda minutes: (t0 + timedelta(minutes=minutes)).isoformat()
+    
+    DataCollectionService.collect_measurement(sensors['temperature'], 22.0, at(0))
+    result = DataCollectionService.collect_measurements([
+        {'sensor_id': sensors['temperature'], 'value': 22.0, 'measured_at': at(10)},
+        {'sensor_id': sensors['temperature'], 'value': 25.5, 'measured_at': at(5)},
+        {'sensor_id': sensors['temperature'], 'value': 19.0, 'measured_at': at(7)}
+    ])
+    
+    assert result['accepted'] == 3 and result['late'] == 0
+    summary = running_aggregates.get_room_summary(room_id, now=t0)['temperature']['day']
+    assert summary['count'] == 4
+    assert summary['band_seconds'] == {'optimal': 300.0, 'high': 120.0, 'low': 180.0}
+
+def test_late_reading_and_parallel_replays_keep_history_consistent(room):
+    room_id, sensors = room
+    t0 = same_day_start(2)
+    readings = [
+        {'sensor_id': sensors['temperature'], 'value': 22.0 if i % 2 else 25.5,
+         'measured_at': (t0 + timedelta(minutes=i)).isoformat()}
+        for i in range(60)
+    ]
+    
+    DataCollectionService.collect_measurement(sensors['temperature'], 22.0, (t0 + timedelta(minutes=60)).isoformat())
+    threads = [
+        threading.Thread(target=DataCollectionService.collect_measurements, args=(part,))
+        for part in (readings[::2], readings[1::2], readings[::-1], readings)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    history = Measurement.get_range(sensors['temperature'], t0)
+    assert len(history) == 61
+    assert Measurement.get_latest_by_sensor(sensors['temperature'])['measured_at'] == history[-1]['measured_at']
+    summary = running_aggregates.get_room_summary(room_id, now=t0)['temperature']['day']
+    assert summary['count'] == 61
+    assert summary['band_seconds'] == {'high': 1800.0, 'optimal': 1800.0}
+
+def test_room_summary_merges_sensors_of_same_type(room):
+    room_id, sensors = room
+    second = Sensor.create(room_id, 'temperature', 'у окна')
+    t0 = same_day_start(1)
+    
+    for sensor_id, value in [(sensors['temperature'], 20.0), (second, 24.0)]:
+        DataCollectionService.collect_measurements([
+            {'sensor_id': sensor_id, 'value': value, 'measured_at': (t0 + timedelta(minutes=m)).isoformat()}
+            for m in (0, 10)
+        ])
+    
+    summary = running_aggregates.get_room_summary(room_id, now=t0)['temperature']['day']
+    assert (summary['count'], summary['mean'], summary['min'], summary['max']) == (4, 22.0, 20.0, 24.0)
+    assert sum(summary['band_seconds'].values()) == 2 * 600
+
+def test_dropout_is_detected_from_shared_latest_and_reported_once(room):
+    room_id, sensors = room
+    now = datetime.utcnow().replace(microsecond=0)
+    active = {'id': sensors['co2'], 'room_id': room_id}
+    quiet = {'id': sensors['humidity'], 'room_id': room_id}
+    
+    # Измерения принял другой воркер: детектор с пустым состоянием видит их через общую БД
+    DataCollectionService.collect_measurement(active['id'], 600.0, now - timedelta(minutes=1))
+    DataCollectionService.collect_measurement(quiet['id'], 45.0, now - timedelta(hours=1))
+    first, second = AnomalyDetector(), AnomalyDetector()
+    
+    assert [alert['sensor_id'] for alert in first.check_dropouts([active, quiet])] == [quiet['id']]
+    assert second.check_dropouts([active, quiet]) == []
+    
+    # Измерение после того же пропуска повторного оповещения не создаёт
+    DataCollectionService.collect_measurement(quiet['id'], 46.0, now)
+    dropouts = [alert for alert in SensorAlert.get_by_room(room_id) if alert['alert_type'] == 'dropout']
+    assert [alert['sensor_id'] for alert in dropouts] == [quiet['id']]
+    assert first.check_dropouts([active, quiet]) == []
@@ -0,0 +1,46 @@
+import pytest
+from config import Config
+from models.equipment import Equipment
+from models.room import Room
+from services.data_collection import DataCollectionService
+from services.overview import OverviewService
+
+@pytest.fixture
+def long_max_age(monkeypatch):
+    monkeypatch.setitem(Config.OVERVIEW, 'max_age_seconds', 3600)
+
+def test_measurements_do_not_rebuild_overview_within_max_age(room, long_max_age):
+    room_id, sensors = room
+    _, build = OverviewService.get_cached()
+    
+    DataCollectionService.collect_measurement(sensors['co2'], 2500.0)
+    overview, cached_build = OverviewService.get_cached()
+    
+    assert cached_build == build
+    assert 'co2' not in next(r for r in overview['rooms'] if r['id'] == room_id)['parameters']
+
+def test_room_and_equipment_changes_rebuild_overview(room, long_max_age):
+    room_id, _ = room
+    _, build = OverviewService.get_cached()
+    
+    new_room = Room.create('Кладовая сводки', 8.0)
+    overview, rebuilt = OverviewService.get_cached()
+    assert rebuilt > build and new_room in {r['id'] for r in overview['rooms']}
+    
+    equipment_id = Equipment.create(room_id, 'heating', 'Обогреватель сводки')
+    Equipment.update_status(equipment_id, 'on')
+    overview, build = OverviewService.get_cached()
+    assert build > rebuilt and overview['active_equipment'] >= 1
+    
+    # Повторная установка того же статуса кэш не сбрасывает
+    Equipment.update_status(equipment_id, 'on')
+    assert OverviewService.get_cached()[1] == build
+
+def test_overview_reflects_measurements_after_max_age(room, monkeypatch):
+    room_id, sensors = room
+    monkeypatch.setitem(Config.OVERVIEW, 'max_age_seconds', 0)
+    
+    DataCollectionService.collect_measurement(sensors['co2'], 2500.0)
+    overview = OverviewService.get_overview()
+    
+    assert next(r for r in overview['rooms'] if r['id'] == room_id)['parameters']['co2']['value'] == 2500.0
@@ -0,0 +1,70 @@
+import base64
+import json
+import pytest
+from models.equipment import Equipment
+from models.room import Room
+
+def make_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+@pytest.fixture(scope='module')
+def warehouse_rooms():
+    """Помещения с общим префиксом названия (фильтр q)"""
+    return [Room.create(f'Склад-{i:02d}', 10.0 + i) for i in range(7)]
+
+def test_pages_cover_filtered_rooms_once_in_order(client, warehouse_rooms):
+    names, cursor = [], None
+    while True:
+        query = '/api/rooms?q=Склад-&limit=3' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(query).get_json()
+        assert len(page['items']) <= 3
+        names += [room['name'] for room in page['items']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    
+    assert names == [f'Склад-{i:02d}' for i in range(7)]
+
+def test_descending_sort_by_area(client, warehouse_rooms):
+    page = client.get('/api/rooms?q=Склад-&sort=area&order=desc&limit=2').get_json()
+    second = client.get(f"/api/rooms?q=Склад-&sort=area&order=desc&limit=2&cursor={page['next_cursor']}").get_json()
+    
+    assert [room['area'] for room in page['items'] + second['items']] == [16.0, 15.0, 14.0, 13.0]
+
+def test_sensor_and_equipment_filters(client, room):
+    room_id, sensors = room
+    Equipment.create(room_id, 'ventilation', 'Вытяжка', 500.0)
+    Equipment.create(room_id, 'heating', 'Радиатор', 1500.0)
+    
+    sensor_page = client.get(f'/api/sensors?room_id={room_id}&sensor_type=co2').get_json()
+    equipment_page = client.get(f'/api/equipment?room_id={room_id}&equipment_type=heating').get_json()
+    
+    assert [s['id'] for s in sensor_page['items']] == [sensors['co2']]
+    assert [e['name'] for e in equipment_page['items']] == ['Радиатор']
+
+@pytest.mark.parametrize('limit', [0, -1, -5])
+def test_non_positive_limit_is_rejected(client, limit):
+    response = client.get(f'/api/rooms?limit={limit}')
+    
+    assert response.status_code == 400
+
+@pytest.mark.parametrize('cursor', [
+    'не-base64',
+    make_cursor([{'a': 1}, 2]),
+    make_cursor(['Склад', 'id']),
+    make_cursor(['Склад']),
+    make_cursor({'name': 'Склад', 'id': 1})
+])
+def test_malformed_cursor_is_rejected(client, cursor):
+    response = client.get(f'/api/rooms?cursor={cursor}')
+    
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+def test_equipment_page_lists_selected_room_in_filter(client, room):
+    room_id, _ = room
+    
+    response = client.get(f'/equipment?room_id={room_id}')
+    
+    assert response.status_code == 200
+    assert f'value="{room_id}" selected' in response.get_data(as_text=True)
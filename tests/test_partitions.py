@@ -0,0 +1,47 @@
+import os
+from datetime import datetime
+import pytest
+from database.partitions import partitions
+from database.storage import SQLiteMeasurementStore
+
+def test_duplicate_sensor_time_is_stored_once(room):
+    _, sensors = room
+    store = SQLiteMeasurementStore()
+    moment = datetime.utcnow().replace(microsecond=0)
+    
+    first_id, repeated_id = store.append([(sensors['co2'], 600.0, moment), (sensors['co2'], 610.0, moment)])
+    
+    assert first_id is not None and repeated_id is None
+    assert store.append([(sensors['co2'], 620.0, moment)]) == [None]
+    assert [row['value'] for row in store.range(sensors['co2'], moment)] == [600.0]
+    assert store.latest([sensors['co2']])[sensors['co2']]['value'] == 600.0
+
+def test_range_spans_month_partitions(room):
+    _, sensors = room
+    store = SQLiteMeasurementStore()
+    moments = [datetime(2026, 1, 31, 23, 59), datetime(2026, 2, 1, 0, 0, 30), datetime(2026, 2, 15)]
+    ids = store.append([(sensors['dust'], float(i), moment) for i, moment in enumerate(moments)])
+    
+    rows = store.range(sensors['dust'], datetime(2026, 1, 31, 23), datetime(2026, 2, 10))
+    
+    assert {'2026_01', '2026_02'} <= set(partitions.list_partitions())
+    assert [row['value'] for row in rows] == [0.0, 1.0]
+    assert ids == sorted(ids)
+    chunks = store.iter_range_chunks(sensors['dust'], datetime(2026, 1, 31), datetime(2026, 3, 1), 2)
+    assert [value for chunk in chunks for _, value in chunk] == [0.0, 1.0, 2.0]
+
+def test_drop_rejects_current_and_missing_partitions(room):
+    _, sensors = room
+    store = SQLiteMeasurementStore()
+    store.append([(sensors['humidity'], 40.0, datetime.utcnow()), (sensors['humidity'], 45.0, datetime(2020, 3, 5))])
+    current = partitions.name_for(datetime.utcnow())
+    
+    with pytest.raises(ValueError):
+        partitions.drop(current)
+    with pytest.raises(ValueError):
+        partitions.drop('1999_01')
+    
+    partitions.drop('2020_03')
+    assert os.path.exists(partitions.path_for(current))
+    assert '2020_03' not in partitions.list_partitions()
+    assert store.range(sensors['humidity'], datetime(2020, 3, 1), datetime(2020, 4, 1)) == []
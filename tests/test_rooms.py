@@ -0,0 +1,86 @@
+from config import Config
+from models.room import Room
+from models.sensor import Sensor
+from models.zone import Zone
+from services.data_collection import DataCollectionService
+from services.zones import ZoneRollupService
+
+def test_create_room_rejects_unknown_zone(client):
+    response = client.post('/api/rooms', json={'name': 'Склад без зоны', 'area': 12.0, 'zone_id': 999999})
+    
+    assert response.status_code == 400
+    assert 'Зона не найдена' in response.get_json()['error']
+    assert 'Склад без зоны' not in {room['name'] for room in Room.get_all()}
+
+def test_create_room_in_existing_zone():
+    zone_id = Zone.create('Корпус Б', 'building')
+    room_id = Room.create('Переговорная Б-1', 18.0, zone_id=zone_id)
+    
+    assert Room.get_by_id(room_id)['zone_id'] == zone_id
+
+def zone_paths(*zone_ids):
+    return [(Zone.get_by_id(zone_id)['path'], Zone.get_by_id(zone_id)['depth']) for zone_id in zone_ids]
+
+def test_move_zone_rewrites_subtree_paths():
+    campus = Zone.create('Кампус Север', 'campus')
+    first = Zone.create('Корпус 1', 'building', campus)
+    second = Zone.create('Корпус 2', 'building', campus)
+    floor = Zone.create('Этаж 3', 'floor', first)
+    wing = Zone.create('Крыло А', 'wing', floor)
+    
+    Zone.move(floor, second)
+    
+    assert zone_paths(floor, wing) == [
+        (f'/{campus}/{second}/{floor}/', 2), (f'/{campus}/{second}/{floor}/{wing}/', 3)
+    ]
+    assert [zone['id'] for zone in Zone.get_subtree(second)] == [second, floor, wing]
+    assert [zone['id'] for zone in Zone.get_subtree(first)] == [first]
+    
+    Zone.move(floor, None)
+    assert zone_paths(floor, wing) == [(f'/{floor}/', 0), (f'/{floor}/{wing}/', 1)]
+
+def test_move_zone_into_own_subtree_is_rejected(client):
+    campus = Zone.create('Кампус Юг', 'campus')
+    building = Zone.create('Корпус 5', 'building', campus)
+    floor = Zone.create('Этаж 1', 'floor', building)
+    before = zone_paths(campus, building, floor)
+    
+    for parent_id in (floor, building):
+        response = client.put(f'/api/zones/{building}', json={'parent_id': parent_id})
+        
+        assert response.status_code == 400
+        assert 'собственного поддерева' in response.get_json()['error']
+    assert zone_paths(campus, building, floor) == before
+
+def test_delete_zone_moves_children_and_rooms_to_parent():
+    campus = Zone.create('Кампус Запад', 'campus')
+    building = Zone.create('Корпус 7', 'building', campus)
+    floor = Zone.create('Этаж 2', 'floor', building)
+    wing = Zone.create('Крыло Б', 'wing', floor)
+    room_id = Room.create('Аудитория 7-1', 30.0, zone_id=building)
+    
+    Zone.delete(building)
+    
+    assert Zone.get_by_id(building) is None
+    assert Zone.get_by_id(floor)['parent_id'] == campus
+    assert zone_paths(floor, wing) == [(f'/{campus}/{floor}/', 1), (f'/{campus}/{floor}/{wing}/', 2)]
+    assert Room.get_by_id(room_id)['zone_id'] == campus
+
+def test_zone_rollup_follows_zone_changes_but_not_each_measurement(monkeypatch):
+    monkeypatch.setitem(Config.OVERVIEW, 'max_age_seconds', 3600)
+    building = Zone.create('Корпус 9', 'building')
+    other = Zone.create('Корпус 10', 'building')
+    room_id = Room.create('Лаборатория 9-1', 25.0, zone_id=building)
+    sensor_id = Sensor.create(room_id, 'co2', 'центр')
+    assert ZoneRollupService.get_zone(building)['room_ids'] == [room_id]
+    
+    # Последние значения обновляются не чаще раза в max_age_seconds
+    DataCollectionService.collect_measurement(sensor_id, 600.0)
+    assert ZoneRollupService.get_zone(building)['rooms_with_data'] == 0
+    
+    Zone.rename(building, 'Корпус 9А')
+    assert ZoneRollupService.get_zone(building)['zone']['name'] == 'Корпус 9А'
+    
+    Room.set_zone(room_id, other)
+    assert ZoneRollupService.get_zone(building)['room_ids'] == []
+    assert ZoneRollupService.get_zone(other)['room_ids'] == [room_id]
@@ -0,0 +1,35 @@
+import pytest
+from models.decision_rule import DecisionRule
+from services.rule_engine import RuleEngine
+
+RULE = {'parameter': 'co2', 'statuses': ['high', 'critical'], 'equipment_type': 'ventilation', 'action': 'turn_on'}
+
+@pytest.mark.parametrize('changes', [
+    {'reason': 'CO2 {level}'},
+    {'reason': 'CO2 {value'},
+    {'reason': '{value.__class__}'},
+    {'statuses': ['critical_high']},
+    {'statuses': 'high'},
+    {'min_value': '1000'},
+    {'max_value': True},
+    {'statuses': None, 'min_value': 1500, 'max_value': 1000}
+])
+def test_create_rejects_invalid_reason_and_statuses(client, changes):
+    response = client.post('/api/rules', json={**RULE, **changes})
+    
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+def test_format_reason_keeps_unformattable_template():
+    data = {'value': 1450.0}
+    
+    assert RuleEngine.format_reason({**RULE, 'reason': '{parameter} = {value:.0f}'}, data) == 'co2 = 1450'
+    assert RuleEngine.format_reason({**RULE, 'reason': 'CO2 {level}: {value}'}, data) == 'CO2 {level}: 1450.0'
+    assert RuleEngine.format_reason({**RULE, 'reason': 'CO2 {value'}, data) == 'CO2 {value'
+
+def test_validate_accepts_reason_fields():
+    DecisionRule.validate({**RULE, 'reason': 'Проветривание: {parameter} = {value:.0f} ppm'})
+
+def test_validate_accepts_value_bounds():
+    DecisionRule.validate({**RULE, 'statuses': None, 'min_value': 1000, 'max_value': 1000.0})
+    DecisionRule.validate({**RULE, 'statuses': None, 'min_value': 1500})
@@ -0,0 +1,36 @@
+import pytest
+from services.simulation import SimulationService
+
+def test_flat_configuration_name_is_not_equipment():
+    configurations = SimulationService.expand_configurations([
+        {'name': 'Усиленная вентиляция', 'ventilation': 1500, 'heating': 2000},
+        {'equipment': {'humidifier': 300}}
+    ])
+    
+    assert configurations == [
+        {'name': 'Усиленная вентиляция', 'equipment': {'ventilation': 1500, 'heating': 2000}},
+        {'name': 'config-2', 'equipment': {'humidifier': 300}}
+    ]
+
+@pytest.mark.parametrize('configuration', [{'name': 'A', 'fan': 100}, ['heating', 100], {'equipment': [100]}])
+def test_invalid_configuration_is_rejected(configuration):
+    with pytest.raises(ValueError):
+        SimulationService.expand_configurations([configuration])
+
+def test_oversized_sweep_is_rejected_before_expansion():
+    sweep = {equipment_type: list(range(0, 10000, 100)) for equipment_type in ('heating', 'ventilation', 'humidifier')}
+    
+    with pytest.raises(ValueError, match='Слишком много конфигураций: 1000000'):
+        SimulationService.expand_configurations(sweep=sweep)
+
+@pytest.mark.parametrize('sweep', [
+    {'heating': '1000'},
+    {'heating': []},
+    {'heating': {'min': 0, 'max': 1000}},
+    {'heating': [500, 'много']},
+    {'heating': [True]},
+    ['heating', 1000]
+])
+def test_invalid_sweep_is_rejected(sweep):
+    with pytest.raises(ValueError):
+        SimulationService.expand_configurations(sweep=sweep)
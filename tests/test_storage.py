@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+from database.storage import MemoryMeasurementStore, SQLiteMeasurementStore, TieredMeasurementStore
+
+def values(rows):
+    return [row['value'] for row in rows]
+
+def test_memory_store_evicts_by_point_limit_and_window(room):
+    _, sensors = room
+    store = MemoryMeasurementStore({'window_hours': 1, 'max_points_per_sensor': 3})
+    start = datetime(2026, 5, 1, 12)
+    
+    store.append([(sensors['co2'], 600.0 + i, start + timedelta(minutes=i)) for i in range(5)])
+    
+    assert values(store.range(sensors['co2'], start)) == [602.0, 603.0, 604.0]
+    assert not store.covers(sensors['co2'], start)
+    assert store.covers(sensors['co2'], start + timedelta(minutes=3))
+    
+    # Измерение за пределами окна вытесняет все более ранние
+    later = start + timedelta(hours=2)
+    store.append([(sensors['co2'], 700.0, later)])
+    assert values(store.range(sensors['co2'], start)) == [700.0]
+    assert store.latest([sensors['co2']])[sensors['co2']]['value'] == 700.0
+    assert store.append([(sensors['co2'], 710.0, later)]) == [None]
+
+def test_tiered_store_falls_through_to_sqlite_outside_window(room):
+    _, sensors = room
+    store = TieredMeasurementStore(
+        SQLiteMeasurementStore(), MemoryMeasurementStore({'window_hours': 1, 'max_points_per_sensor': 100})
+    )
+    now = datetime.utcnow().replace(microsecond=0)
+    store.append([
+        (sensors['temperature'], float(minutes), now - timedelta(minutes=minutes)) for minutes in (180, 20, 10)
+    ])
+    assert values(store.range(sensors['temperature'], now - timedelta(minutes=30))) == [20.0, 10.0]
+    
+    # Запись другого процесса видна только в SQLite: недавнее окно отдаётся из памяти,
+    # более длинный период - из партиций
+    store.cold.append([(sensors['temperature'], 5.0, now - timedelta(minutes=5))])
+    
+    assert values(store.range(sensors['temperature'], now - timedelta(minutes=30))) == [20.0, 10.0]
+    assert values(store.range(sensors['temperature'], now - timedelta(hours=4))) == [180.0, 20.0, 10.0, 5.0]
+    chunks = store.iter_range_chunks(sensors['temperature'], now - timedelta(hours=4), now, 2)
+    assert [value for chunk in chunks for _, value in chunk] == [180.0, 20.0, 10.0, 5.0]